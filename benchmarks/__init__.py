@@ -0,0 +1,5 @@
+"""
+性能基准测试
+覆盖启动导入、故事内容与进度构造、场景转移、存档读写和打字机渲染，
+结果写成 JSON 以便跟踪性能回退（用法见 __main__.py）
+"""
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行基准测试
+
+用法：
+    python -m benchmarks                          # 全部用例，结果写入 benchmarks/results/
+    python -m benchmarks --quick                  # 快速模式（更少的轮数和存档规模）
+    python -m benchmarks --only saves,render      # 只运行部分分组
+    python -m benchmarks --compare old.json       # 与之前的结果对比（按单次耗时最小值）
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import bench_render, bench_saves, bench_startup, bench_story
+from benchmarks.harness import (compare, environment_info, format_result, read_results,
+                                write_results)
+
+GROUPS = {
+    'startup': bench_startup,
+    'story': bench_story,
+    'saves': bench_saves,
+    'render': bench_render,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="运行性能基准测试并输出 JSON 结果")
+    parser.add_argument('-o', '--output', help="结果文件路径（默认 benchmarks/results/<时间>.json）")
+    parser.add_argument('--only', help="只运行这些分组（逗号分隔）：" + ','.join(GROUPS))
+    parser.add_argument('--quick', action='store_true', help="快速模式")
+    parser.add_argument('--repeat', type=int, help="每个用例的重复轮数")
+    parser.add_argument('--compare', metavar='BASELINE', help="与之前的结果文件对比")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="最小耗时变慢超过该比例视为回退（默认 0.2）")
+    parser.add_argument('--fail-on-regression', action='store_true', help="出现回退时返回非零退出码")
+    args = parser.parse_args(argv)
+
+    groups = list(GROUPS)
+    if args.only:
+        groups = [name.strip() for name in args.only.split(',') if name.strip()]
+        unknown = [name for name in groups if name not in GROUPS]
+        if unknown:
+            parser.error(f"未知分组: {', '.join(unknown)}")
+
+    options = SimpleNamespace(
+        root=ROOT,
+        repeat=args.repeat or (3 if args.quick else 7),
+        min_time=0.05 if args.quick else 0.2,
+        process_repeat=3 if args.quick else 10,
+        sizes=(10, 100, 1000) if args.quick else (10, 100, 1000, 10000),
+    )
+
+    results = []
+    for name in groups:
+        for result in GROUPS[name].run(options):
+            print(format_result(result), flush=True)
+            results.append(result)
+
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    write_results(output, results, environment_info(ROOT))
+    print(f"\n结果已写入 {output}")
+
+    if args.compare:
+        regressions = 0
+        print(f"\n与 {args.compare} 对比（当前/基线）：")
+        for old, new, ratio, regressed in compare(read_results(args.compare), results, args.threshold):
+            params = ' '.join(f"{key}={value}" for key, value in new.params.items())
+            mark = '  <-- 变慢' if regressed else ''
+            print(f"  {new.name:<28} {params:<28} {ratio:6.2f}x{mark}")
+            regressions += regressed
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打字机输出：FrameRenderer 写入空终端的速率，以及信号干扰的生成开销
+
+时钟和睡眠都是虚拟的（睡眠只推进虚拟时间），因此测到的是渲染本身的 CPU 开销：
+附加指标 chars_per_sec 为每秒能处理的字符数，writes_per_call 为每次调用的写入次数，
+simulated_s 为按目标字符速率播放一次所需的（虚拟）时间。
+"""
+
+from typing import List
+
+from benchmarks.harness import BenchmarkResult, measure
+from game_engine import signal_noise
+from game_engine.scene_render import TerminalCaps, compile_scene
+from game_engine.text_renderer import FrameRenderer
+from story_system import StoryContent
+
+SAMPLE_LINE = "嘶——沙沙……这里是崖边电台，频率 14250，如果你能听到，请回答。" * 4
+
+
+class _VirtualClock:
+    """sleep 只推进时间的单调时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class _NullBuffer:
+    def __init__(self, terminal: '_NullTerminal'):
+        self.terminal = terminal
+
+    def write(self, data: bytes) -> int:
+        self.terminal.writes += 1
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class _NullTerminal:
+    """丢弃所有输出、只统计写入次数的终端"""
+    encoding = 'utf-8'
+
+    def __init__(self):
+        self.writes = 0
+        self.buffer = _NullBuffer(self)
+
+    def write(self, data: str) -> int:
+        self.writes += 1
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def _rate_case(name: str, params, options, play, chars: int) -> BenchmarkResult:
+    """计时 play(renderer)，并按一次调用的写入次数和虚拟时长补充附加指标"""
+    terminal = _NullTerminal()
+    clock = _VirtualClock()
+    renderer = FrameRenderer(stream=terminal, clock=clock.clock, sleep=clock.sleep,
+                             instant=params.get('instant', False))
+    play(renderer)
+    writes, simulated = terminal.writes, clock.now
+    result = measure(name, 'render', lambda: play(renderer), params,
+                     repeat=options.repeat, min_time=options.min_time)
+    result.extra.update({
+        'chars_per_sec': chars / result.median,
+        'writes_per_call': writes,
+        'simulated_s': simulated,
+    })
+    return result
+
+
+def run(options) -> List[BenchmarkResult]:
+    results = []
+    for delay in (0.05, 0.01):
+        for instant in (False, True):
+            if instant and delay != 0.05:
+                continue
+            results.append(_rate_case(
+                'typewriter_type_out', {'delay': delay, 'instant': instant}, options,
+                lambda renderer: renderer.type_out(SAMPLE_LINE, delay), len(SAMPLE_LINE)))
+
+    # 最长的场景：预渲染字节段（含行间停顿）
+    content = StoryContent(prefetch=False)
+    scene = max(content.scenes.values(), key=lambda s: sum(len(line) for line in s.content))
+    caps = TerminalCaps(color=True, encoding='utf-8')
+    rendered = compile_scene(scene, caps)
+    segments = rendered.body + rendered.choices
+    chars = sum(segment.char_count for segment in segments)
+
+    def play_scene(renderer):
+        for segment in segments:
+            renderer.play_segment(segment)
+    results.append(_rate_case('typewriter_play_scene', {'scene': scene.id}, options, play_scene, chars))
+
+    results.append(measure('compile_scene', 'render', lambda: compile_scene(scene, caps),
+                           {'scene': scene.id}, repeat=options.repeat, min_time=options.min_time))
+
+    # 信号干扰：第二章全部对白拼成一段长文本，比较不同强度和缓存命中
+    dialogue = ''.join(line for s in content.scenes.values() if s.id.startswith('chapter2')
+                       for line in s.content)
+    for strength in (0.01, 0.1, 0.9):
+        results.append(measure(
+            'signal_noise_corrupt', 'render', lambda: signal_noise.corrupt(dialogue, strength),
+            {'chars': len(dialogue), 'strength': strength},
+            repeat=options.repeat, min_time=options.min_time))
+    results.append(measure(
+        'signal_noise_cached', 'render', lambda: signal_noise.noised(dialogue, 14255),
+        {'chars': len(dialogue), 'frequency': 14255},
+        repeat=options.repeat, min_time=options.min_time))
+    return results
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存档读写：SaveManager.save_to_slot / load_from_slot，按选择记录条数（10 ~ 10000）和存储后端分组
+
+- save_snapshot：每次都写完整快照（compact_every=0）
+- save_delta：基线已存在时修改一个变量再保存，只追加一条增量
+- load：读取快照（不带增量）并反序列化
+"""
+
+import shutil
+import tempfile
+from typing import List
+
+from benchmarks.bench_story import progress_with_choices
+from benchmarks.harness import BenchmarkResult, measure
+from game_engine.save_backends import JsonSaveBackend, SqliteSaveBackend
+from game_engine.save_manager import SaveManager
+from story_system import StoryContent
+
+BACKENDS = {
+    'json': lambda directory: JsonSaveBackend(directory),
+    'sqlite': lambda directory: SqliteSaveBackend(f"{directory}/saves.db"),
+}
+
+
+def _size_cases(options, content: StoryContent, backend_name: str, size: int) -> List[BenchmarkResult]:
+    directory = tempfile.mkdtemp(prefix='radio-bench-')
+    backend = BACKENDS[backend_name](directory)
+    try:
+        progress = progress_with_choices(content, size)
+        params = {'backend': backend_name, 'choices': size}
+        results = []
+
+        snapshot_manager = SaveManager(backend=backend, compact_every=0)
+        results.append(measure(
+            'save_snapshot', 'saves', lambda: snapshot_manager.save_to_slot(1, progress), params,
+            repeat=options.repeat, min_time=options.min_time))
+
+        # 第二个槽位：先写基线，之后每次只改一个变量
+        delta_manager = SaveManager(backend=backend, compact_every=1 << 30)
+        delta_manager.save_to_slot(2, progress)
+        counter = iter(range(1 << 62))
+
+        def save_delta():
+            progress.set_variable('loop_count', next(counter))
+            delta_manager.save_to_slot(2, progress)
+        results.append(measure(
+            'save_delta', 'saves', save_delta, params,
+            repeat=options.repeat, min_time=options.min_time))
+
+        load_manager = SaveManager(backend=backend)
+        results.append(measure(
+            'load', 'saves', lambda: load_manager.load_from_slot(1, content), params,
+            repeat=options.repeat, min_time=options.min_time))
+        return results
+    finally:
+        backend.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(options) -> List[BenchmarkResult]:
+    content = StoryContent(prefetch=False)
+    content.scenes
+    results = []
+    for backend_name in BACKENDS:
+        for size in options.sizes:
+            results.extend(_size_cases(options, content, backend_name, size))
+    return results
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动开销：在全新解释器中导入 story_system / game_engine
+
+每次测量启动一个子进程，子进程内只计时 import 语句本身，
+解释器自身的启动时间作为附加指标单独记录。
+"""
+
+import subprocess
+import sys
+import time
+from typing import List
+
+from benchmarks.harness import BenchmarkResult, from_timings
+
+# 子进程内执行：计时导入并打印耗时（秒）
+_IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+MODULES = ('story_system', 'game_engine')
+
+
+def _cold_import(root: str, module: str) -> tuple:
+    """返回 (import 耗时, 子进程总耗时)"""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT.format(module=module)],
+                            cwd=root, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    return float(output.stdout.strip().splitlines()[-1]), total
+
+
+def run(options) -> List[BenchmarkResult]:
+    results = []
+    # 空解释器的启动耗时作为参照
+    baseline = [_cold_import(options.root, 'sys')[1] for _ in range(options.process_repeat)]
+    for module in MODULES:
+        _cold_import(options.root, module)  # 预热：生成 __pycache__，之后的测量都使用字节码缓存
+        samples = [_cold_import(options.root, module) for _ in range(options.process_repeat)]
+        imports = [sample[0] for sample in samples]
+        totals = sorted(sample[1] for sample in samples)
+        results.append(from_timings(
+            'cold_import', 'startup', imports, {'module': module},
+            extra={'process_median_s': totals[len(totals) // 2],
+                   'interpreter_median_s': sorted(baseline)[len(baseline) // 2]}))
+    return results
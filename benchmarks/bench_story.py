@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+故事系统：StoryContent / StoryProgress 构造、反序列化、场景转移、选择记录回放和剧本脚本编译
+"""
+
+import random
+from typing import Any, Dict, List
+
+from benchmarks.harness import BenchmarkResult, measure
+from story_system import StoryContent, StoryProgress
+from story_system.story_base import DEFAULT_BUNDLE_PATH
+from story_system.replay import Replay
+from story_system.story_engine import StoryEngine, random_policy
+from story_system.story_script import ScriptCompiler, format_chapter
+
+
+def recorded_choices(content: StoryContent, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """用随机策略反复游玩，收集 count 条真实的选择记录"""
+    engine = StoryEngine(content)
+    policy = random_policy(seed)
+    choices = []
+    while len(choices) < count:
+        result = engine.run(policy=policy, max_steps=200)
+        choices.extend(result.progress.choices_made)
+        if not result.progress.choices_made:
+            raise RuntimeError("随机游玩没有产生任何选择")
+    return choices[:count]
+
+
+def progress_with_choices(content: StoryContent, count: int) -> StoryProgress:
+    """构造一份带 count 条选择记录的进度"""
+    progress = StoryProgress(story_content=content)
+    progress.choices_made = recorded_choices(content, count)
+    last = progress.choices_made[-1]['choice_id'] if progress.choices_made else 'start'
+    progress.set_state(last)
+    return progress
+
+
+def _content_cases(options) -> List[BenchmarkResult]:
+    """StoryContent 构造：故事包 / 章节模块 × 延迟加载 / 全部加载"""
+    results = []
+    for bundle_path in (DEFAULT_BUNDLE_PATH, None):
+        for lazy in (True, False):
+            probe = StoryContent(bundle_path=bundle_path, lazy=True, prefetch=False)
+            if bundle_path is not None and probe.source != 'bundle':
+                continue  # 故事包不存在或已过期（可先运行 python -m story_system.story_bundle）
+            results.append(measure(
+                'story_content_init', 'story',
+                lambda: StoryContent(bundle_path=bundle_path, lazy=lazy, prefetch=False),
+                {'source': probe.source, 'lazy': lazy},
+                repeat=options.repeat, min_time=options.min_time))
+    return results
+
+
+def _progress_cases(options, content: StoryContent) -> List[BenchmarkResult]:
+    """StoryProgress 构造和按存档大小的反序列化"""
+    results = [measure(
+        'story_progress_init', 'story',
+        lambda: StoryProgress(story_content=content),
+        repeat=options.repeat, min_time=options.min_time)]
+    for size in options.sizes:
+        data = progress_with_choices(content, size).serialize()
+        results.append(measure(
+            'story_progress_deserialize', 'story',
+            lambda: StoryProgress.deserialize(data, content),
+            {'choices': size}, repeat=options.repeat, min_time=options.min_time))
+    return results
+
+
+def _transition_cases(options, content: StoryContent) -> List[BenchmarkResult]:
+    """
+    单步场景转移：make_choice + advance + get_current_scene
+
+    沿一条随机的完整路径循环前进，到达结局后回到开场。
+    """
+    engine = StoryEngine(content)
+    rng = random.Random(0)
+    path = []  # [(场景编号, 选项下标, 选项)]
+    progress = engine.new_progress()
+    while True:
+        scene = progress.get_current_scene()
+        visible = engine.visible_choice_indices(progress, scene) if scene else ()
+        if engine.is_ending(scene) or not visible:
+            break
+        index = rng.choice(visible)
+        path.append((progress.state_number, index, scene.choices[index]))
+        engine.apply_choice(progress, scene.choices[index], index)
+
+    state = {'progress': engine.new_progress(), 'step': 0}
+
+    def step():
+        if state['step'] == len(path):
+            state['progress'] = engine.new_progress()
+            state['step'] = 0
+        progress = state['progress']
+        number, index, choice = path[state['step']]
+        progress.state_number = number
+        progress.make_choice(choice.next_state, choice.text)
+        progress.advance(index)
+        state['step'] += 1
+        return progress.get_current_scene()
+
+    def apply():
+        if state['step'] == len(path):
+            state['progress'] = engine.new_progress()
+            state['step'] = 0
+        progress = state['progress']
+        number, index, choice = path[state['step']]
+        progress.state_number = number
+        state['step'] += 1
+        return engine.apply_choice(progress, choice, index)
+
+    return [
+        measure('make_choice_transition', 'story', step, {'path_length': len(path)},
+                repeat=options.repeat, min_time=options.min_time),
+        measure('engine_apply_choice', 'story', apply, {'path_length': len(path)},
+                repeat=options.repeat, min_time=options.min_time),
+    ]
+
+
+def _replay_cases(options, content: StoryContent) -> List[BenchmarkResult]:
+    """
+    选择记录回放：整段回放（含建立检查点），以及检查点建好后跳到最后一步
+
+    记录由多局随机游玩拼接而成，每局开头回放器会切换回开场。
+    """
+    results = []
+    for size in options.sizes:
+        choices = progress_with_choices(content, size).choices_made
+        results.append(measure(
+            'replay_full', 'story', lambda: Replay(choices, content).verify(),
+            {'choices': size}, repeat=options.repeat, min_time=options.min_time))
+        replay = Replay(choices, content)
+        replay.verify()
+        results.append(measure(
+            'replay_seek', 'story', lambda: replay.seek(size - 1),
+            {'choices': size, 'checkpoint_every': replay.checkpoint_every},
+            repeat=options.repeat, min_time=options.min_time))
+    return results
+
+
+def _script_cases(options, content: StoryContent) -> List[BenchmarkResult]:
+    """
+    剧本脚本编译：全部重新编译，以及同一个编译器在只改动一个场景后的增量编译
+
+    脚本由现有章节导出，按 copies 份复制（场景ID加后缀）模拟更长的剧本。
+    """
+    chapters = {}
+    for scene_id, scene in content.scenes.items():
+        chapters.setdefault(content.chapter_of(scene_id), {})[scene_id] = scene
+    base = [format_chapter(chapter, scenes) for chapter, scenes in sorted(chapters.items())]
+    results = []
+    for copies in (1, 10):
+        texts = [(f'chapter{index}.md', text) for index, text in enumerate(base)]
+        for copy in range(1, copies):
+            texts.extend((f'copy{copy}_{index}.md', text.replace('\n## ', f'\n## c{copy}_'))
+                         for index, text in enumerate(base))
+        chars = sum(len(text) for _, text in texts)
+        results.append(measure(
+            'script_compile_full', 'story', lambda: ScriptCompiler().compile_texts(texts),
+            {'chars': chars}, repeat=options.repeat, min_time=options.min_time))
+
+        # 在第一个场景末尾交替追加 / 去掉一行，每次调用都只有这一个小节变化
+        compiler = ScriptCompiler()
+        compiler.compile_texts(texts)
+        first_path, first_text = texts[0]
+        heading_end = first_text.index('\n', first_text.index('\n## ') + 1)
+        edited = first_text[:heading_end] + '\n@audio benchmark' + first_text[heading_end:]
+        versions = [[(first_path, edited)] + texts[1:], texts]
+        state = {'turn': 0}
+
+        def incremental():
+            state['turn'] ^= 1
+            return compiler.compile_texts(versions[state['turn']])
+        results.append(measure(
+            'script_compile_incremental', 'story', incremental,
+            {'chars': chars}, repeat=options.repeat, min_time=options.min_time))
+    return results
+
+
+def run(options) -> List[BenchmarkResult]:
+    content = StoryContent(prefetch=False)
+    content.scenes  # 全部加载，后面的用例不包含章节加载时间
+    return _content_cases(options) + _progress_cases(options, content) + \
+        _transition_cases(options, content) + _replay_cases(options, content) + \
+        _script_cases(options, content)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试计时与结果记录
+
+每个用例先校准每轮调用次数（一轮至少 min_time 秒），再重复若干轮，
+记录单次调用耗时的最小值 / 中位数 / 平均值 / 标准差。
+结果连同运行环境一起写成 JSON，compare() 按用例名和参数对比两份结果的最小值
+（最小值受机器上其他负载的影响最小，比中位数更适合判断回退）。
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RESULT_SCHEMA = 1
+
+
+@dataclass
+class BenchmarkResult:
+    """一个用例的计时结果（时间单位：秒 / 次）"""
+    name: str
+    group: str
+    params: Dict[str, Any]
+    repeat: int
+    number: int
+    min: float
+    median: float
+    mean: float
+    stdev: float
+    extra: Dict[str, Any] = field(default_factory=dict)  # 用例自己的附加指标，如字符速率
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """对比两份结果时用来匹配用例"""
+        return self.name, json.dumps(self.params, sort_keys=True)
+
+    @property
+    def ops_per_sec(self) -> float:
+        return 1.0 / self.median if self.median > 0 else float('inf')
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['ops_per_sec'] = self.ops_per_sec
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BenchmarkResult':
+        fields = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        return cls(**fields)
+
+
+def _calibrate(func: Callable[[], Any], min_time: float) -> int:
+    """找到使一轮耗时不少于 min_time 的调用次数"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            return number
+        # 按实际耗时估算，最多放大 10 倍，避免第一次调用过快导致估算失真
+        number = min(number * 10, max(number + 1, int(number * min_time / max(elapsed, 1e-9) * 1.2)))
+
+
+def measure(name: str, group: str, func: Callable[[], Any],
+            params: Optional[Dict[str, Any]] = None,
+            repeat: int = 5, min_time: float = 0.2,
+            number: Optional[int] = None) -> BenchmarkResult:
+    """
+    计时一个无参调用
+
+    Args:
+        func: 被测调用（状态需要在外部准备好，调用本身即一次操作）
+        repeat: 重复轮数
+        min_time: 校准时每轮的最短耗时（秒）
+        number: 每轮调用次数；指定后不再校准
+    """
+    if number is None:
+        number = _calibrate(func, min_time)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return from_timings(name, group, timings, params, number)
+
+
+def from_timings(name: str, group: str, timings: List[float],
+                 params: Optional[Dict[str, Any]] = None, number: int = 1,
+                 extra: Optional[Dict[str, Any]] = None) -> BenchmarkResult:
+    """由已测得的单次耗时列表构造结果（用于在子进程等外部计时的用例）"""
+    return BenchmarkResult(
+        name=name, group=group, params=dict(params or {}),
+        repeat=len(timings), number=number,
+        min=min(timings), median=statistics.median(timings), mean=statistics.fmean(timings),
+        stdev=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        extra=dict(extra or {}))
+
+
+# ---------- 运行环境 ----------
+def _git_commit(root: str) -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def environment_info(root: str) -> Dict[str, Any]:
+    """记录结果时附带的运行环境"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': _git_commit(root),
+    }
+
+
+# ---------- 读写 / 对比 ----------
+def write_results(path: str, results: List[BenchmarkResult], environment: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    document = {
+        'schema': RESULT_SCHEMA,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment,
+        'results': [result.to_dict() for result in results],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+
+def read_results(path: str) -> List[BenchmarkResult]:
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('schema') != RESULT_SCHEMA:
+        raise ValueError(f"不支持的结果格式: {path}")
+    return [BenchmarkResult.from_dict(item) for item in document['results']]
+
+
+def compare(baseline: List[BenchmarkResult], current: List[BenchmarkResult],
+            threshold: float = 0.2) -> List[Tuple[BenchmarkResult, BenchmarkResult, float, bool]]:
+    """
+    按用例对比单次耗时的最小值
+
+    Returns:
+        [(基线结果, 当前结果, 当前/基线 比值, 是否变慢超过 threshold)]，只包含两边都有的用例
+    """
+    previous = {result.key: result for result in baseline}
+    rows = []
+    for result in current:
+        old = previous.get(result.key)
+        if old is None or old.min <= 0:
+            continue
+        ratio = result.min / old.min
+        rows.append((old, result, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def format_time(seconds: float) -> str:
+    """把秒数格式化为合适的单位"""
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def format_result(result: BenchmarkResult) -> str:
+    params = ' '.join(f"{key}={value}" for key, value in result.params.items())
+    line = f"{result.group:<8} {result.name:<28} {params:<28} " \
+           f"{format_time(result.median):>10} ±{format_time(result.stdev):>9}"
+    if result.extra:
+        line += '  ' + ' '.join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                for key, value in result.extra.items())
+    return line
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台自动存档
+
+游戏线程每次选择后只把进度快照（StoryProgress.snapshot()）交给 AutosaveWorker，
+不做任何文件 I/O。工作线程按槽位合并快照，同一槽位在一个间隔内只写最新的一份；
+退出、Ctrl+C 或收到终止信号时调用 flush()/close() 同步写完剩余快照。
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+from game_engine.save_manager import SaveManager
+
+
+class AutosaveWorker:
+    """合并写入的后台存档线程"""
+
+    def __init__(self, save_manager: SaveManager, interval: float = 2.0):
+        """
+        Args:
+            save_manager: 实际执行保存的存档管理器
+            interval: 两次写入之间的最短间隔（秒）
+        """
+        self.save_manager = save_manager
+        self.interval = interval
+        self._pending = {}  # 槽位 -> 最新的进度快照
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # 保证同一时刻只有一次写入
+        self._thread = None
+        self._closed = False
+        self._last_write = 0.0
+        self.writes = 0
+        self.last_error = None
+
+    def submit(self, slot: int, data: Dict[str, Any]):
+        """提交一份进度快照（调用方之后不得再修改 data）"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("自动存档已关闭")
+            self._pending[slot] = data
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    @property
+    def pending(self) -> bool:
+        """是否还有未写入的快照"""
+        with self._cond:
+            return bool(self._pending)
+
+    def _take(self) -> Dict[int, Dict[str, Any]]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def _write(self, batch: Dict[int, Dict[str, Any]]) -> bool:
+        """写入一批快照，返回是否成功；失败时放回队列（已有更新快照的槽位除外）"""
+        if not batch:
+            return True
+        try:
+            self.save_manager.save_many(batch)
+            self.writes += 1
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = e
+            with self._cond:
+                for slot, data in batch.items():
+                    self._pending.setdefault(slot, data)
+            return False
+        finally:
+            self._last_write = time.monotonic()
+
+    def _run(self):
+        """工作线程：有快照时等到距上次写入满一个间隔，再一次写出所有槽位"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # 间隔内到达的快照会覆盖同槽位的旧快照，合并成一次写入
+                remaining = self._last_write + self.interval - time.monotonic()
+                while remaining > 0 and not self._closed:
+                    self._cond.wait(remaining)
+                    remaining = self._last_write + self.interval - time.monotonic()
+                if self._closed:
+                    return
+            # 与 flush() 相同的加锁顺序：先写锁再取队列；队列可能已被 flush() 取空
+            with self._write_lock:
+                with self._cond:
+                    batch = self._take()
+                self._write(batch)
+
+    def flush(self) -> bool:
+        """
+        同步写出所有未写入的快照（等待正在进行的写入完成）
+
+        返回是否全部写入成功；失败时快照留在队列中，错误见 last_error。
+        """
+        with self._write_lock:
+            with self._cond:
+                batch = self._take()
+            return self._write(batch)
+
+    def close(self) -> bool:
+        """停止工作线程并写出剩余快照，返回是否全部写入成功（见 flush）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.flush()
+
+    def __enter__(self) -> 'AutosaveWorker':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
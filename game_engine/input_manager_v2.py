@@ -4,6 +4,7 @@
 轻量级输入管理器 - 不干扰终端格式
 """
 
+import os
 import sys
 import select
 import threading
@@ -42,10 +43,14 @@ class LightweightInputManager:
     
     def flush_input(self):
         """清空输入缓冲区"""
+        # 跳过监听器在运行时，按键由它读取并用于跳过渲染，这里不再丢弃
+        if skip_monitor.active:
+            return
         try:
             # 使用select检查是否有输入
             while sys.stdin in select.select([sys.stdin], [], [], 0.0)[0]:
-                sys.stdin.read(1)
+                if not sys.stdin.read(1):
+                    break  # 输入已结束（EOF）
         except (ImportError, OSError, ValueError):
             # 在某些系统上可能不支持select，忽略
             pass
@@ -59,8 +64,87 @@ class LightweightInputManager:
         """上下文管理器出口"""
         self.unblock_input()
 
+class SkipMonitor:
+    """渲染期间的非阻塞按键监听器
+
+    后台线程用 select 轮询标准输入，读到按键即设置 skip_event，
+    渲染器据此立即输出剩余文字、跳过停顿。只在 listening() 期间运行，
+    读取 input() 之前会先停止，不会吞掉玩家的选择输入。
+    终端处于行缓冲模式时，按回车才会触发。
+    """
+    
+    def __init__(self, poll_interval: float = 0.05):
+        self.poll_interval = poll_interval
+        self.skip_event = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def active(self) -> bool:
+        """监听线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self, fd: int):
+        """监听线程主循环"""
+        while not self._stop.is_set():
+            try:
+                ready = select.select([fd], [], [], self.poll_interval)[0]
+                if not ready:
+                    continue
+                if not os.read(fd, 1024):
+                    return  # 输入已结束（EOF）
+            except (OSError, ValueError):
+                return
+            self.skip_event.set()
+    
+    def start(self):
+        """开始监听（标准输入不是终端时不监听，避免读走管道中的输入）"""
+        if self.active:
+            return
+        try:
+            if not sys.stdin.isatty():
+                return
+            fd = sys.stdin.fileno()
+        except (AttributeError, OSError, ValueError):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(fd,), daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止监听并等待线程退出"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def listening(self):
+        """上下文管理器：进入时清除跳过标记并开始监听，退出时停止"""
+        return _SkipListening(self)
+
+class _SkipListening:
+    """SkipMonitor.listening() 的上下文对象"""
+    
+    def __init__(self, monitor: SkipMonitor):
+        self.monitor = monitor
+        self._started = False
+    
+    def __enter__(self):
+        # 嵌套使用时沿用外层的监听和跳过状态
+        self._started = not self.monitor.active
+        if self._started:
+            self.monitor.skip_event.clear()
+            self.monitor.start()
+        return self.monitor
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._started:
+            self.monitor.stop()
+            self.monitor.skip_event.clear()
+
 # 全局实例
 lightweight_input_manager = LightweightInputManager()
+skip_monitor = SkipMonitor()
 
 class LightweightInputBlocker:
     """轻量级输入阻止器"""
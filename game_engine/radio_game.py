@@ -10,7 +10,9 @@ import time
 import json
 import random
 import threading
+import signal
 from datetime import datetime
+from typing import Optional
 
 # 导入故事系统
 import sys
@@ -18,8 +20,17 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from story_system import StoryProgress, StoryContent, CharacterManager
-from game_engine.input_manager_v2 import LightweightInputBlocker
+from story_system.story_engine import StoryEngine
+from game_engine.input_manager_v2 import LightweightInputBlocker, skip_monitor
 from game_engine.save_manager import SaveManager
+from game_engine.autosave import AutosaveWorker
+from game_engine import signal_noise
+from game_engine.telemetry import telemetry
+from game_engine.text_renderer import default_renderer
+from game_engine.scene_render import COLOR_CODES, COLOR_RESET, TerminalCaps, scene_render_cache
+
+# 渲染期间按键即可跳过剩余文字
+default_renderer.skip_event = skip_monitor.skip_event
 
 class TypewriterEffect:
     """打字机效果输出"""
@@ -27,61 +38,51 @@ class TypewriterEffect:
     @staticmethod
     def type_out(text: str, delay: float = 0.05, color: str = None):
         """逐字输出文字（带输入阻止）"""
-        colors = {
-            'red': '\033[91m',
-            'green': '\033[92m',
-            'yellow': '\033[93m',
-            'blue': '\033[94m',
-            'purple': '\033[95m',
-            'cyan': '\033[96m',
-            'white': '\033[97m',
-            'gray': '\033[90m'
-        }
+        prefix = COLOR_CODES.get(color, '') if color else ''
+        suffix = COLOR_RESET + '\n' if color else '\n'
         
         # 使用轻量级输入阻止器，不影响终端格式
         with LightweightInputBlocker(flush=True):
-            if color and color in colors:
-                sys.stdout.write(colors[color])
-            
-            # 逐字符输出，保持原有格式
-            for char in text:
-                sys.stdout.write(char)
-                sys.stdout.flush()
-                time.sleep(delay)
-            
-            if color:
-                sys.stdout.write('\033[0m')
-            
-            sys.stdout.write('\n')
-            sys.stdout.flush()
+            # 按帧批量输出，颜色码随首帧/末帧一起写出
+            default_renderer.type_out(text, delay, prefix, suffix)
+    
+    @staticmethod
+    def play_segments(segments):
+        """输出预渲染的字节段（带输入阻止）"""
+        with LightweightInputBlocker(flush=True):
+            for segment in segments:
+                default_renderer.play_segment(segment)
+    
+    @staticmethod
+    def pause(seconds: float):
+        """停顿（期间阻止输入）"""
+        with LightweightInputBlocker(flush=True):
+            default_renderer.pause(seconds)
 
 class SignalEffect:
     """信号干扰效果"""
     
     @staticmethod
-    def add_noise(text: str, strength: float = 0.1) -> str:
-        """添加信号干扰"""
-        noise_chars = ['▒', '░', '▓', '█', '■', '□', '▪', '▫']
-        result = ""
-        
-        for char in text:
-            if random.random() < strength:
-                if random.random() < 0.5:
-                    result += random.choice(noise_chars)
-                else:
-                    result += ' '
-            else:
-                result += char
+    def add_noise(text: str, strength: Optional[float] = None, frequency: Optional[int] = None,
+                  variant: int = 0, seed: Optional[int] = None) -> str:
+        """添加信号干扰
         
-        return result
+        指定 frequency 时使用该频率的干扰配置（strength 可覆盖其强度），
+        结果可复现并被缓存（见 signal_noise.py）；否则按 strength（默认 0.1）随机生成。
+        seed 为回放用的干扰种子（见 story_system/replay.py），指定后结果只由种子决定。
+        """
+        if frequency is not None:
+            return signal_noise.noised(text, frequency, variant, strength, seed or 0)
+        rng = random.Random(seed) if seed is not None else None
+        return signal_noise.corrupt(text, 0.1 if strength is None else strength, rng)
     
     @staticmethod
-    def simulate_static(duration: float = 1.0):
-        """模拟静电噪音"""
+    def simulate_static(duration: float = 1.0, seed: Optional[int] = None):
+        """模拟静电噪音（指定 seed 时噪音内容可复现）"""
         static_chars = ['嘶——', '沙沙...', '...滋...', '[信号中断]', '[频道干扰]']
-        with LightweightInputBlocker(flush=True):
-            TypewriterEffect.type_out(random.choice(static_chars), 0.1, 'gray')
-            time.sleep(duration)
+        rng = random.Random(seed) if seed is not None else random
+        TypewriterEffect.type_out(rng.choice(static_chars), 0.1, 'gray')
+        TypewriterEffect.pause(duration)
 
 class Character:
     """可通话角色"""
@@ -96,19 +97,22 @@ class Character:
 class RadioGame:
     """集成故事系统的主游戏类"""
     
-    def __init__(self):
+    def __init__(self, save_manager: Optional[SaveManager] = None):
         self.current_frequency = 14250
         self.game_time = 0
         self.game_active = True
         
         # 初始化存档管理器
-        self.save_manager = SaveManager()
+        self.save_manager = save_manager or SaveManager()
         self.current_save_slot = None
+        self.autosave = AutosaveWorker(self.save_manager)
         
-        # 初始化故事系统
-        self.story_progress = StoryProgress()
-        self.story_content = StoryContent()
+        # 初始化故事系统（故事内容全进程共享，进度按会话独立）
+        self.story_content = StoryContent.shared()
+        self.story_progress = StoryProgress(story_content=self.story_content)
         self.character_manager = self.story_progress.character_manager
+        self.story_engine = StoryEngine(self.story_content,
+                                        action_handler=lambda action, progress: self._handle_special_action(action))
         
         # 游戏状态
         self.current_scene = None
@@ -118,17 +122,22 @@ class RadioGame:
         
         # 兼容旧版本的characters
         self.characters = {}
+        self._started = time.perf_counter()  # 遥测：到第一次输入的时间从这里算起
         
     def load_save(self):
         """加载存档（使用SaveManager）"""
+        if telemetry.enabled:
+            telemetry.observe('time_to_first_input_seconds', time.perf_counter() - self._started)
         slot = self.save_manager.select_save_slot()
         if slot is None:
             return False
             
         story_progress = self.save_manager.load_from_slot(slot)
         if story_progress is None:
-            # 空槽位，开始新游戏
-            self.story_progress = StoryProgress()
+            # 空槽位，开始新游戏（沿用开场时的会话种子，开场干扰也能回放）
+            session_seed = self.story_progress.session_seed
+            self.story_progress = StoryProgress(story_content=self.story_content)
+            self.story_progress.session_seed = session_seed
             self.current_save_slot = slot
             TypewriterEffect.type_out(f"开始新游戏 - 存档 {slot}", 0.05, 'green')
             return True
@@ -139,71 +148,90 @@ class RadioGame:
         TypewriterEffect.type_out(f"继续游戏 - 存档 {slot}", 0.05, 'green')
         return True
     
-    def save_game(self):
-        """保存游戏（使用SaveManager）"""
+    def autosave_progress(self) -> bool:
+        """把当前进度快照交给后台自动存档（不做文件 I/O）"""
         if self.current_save_slot is None:
+            return False
+        self.autosave.submit(self.current_save_slot, self.story_progress.snapshot())
+        return True
+    
+    def save_game(self, sync: bool = False):
+        """
+        保存游戏（交给后台自动存档写入）
+        
+        Args:
+            sync: 是否等待写入完成（退出和中断时使用）
+        """
+        if not self.autosave_progress():
             TypewriterEffect.type_out("错误：未选择存档槽位", 0.05, 'red')
             return
-            
-        self.save_manager.save_to_slot(self.current_save_slot, self.story_progress)
-        TypewriterEffect.type_out(f"游戏进度已保存到存档 {self.current_save_slot}。", 0.05, 'green')
+        if sync and not self.autosave.flush():
+            TypewriterEffect.type_out(f"保存到存档 {self.current_save_slot} 失败：{self.autosave.last_error}", 0, 'red')
+            return
+        TypewriterEffect.type_out(f"游戏进度已保存到存档 {self.current_save_slot}。", 0, 'green')
+    
+    def shutdown(self):
+        """写出所有未保存的进度并停止自动存档线程（开启遥测时同时写出指标）"""
+        self.autosave_progress()
+        if not self.autosave.close():
+            TypewriterEffect.type_out(f"退出前保存进度失败：{self.autosave.last_error}", 0, 'red')
+        if telemetry.enabled:
+            telemetry.write()
     
     def intro(self):
         """游戏开场 - 简化版"""
         TypewriterEffect.type_out("=== 崖边电台主持人 ===", 0.1, 'cyan')
         
         # 在等待期间阻止输入
-        with LightweightInputBlocker(flush=True):
-            time.sleep(1)
+        TypewriterEffect.pause(1)
         
-        SignalEffect.simulate_static(1.0)
+        # 开场干扰使用本次会话的种子（新游戏沿用这个会话，见 load_save）
+        SignalEffect.simulate_static(1.0, seed=self.story_progress.noise_seed)
     
-    def display_scene(self, scene):
-        """显示故事场景"""
-        if not scene:
-            return
-        
-        # 显示场景标题
-        if scene.title:
-            TypewriterEffect.type_out(f"\n=== {scene.title} ===", 0.05, 'cyan')
+    def display_scene(self, scene) -> bool:
+        """显示故事场景并处理选择（渲染期间按回车可跳过本场景剩余文字）
         
-        # 显示场景内容
-        for content in scene.content:
-            TypewriterEffect.type_out(content, 0.05)
-            # 在等待期间阻止输入
-            with LightweightInputBlocker(flush=True):
-                time.sleep(0.5)
+        Returns:
+            是否做出了选择（没有可选选项时为 False）
+        """
+        if not scene:
+            return False
         
-        # 显示选择选项
-        if scene.choices:
-            TypewriterEffect.type_out("\n请选择:", 0.05, 'yellow')
-            for i, choice in enumerate(scene.choices, 1):
-                TypewriterEffect.type_out(f"{i}. {choice.text}", 0.03, 'white')
+        # 条件不成立的选项不显示；标题、正文和选项列表使用缓存的预渲染字节段
+        visible = self.story_engine.visible_choice_indices(self.story_progress, scene)
+        rendered = scene_render_cache.get(scene, TerminalCaps.detect(), visible)
+        start = time.perf_counter()
+        writes, bytes_written = default_renderer.writes, default_renderer.bytes_written
+        with skip_monitor.listening():
+            TypewriterEffect.play_segments(rendered.body)
+            TypewriterEffect.play_segments(rendered.choices)
+        if telemetry.enabled:
+            telemetry.record_scene_render(scene.id, time.perf_counter() - start,
+                                          default_renderer.writes - writes,
+                                          default_renderer.bytes_written - bytes_written)
         
-        # 处理用户选择
-        if scene.choices:
+        # 处理用户选择（选择延迟包括阻塞在 input() 上的时间）
+        if visible:
+            prompt_start = time.perf_counter()
             while True:
                 try:
-                    choice = input("\n请输入选择 (1-{}): ".format(len(scene.choices)))
+                    choice = input("\n请输入选择 (1-{}): ".format(len(visible)))
                     choice_index = int(choice) - 1
-                    if 0 <= choice_index < len(scene.choices):
+                    if 0 <= choice_index < len(visible):
+                        choice_index = visible[choice_index]
                         selected_choice = scene.choices[choice_index]
-                        self.story_progress.make_choice(selected_choice.next_state, selected_choice.text)
-                        
-                        # 处理变量变化
-                        if selected_choice.variable_changes:
-                            for key, value in selected_choice.variable_changes.items():
-                                self.story_progress.set_variable(key, value)
-                        
-                        # 处理特殊动作
-                        if selected_choice.action:
-                            self._handle_special_action(selected_choice.action)
-                        
-                        break
+                        # 与无界面引擎共用同一套状态转移逻辑
+                        self.story_engine.apply_choice(self.story_progress, selected_choice, choice_index)
+                        self.autosave_progress()
+                        if telemetry.enabled:
+                            telemetry.observe('choice_latency_seconds', time.perf_counter() - prompt_start,
+                                              scene=scene.id)
+                        return True
                     else:
                         TypewriterEffect.type_out("无效选择，请重试。", 0.05, 'red')
                 except ValueError:
                     TypewriterEffect.type_out("请输入数字。", 0.05, 'red')
+        return False
     
     def _handle_special_action(self, action: str):
         """处理特殊动作（简化版）"""
@@ -220,15 +248,16 @@ class RadioGame:
                 # 获取当前场景
                 current_scene = self.story_progress.get_current_scene()
                 if current_scene:
-                    self.display_scene(current_scene)
+                    chosen = self.display_scene(current_scene)
                     
-                    # 检查是否到达结局
-                    if self._is_ending_scene(current_scene):
+                    # 检查是否到达结局（或没有可选选项的场景）
+                    if self._is_ending_scene(current_scene) or not chosen:
                         self.in_story_mode = False
                         break
                 else:
-                    # 如果没有当前场景，显示开场
-                    start_scene = self.story_content.get_scene("start")
+                    # 如果没有当前场景，回到开场
+                    self.story_progress.set_state("start")
+                    start_scene = self.story_progress.get_current_scene()
                     if start_scene:
                         self.display_scene(start_scene)
                     else:
@@ -237,20 +266,16 @@ class RadioGame:
                         
         except KeyboardInterrupt:
             TypewriterEffect.type_out("\n\n游戏中断。", 0.05, 'red')
-            self.save_game()
+            self.save_game(sync=True)
             raise
         except Exception as e:
             TypewriterEffect.type_out(f"发生错误: {e}", 0.05, 'red')
-            self.save_game()
+            self.save_game(sync=True)
             raise
     
     def _is_ending_scene(self, scene):
         """检查是否为结局场景"""
-        if not scene:
-            return False
-        
-        ending_ids = ['ending1_accept', 'ending2_knowledge', 'ending3_loop']
-        return scene.id in ending_ids
+        return StoryEngine.is_ending(scene)
     
     def show_help(self):
         """显示帮助信息（简化版）"""
@@ -272,15 +297,20 @@ class RadioGame:
             TypewriterEffect.type_out("已退出游戏。", 0.05, 'yellow')
             return
         
-        # 开始故事模式
-        self.start_story_mode()
-        
-        # 游戏结束
-        TypewriterEffect.type_out("游戏结束。", 0.05, 'cyan')
-        self.save_game()
+        try:
+            # 开始故事模式
+            self.start_story_mode()
+            
+            # 游戏结束
+            TypewriterEffect.type_out("游戏结束。", 0.05, 'cyan')
+            self.save_game()
+        finally:
+            self.shutdown()
 
 def main():
     """主函数"""
+    # 终止信号按正常退出处理，run() 会在退出前写完存档
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     game = RadioGame()
     game.run()
 
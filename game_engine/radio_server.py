@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+崖边电台 - 多人网络服务端
+
+在一个 asyncio 事件循环中为多个玩家提供基于行的 TCP 会话（可用 nc / telnet 连接）。
+所有会话共享同一份 StoryContent 和场景预渲染缓存；每个会话拥有自己的
+StoryProgress、存档档案和槽位。打字机节奏使用 asyncio.sleep，
+等待输入或慢速渲染中的会话几乎不占 CPU；存档在线程池中写入，不阻塞事件循环。
+
+--reload 时监视章节模块，修改后的章节在不重启服务、不断开会话的情况下替换进来
+（见 story_system/hot_reload.py）。
+
+用法：
+    python -m game_engine.radio_server [--host 127.0.0.1] [--port 14250] [--sqlite saves/saves.db] [--reload]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from story_system import StoryContent, StoryProgress
+from story_system.hot_reload import HotReloader
+from story_system.story_engine import StoryEngine
+from game_engine.save_backends import (
+    DEFAULT_PROFILE, JsonSaveBackend, SaveBackend, SqliteSaveBackend, check_profile
+)
+from game_engine.save_manager import SaveManager
+from game_engine.scene_render import (
+    CONTENT_DELAY, TerminalCaps, compile_segment, scene_render_cache
+)
+from game_engine.telemetry import telemetry
+from game_engine.text_renderer import AsyncFrameRenderer
+
+DEFAULT_PORT = 14250
+
+
+class SessionClosed(Exception):
+    """客户端断开或输入 quit"""
+
+
+class RadioSession:
+    """一个玩家连接"""
+
+    def __init__(self, server: 'RadioServer', reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.caps = server.caps
+        self.renderer = AsyncFrameRenderer(writer, fps=server.fps, instant=server.instant)
+        self.engine = StoryEngine(server.story_content, action_handler=self._handle_action)
+        self.progress: Optional[StoryProgress] = None
+        self.save_manager: Optional[SaveManager] = None
+        self.slot: Optional[int] = None
+        self._lines: asyncio.Queue = asyncio.Queue()
+        self._rendering = False
+        self._pending_save = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._started = time.perf_counter()  # 遥测：连接建立的时间
+        self._asked = False
+
+    # ---------- 输入 ----------
+    async def _read_lines(self):
+        """读取客户端输入：渲染期间的输入只用于跳过文字，其余放入队列"""
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                if self._rendering:
+                    self.renderer.skip = True
+                    continue
+                await self._lines.put(line.decode('utf-8', 'replace').strip())
+        except (ConnectionError, ValueError):
+            pass  # 连接中断或单行过长
+        await self._lines.put(None)
+
+    async def ask(self, prompt: str) -> str:
+        """显示提示并等待一行输入（quit 或断开时抛出 SessionClosed）"""
+        await self.renderer.write(prompt.encode(self.caps.encoding, 'replace'))
+        if telemetry.enabled and not self._asked:
+            telemetry.observe('time_to_first_input_seconds', time.perf_counter() - self._started)
+        self._asked = True
+        line = await self._lines.get()
+        if line is None or line.lower() == 'quit':
+            raise SessionClosed()
+        return line
+
+    # ---------- 输出 ----------
+    async def play(self, segments):
+        """按打字机节奏输出字节段；期间的任何输入都会跳过剩余文字"""
+        self._rendering = True
+        self.renderer.skip = False
+        try:
+            for segment in segments:
+                await self.renderer.play_segment(segment)
+        finally:
+            self._rendering = False
+            self.renderer.skip = False
+
+    async def say(self, text: str, color: Optional[str] = None, delay: float = 0.0):
+        """输出一行提示文字"""
+        await self.play((compile_segment(text, delay, color, self.caps),))
+
+    # ---------- 存档 ----------
+    def schedule_save(self):
+        """提交当前进度快照；上一次写入未完成时只保留最新一份"""
+        if self.progress is None or self.slot is None:
+            return
+        self._pending_save = self.progress.snapshot()
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_loop())
+
+    async def _save_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._pending_save is not None:
+            data, self._pending_save = self._pending_save, None
+            try:
+                await loop.run_in_executor(self.server.save_executor,
+                                           self.save_manager.save_data_to_slot, self.slot, data)
+            except Exception as e:
+                self.server.log(f"存档失败（{self.save_manager.profile}/{self.slot}）：{e}")
+
+    async def flush_save(self):
+        """保存当前进度并等待写入完成"""
+        self.schedule_save()
+        if self._save_task is not None:
+            await asyncio.shield(self._save_task)
+
+    def _handle_action(self, action: str, progress: StoryProgress):
+        if action == "save":
+            self.schedule_save()
+
+    # ---------- 流程 ----------
+    async def choose_profile(self) -> SaveManager:
+        while True:
+            name = await self.ask("请输入档案名（直接回车使用 default）：") or DEFAULT_PROFILE
+            try:
+                check_profile(name)
+                return self.server.save_manager_for(name)
+            except ValueError as e:
+                await self.say(str(e), 'red')
+
+    async def choose_slot(self) -> int:
+        loop = asyncio.get_running_loop()
+        saves = await loop.run_in_executor(self.server.save_executor, self.save_manager.get_save_files)
+        await self.say("\n请选择存档槽位：", 'cyan')
+        for save in saves:
+            if save['exists']:
+                await self.say(f"  {save['slot']}. 存档 {save['slot']} - {save['play_time']} - "
+                               f"第{save['current_chapter']}章 - {save['choices_count']}个选择", 'white')
+            else:
+                await self.say(f"  {save['slot']}. 空槽位 - 开始新游戏", 'gray')
+        max_slots = self.save_manager.max_slots
+        while True:
+            choice = await self.ask(f"输入槽位编号 (1-{max_slots})，或输入 'quit' 退出：")
+            if not (choice.isdigit() and 1 <= int(choice) <= max_slots):
+                await self.say(f"请输入 1-{max_slots} 之间的数字或 'quit'！", 'red')
+            elif not self.server.claim_slot(self.save_manager.profile, int(choice)):
+                await self.say(f"存档 {choice} 正在被另一个连接使用，请选择其他槽位。", 'red')
+            else:
+                return int(choice)
+
+    async def load_progress(self) -> StoryProgress:
+        loop = asyncio.get_running_loop()
+        progress = await loop.run_in_executor(self.server.save_executor, self.save_manager.load_from_slot,
+                                              self.slot, self.server.story_content)
+        if progress is None:
+            await self.say(f"开始新游戏 - 存档 {self.slot}", 'green')
+            return StoryProgress(story_content=self.server.story_content)
+        await self.say(f"继续游戏 - 存档 {self.slot}", 'green')
+        return progress
+
+    async def story_loop(self):
+        progress = self.progress
+        while True:
+            scene = progress.get_current_scene()
+            if scene is None:
+                progress.set_state("start")
+                scene = progress.get_current_scene()
+                if scene is None:
+                    await self.say("没有找到可用的场景。", 'red')
+                    return
+            visible = self.engine.visible_choice_indices(progress, scene)
+            rendered = scene_render_cache.get(scene, self.caps, visible)
+            start = time.perf_counter()
+            writes, bytes_written = self.renderer.writes, self.renderer.bytes_written
+            await self.play(rendered.body + rendered.choices)
+            if telemetry.enabled:
+                telemetry.record_scene_render(scene.id, time.perf_counter() - start,
+                                              self.renderer.writes - writes,
+                                              self.renderer.bytes_written - bytes_written)
+            if self.engine.is_ending(scene) or not visible:
+                return
+
+            prompt_start = time.perf_counter()
+            while True:
+                answer = await self.ask(f"\n请输入选择 (1-{len(visible)}): ")
+                if answer.isdigit() and 1 <= int(answer) <= len(visible):
+                    break
+                await self.say("无效选择，请重试。", 'red')
+            index = visible[int(answer) - 1]
+            self.engine.apply_choice(progress, scene.choices[index], index)
+            self.schedule_save()
+            if telemetry.enabled:
+                telemetry.observe('choice_latency_seconds', time.perf_counter() - prompt_start, scene=scene.id)
+
+    async def run(self):
+        reader_task = asyncio.ensure_future(self._read_lines())
+        try:
+            await self.say("=== 崖边电台主持人 ===", 'cyan', CONTENT_DELAY)
+            self.save_manager = await self.choose_profile()
+            self.slot = await self.choose_slot()
+            self.progress = await self.load_progress()
+            await self.story_loop()
+            await self.say("游戏结束。", 'cyan')
+        except SessionClosed:
+            pass
+        except ConnectionError:
+            pass
+        finally:
+            reader_task.cancel()
+            try:
+                await self.flush_save()
+            except Exception as e:
+                self.server.log(f"退出时存档失败：{e}")
+            if self.slot is not None:
+                self.server.release_slot(self.save_manager.profile, self.slot)
+            try:
+                self.writer.close()
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+class RadioServer:
+    """多会话电台服务端"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 backend: Optional[SaveBackend] = None,
+                 story_content: Optional[StoryContent] = None,
+                 max_slots: int = 5, fps: int = 15, instant: bool = False,
+                 caps: Optional[TerminalCaps] = None, save_workers: int = 4,
+                 backlog: int = 1024, reloader: Optional[HotReloader] = None):
+        """
+        Args:
+            host / port: 监听地址
+            backend: 存档后端（所有会话共用），默认 JsonSaveBackend("saves")
+            story_content: 故事内容，默认进程内共享实例
+            max_slots: 每个档案的存档槽位数
+            fps: 打字机帧率
+            instant: 即时文字模式（测试用）
+            caps: 客户端终端能力，默认彩色 UTF-8
+            save_workers: 存档写入线程数
+            backlog: 等待接受的连接队列长度（大量客户端同时连接时需要足够大）
+            reloader: 故事内容热重载器，提供时在事件循环中轮询（替换只发生在会话两步之间）
+        """
+        self.host = host
+        self.port = port
+        self.backend = backend or JsonSaveBackend("saves")
+        self.story_content = story_content or StoryContent.shared()
+        self.max_slots = max_slots
+        self.fps = fps
+        self.instant = instant
+        self.caps = caps or TerminalCaps(color=True, encoding='utf-8')
+        self.backlog = backlog
+        self.save_executor = ThreadPoolExecutor(max_workers=save_workers, thread_name_prefix="radio-save")
+        self.sessions: Dict[RadioSession, asyncio.Task] = {}  # 会话 -> 处理它的任务
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._claimed_slots: Set[Tuple[str, int]] = set()  # 正在被会话使用的 (档案, 槽位)
+        self.reloader = reloader
+        self._reload_task: Optional[asyncio.Task] = None
+
+    def log(self, message: str):
+        print(message, file=sys.stderr)
+
+    def save_manager_for(self, profile: str) -> SaveManager:
+        """为会话创建存档管理器（共用后端，增量基线按会话独立）"""
+        return SaveManager(max_slots=self.max_slots, backend=self.backend, profile=profile,
+                           story_content=self.story_content)
+
+    def claim_slot(self, profile: str, slot: int) -> bool:
+        """占用一个槽位；同一槽位同时只允许一个会话写入"""
+        key = (profile, slot)
+        if key in self._claimed_slots:
+            return False
+        self._claimed_slots.add(key)
+        return True
+
+    def release_slot(self, profile: str, slot: int):
+        self._claimed_slots.discard((profile, slot))
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = RadioSession(self, reader, writer)
+        task = asyncio.current_task()
+        self.sessions[session] = task
+        try:
+            await session.run()
+        finally:
+            self.sessions.pop(session, None)
+
+    async def start(self):
+        """开始监听（端口为 0 时由系统分配，实际端口写回 self.port）"""
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                  backlog=self.backlog)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.reloader is not None and self._reload_task is None:
+            self._reload_task = asyncio.ensure_future(self.reloader.watch())
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """停止监听，等待各会话保存后退出"""
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            self._reload_task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        tasks = list(self.sessions.values())
+        for task in tasks:
+            task.cancel()
+        # 被取消的会话在退出前仍会写完存档
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.save_executor.shutdown(wait=True)
+        if telemetry.enabled:
+            telemetry.write()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="崖边电台多人服务端")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--saves-dir", default="saves", help="JSON 存档目录")
+    parser.add_argument("--sqlite", default=None, help="使用 SQLite 存档数据库（路径）")
+    parser.add_argument("--instant", action="store_true", help="不使用打字机效果")
+    parser.add_argument("--no-color", action="store_true", help="不输出颜色码")
+    parser.add_argument("--reload", action="store_true", help="章节模块修改后热重载（不重启、不断开会话）")
+    args = parser.parse_args(argv)
+
+    backend = SqliteSaveBackend(args.sqlite) if args.sqlite else JsonSaveBackend(args.saves_dir)
+    server = RadioServer(args.host, args.port, backend=backend, instant=args.instant,
+                         caps=TerminalCaps(color=not args.no_color, encoding='utf-8'))
+    if args.reload:
+        server.reloader = HotReloader(server.story_content, log=server.log)
+
+    async def serve():
+        await server.start()
+        print(f"电台已开播：{server.host}:{server.port}", file=sys.stderr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
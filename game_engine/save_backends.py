@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存档存储后端
+
+SaveManager 只负责槽位校验、增量计算和交互界面，实际读写交给后端。
+每个存档由 (玩家档案 profile, 槽位 slot) 定位，内容是一个快照加一串增量。
+
+- JsonSaveBackend：原有的 save_N.json + save_N.journal + index.json 文件格式，
+  默认档案直接使用存档目录，其余档案放在 profiles/<档案名>/ 下。
+  index.json 只在写快照（包括合并增量）和删除时更新，追加增量只写日志；
+  列出存档时按日志大小发现变化的槽位，重新读取后写回索引。
+- SqliteSaveBackend：单个 SQLite 数据库（WAL 模式），
+  摘要字段随快照一起存放在按 (profile, slot) 建主键的表中，存档列表一次索引查询即可。
+
+JSON 文件同时作为导入/导出格式，见 copy_profile()。
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from game_engine.save_journal import append_entry, apply_delta, read_entries, remove_journal
+
+DEFAULT_PROFILE = "default"
+
+# read() 的返回值：(完整存档数据, 最后一条增量的序号, 增量条数)
+SlotRecord = Tuple[Dict[str, Any], int, int]
+
+
+def slot_metadata(data: Dict[str, Any], last_modified: float) -> Dict[str, Any]:
+    """从存档数据提取存档列表需要的摘要"""
+    return {
+        'current_state': data.get('current_state', 'start'),
+        'choices_count': len(data.get('choices_made', [])),
+        'current_chapter': data.get('variables', {}).get('current_chapter', 1),
+        'last_modified': last_modified
+    }
+
+
+def check_profile(profile: str):
+    """档案名只能包含字母、数字、下划线和连字符（它也用作目录名）"""
+    if not profile or not profile.replace('_', '').replace('-', '').isalnum():
+        raise ValueError(f"无效的档案名: {profile!r}")
+
+
+class SaveBackend(ABC):
+    """存档后端接口"""
+
+    # write_batch 是否原子（全部写入或全部不写）；为 False 时中途失败可能只写入了前面的槽位
+    ATOMIC_BATCH = False
+
+    @abstractmethod
+    def read(self, profile: str, slot: int) -> Optional[SlotRecord]:
+        """读取快照并重放增量；槽位为空时返回 None"""
+
+    @abstractmethod
+    def last_seq(self, profile: str, slot: int) -> int:
+        """已写入的最大增量序号"""
+
+    @abstractmethod
+    def write_snapshot(self, profile: str, slot: int, data: Dict[str, Any], seq: int):
+        """写入完整快照并丢弃旧增量"""
+
+    @abstractmethod
+    def append_delta(self, profile: str, slot: int, seq: int,
+                     delta: Dict[str, Any], data: Dict[str, Any]):
+        """
+        追加一条增量
+
+        data 是应用增量后的完整数据，用于更新摘要；快照已不存在（例如被外部删除）时
+        改为把 data 写成快照。
+        """
+
+    def write_batch(self, operations: Iterable[Tuple]):
+        """
+        批量写入
+
+        operations 中每一项为 ('snapshot', profile, slot, data, seq)
+        或 ('delta', profile, slot, seq, delta, data)。
+        默认实现逐项写入，不是原子的：中途失败时前面的写入已经生效。
+        调用方应检查 ATOMIC_BATCH，不原子时逐项写入并记录每一项的结果（见 SaveManager.save_many）。
+        """
+        for operation in operations:
+            kind, args = operation[0], operation[1:]
+            if kind == 'snapshot':
+                self.write_snapshot(*args)
+            else:
+                self.append_delta(*args)
+
+    @abstractmethod
+    def list_metadata(self, profile: str) -> Dict[int, Dict[str, Any]]:
+        """列出档案下所有槽位的摘要：槽位 -> 摘要（损坏的存档带 error 标记）"""
+
+    @abstractmethod
+    def delete(self, profile: str, slot: int):
+        """删除槽位"""
+
+    def close(self):
+        """释放资源"""
+
+
+class JsonSaveBackend(SaveBackend):
+    """JSON 文件后端：快照 + 增量日志 + 摘要索引"""
+
+    INDEX_FILE = "index.json"
+    INDEX_VERSION = 1
+
+    def __init__(self, saves_dir: str = "saves"):
+        self.saves_dir = saves_dir
+        self._index_lock = threading.Lock()
+        self._ensure_dir(saves_dir)
+
+    # ---------- 路径 ----------
+    @staticmethod
+    def _ensure_dir(path: str):
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def profile_dir(self, profile: str) -> str:
+        """档案对应的目录（默认档案即存档目录本身）"""
+        check_profile(profile)
+        if profile == DEFAULT_PROFILE:
+            return self.saves_dir
+        return os.path.join(self.saves_dir, "profiles", profile)
+
+    def slot_path(self, profile: str, slot: int) -> str:
+        """槽位对应的快照文件路径"""
+        return os.path.join(self.profile_dir(profile), f"save_{slot}.json")
+
+    def journal_path(self, profile: str, slot: int) -> str:
+        """槽位对应的增量日志路径"""
+        return os.path.join(self.profile_dir(profile), f"save_{slot}.journal")
+
+    def _index_path(self, profile: str) -> str:
+        return os.path.join(self.profile_dir(profile), self.INDEX_FILE)
+
+    # ---------- 读写 ----------
+    def read(self, profile: str, slot: int) -> Optional[SlotRecord]:
+        save_path = self.slot_path(profile, slot)
+        if not os.path.exists(save_path):
+            return None
+        with open(save_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        seq = data.pop('journal_seq', 0)
+        entries = read_entries(self.journal_path(profile, slot), seq)
+        for entry in entries:
+            seq = entry.pop('seq')
+            apply_delta(data, entry)
+        return data, seq, len(entries)
+
+    def last_seq(self, profile: str, slot: int) -> int:
+        entries = read_entries(self.journal_path(profile, slot))
+        return entries[-1]['seq'] if entries else 0
+
+    def write_snapshot(self, profile: str, slot: int, data: Dict[str, Any], seq: int):
+        self._ensure_dir(self.profile_dir(profile))
+        save_path = self.slot_path(profile, slot)
+        # 先写临时文件，防止写入过程崩溃
+        temp_path = save_path + ".tmp"
+
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(data, journal_seq=seq), f, ensure_ascii=False, indent=2)
+
+        # 原子替换
+        os.replace(temp_path, save_path)
+        remove_journal(self.journal_path(profile, slot))
+        self._update_index(profile, slot, self._index_entry(data, time.time(), os.path.getmtime(save_path)))
+
+    def append_delta(self, profile: str, slot: int, seq: int,
+                     delta: Dict[str, Any], data: Dict[str, Any]):
+        if not os.path.exists(self.slot_path(profile, slot)):
+            self.write_snapshot(profile, slot, data, seq)
+            return
+        append_entry(self.journal_path(profile, slot), seq, delta)
+
+    def delete(self, profile: str, slot: int):
+        save_path = self.slot_path(profile, slot)
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        remove_journal(self.journal_path(profile, slot))
+        self._update_index(profile, slot, None)
+
+    # ---------- 摘要索引 ----------
+    @staticmethod
+    def _index_entry(data: Dict[str, Any], last_modified: float,
+                     snapshot_mtime: float, journal_size: int = 0) -> Dict[str, Any]:
+        """
+        存档摘要
+
+        snapshot_mtime 用于检测快照被外部修改，journal_size 用于检测摘要之后追加的增量。
+        """
+        entry = slot_metadata(data, last_modified)
+        entry['snapshot_mtime'] = snapshot_mtime
+        entry['journal_size'] = journal_size
+        return entry
+
+    def _read_index(self, profile: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """读取索引，缺失或损坏时返回 None"""
+        try:
+            with open(self._index_path(profile), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != self.INDEX_VERSION or not isinstance(index.get('slots'), dict):
+                return None
+            return index['slots']
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _write_index(self, profile: str, slots: Dict[str, Dict[str, Any]]):
+        """原子写入索引"""
+        self._ensure_dir(self.profile_dir(profile))
+        index_path = self._index_path(profile)
+        temp_path = index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.INDEX_VERSION, 'slots': slots}, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+
+    def _scan_entry(self, profile: str, slot: int) -> Optional[Dict[str, Any]]:
+        """完整读取一个存档生成摘要；存档损坏时返回 error 摘要"""
+        try:
+            snapshot_mtime = os.path.getmtime(self.slot_path(profile, slot))
+        except OSError:
+            return None
+        # 先取日志大小再读取：读取期间追加的增量会在下次列出时再次被发现
+        try:
+            journal = os.stat(self.journal_path(profile, slot))
+            last_modified, journal_size = journal.st_mtime, journal.st_size
+        except OSError:
+            last_modified, journal_size = snapshot_mtime, 0
+        try:
+            data = self.read(profile, slot)[0]
+            return self._index_entry(data, last_modified, snapshot_mtime, journal_size)
+        except Exception:
+            return {'current_state': 'error', 'choices_count': 0, 'current_chapter': 1,
+                    'last_modified': last_modified, 'snapshot_mtime': snapshot_mtime,
+                    'journal_size': journal_size, 'error': True}
+
+    def _existing_slots(self, profile: str) -> Dict[int, Tuple[float, int]]:
+        """列出目录中已存在的快照文件：槽位 -> (快照修改时间, 增量日志大小)"""
+        snapshots = {}
+        journals = {}
+        try:
+            with os.scandir(self.profile_dir(profile)) as entries:
+                for entry in entries:
+                    stem, extension = os.path.splitext(entry.name)
+                    if not (stem.startswith("save_") and stem[5:].isdigit()):
+                        continue
+                    if extension == ".json":
+                        snapshots[int(stem[5:])] = entry.stat().st_mtime
+                    elif extension == ".journal":
+                        journals[int(stem[5:])] = entry.stat().st_size
+        except OSError:
+            pass
+        return {slot: (mtime, journals.get(slot, 0)) for slot, mtime in snapshots.items()}
+
+    def rebuild_index(self, profile: str = DEFAULT_PROFILE) -> Dict[str, Dict[str, Any]]:
+        """从存档文件重建整个索引"""
+        with self._index_lock:
+            slots = {}
+            for slot in self._existing_slots(profile):
+                entry = self._scan_entry(profile, slot)
+                if entry is not None:
+                    slots[str(slot)] = entry
+            self._write_index(profile, slots)
+            return slots
+
+    def _update_index(self, profile: str, slot: int, entry: Optional[Dict[str, Any]]):
+        """更新（或删除）单个槽位的索引条目"""
+        with self._index_lock:
+            slots = self._read_index(profile)
+            if slots is None:
+                slots = {}
+                for existing_slot in self._existing_slots(profile):
+                    scanned = self._scan_entry(profile, existing_slot)
+                    if scanned is not None:
+                        slots[str(existing_slot)] = scanned
+            if entry is None:
+                slots.pop(str(slot), None)
+            else:
+                slots[str(slot)] = entry
+            self._write_index(profile, slots)
+
+    def list_metadata(self, profile: str) -> Dict[int, Dict[str, Any]]:
+        """读取索引，并修正与目录实际情况不一致的条目（包括索引之后追加了增量的槽位）"""
+        slots = self._read_index(profile)
+        if slots is None:
+            slots = self.rebuild_index(profile)
+        else:
+            existing = self._existing_slots(profile)
+            stale = [slot for slot, (mtime, journal_size) in existing.items()
+                     if (slots.get(str(slot), {}).get('snapshot_mtime'),
+                         slots.get(str(slot), {}).get('journal_size', 0)) != (mtime, journal_size)]
+            removed = [key for key in slots if not key.isdigit() or int(key) not in existing]
+            if stale or removed:
+                with self._index_lock:
+                    for key in removed:
+                        slots.pop(key, None)
+                    for slot in stale:
+                        entry = self._scan_entry(profile, slot)
+                        if entry is not None:
+                            slots[str(slot)] = entry
+                    self._write_index(profile, slots)
+        return {int(key): entry for key, entry in slots.items()}
+
+
+class SqliteSaveBackend(SaveBackend):
+    """SQLite 后端（WAL 模式），适合单机托管大量玩家档案"""
+
+    ATOMIC_BATCH = True
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS saves (
+            profile TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            snapshot TEXT NOT NULL,
+            journal_seq INTEGER NOT NULL,
+            current_state TEXT,
+            choices_count INTEGER NOT NULL,
+            current_chapter INTEGER NOT NULL,
+            last_modified REAL NOT NULL,
+            PRIMARY KEY (profile, slot)
+        );
+        CREATE TABLE IF NOT EXISTS save_deltas (
+            profile TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            delta TEXT NOT NULL,
+            PRIMARY KEY (profile, slot, seq)
+        );
+    """
+
+    def __init__(self, db_path: str = os.path.join("saves", "saves.db")):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def _transaction(self, work):
+        """在一个事务中执行 work(conn)"""
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    # ---------- 读写 ----------
+    def read(self, profile: str, slot: int) -> Optional[SlotRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT snapshot, journal_seq FROM saves WHERE profile = ? AND slot = ?",
+                (profile, slot)).fetchone()
+            if row is None:
+                return None
+            deltas = self._conn.execute(
+                "SELECT seq, delta FROM save_deltas WHERE profile = ? AND slot = ? AND seq > ? ORDER BY seq",
+                (profile, slot, row[1])).fetchall()
+        data = json.loads(row[0])
+        seq = row[1]
+        for seq, delta in deltas:
+            apply_delta(data, json.loads(delta))
+        return data, seq, len(deltas)
+
+    def last_seq(self, profile: str, slot: int) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(seq) FROM save_deltas WHERE profile = ? AND slot = ?",
+                (profile, slot)).fetchone()
+        return row[0] or 0
+
+    @staticmethod
+    def _snapshot(conn, profile, slot, data, seq):
+        meta = slot_metadata(data, time.time())
+        conn.execute(
+            "INSERT OR REPLACE INTO saves VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (profile, slot, json.dumps(data, ensure_ascii=False), seq, meta['current_state'],
+             meta['choices_count'], meta['current_chapter'], meta['last_modified']))
+        conn.execute("DELETE FROM save_deltas WHERE profile = ? AND slot = ?", (profile, slot))
+
+    @classmethod
+    def _delta(cls, conn, profile, slot, seq, delta, data):
+        meta = slot_metadata(data, time.time())
+        updated = conn.execute(
+            "UPDATE saves SET current_state = ?, choices_count = ?, current_chapter = ?, last_modified = ? "
+            "WHERE profile = ? AND slot = ?",
+            (meta['current_state'], meta['choices_count'], meta['current_chapter'],
+             meta['last_modified'], profile, slot)).rowcount
+        if not updated:
+            cls._snapshot(conn, profile, slot, data, seq)
+            return
+        conn.execute("INSERT OR REPLACE INTO save_deltas VALUES (?, ?, ?, ?)",
+                     (profile, slot, seq, json.dumps(delta, ensure_ascii=False)))
+
+    def write_snapshot(self, profile: str, slot: int, data: Dict[str, Any], seq: int):
+        self._transaction(lambda conn: self._snapshot(conn, profile, slot, data, seq))
+
+    def append_delta(self, profile: str, slot: int, seq: int,
+                     delta: Dict[str, Any], data: Dict[str, Any]):
+        self._transaction(lambda conn: self._delta(conn, profile, slot, seq, delta, data))
+
+    def write_batch(self, operations: Iterable[Tuple]):
+        """所有写入放在同一个事务中"""
+        operations = list(operations)
+
+        def work(conn):
+            for operation in operations:
+                if operation[0] == 'snapshot':
+                    self._snapshot(conn, *operation[1:])
+                else:
+                    self._delta(conn, *operation[1:])
+        self._transaction(work)
+
+    def list_metadata(self, profile: str) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT slot, current_state, choices_count, current_chapter, last_modified "
+                "FROM saves WHERE profile = ?", (profile,)).fetchall()
+        return {
+            slot: {'current_state': state, 'choices_count': count,
+                   'current_chapter': chapter, 'last_modified': modified}
+            for slot, state, count, chapter, modified in rows
+        }
+
+    def delete(self, profile: str, slot: int):
+        def work(conn):
+            conn.execute("DELETE FROM saves WHERE profile = ? AND slot = ?", (profile, slot))
+            conn.execute("DELETE FROM save_deltas WHERE profile = ? AND slot = ?", (profile, slot))
+        self._transaction(work)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def copy_profile(source: SaveBackend, target: SaveBackend,
+                 source_profile: str = DEFAULT_PROFILE,
+                 target_profile: Optional[str] = None) -> int:
+    """
+    把一个档案的全部槽位从 source 复制到 target（用于 JSON 与 SQLite 之间导入导出）
+
+    返回复制的槽位数；损坏的存档会被跳过。
+    """
+    target_profile = target_profile or source_profile
+    operations = []
+    for slot, entry in sorted(source.list_metadata(source_profile).items()):
+        if entry.get('error'):
+            continue
+        record = source.read(source_profile, slot)
+        if record is not None:
+            operations.append(('snapshot', target_profile, slot, record[0], record[1]))
+    target.write_batch(operations)
+    return len(operations)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存档增量日志
+
+每个槽位由一个快照（save_N.json）和一个只追加的日志（save_N.journal）组成。
+日志每行是一条 JSON 增量，只包含自上次保存以来新增的选择和变化的变量、
+章节进度、结局和角色状态。读档时先读快照再按序号重放日志。
+快照中的 journal_seq 记录它已包含的最后一条增量，重放时跳过序号不大于它的记录，
+因此"写快照后、删日志前"崩溃也不会重复应用增量。
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+_MISSING = object()
+
+# 角色状态中随游戏变化的字段（其余为静态档案）
+CHARACTER_STATE_FIELDS = ('trust_level', 'available', 'discovered')
+
+
+def make_baseline(data: Dict[str, Any], seq: int) -> Dict[str, Any]:
+    """记录一次保存后的状态摘要，用于下一次计算增量（与选择历史长度无关）"""
+    choices = data.get('choices_made', [])
+    return {
+        'seq': seq,
+        'choices_count': len(choices),
+        'last_choice': dict(choices[-1]) if choices else None,
+        'current_state': data.get('current_state'),
+        'variables': dict(data.get('variables', {})),
+        'chapter_progress': dict(data.get('chapter_progress', {})),
+        'endings_unlocked': list(data.get('endings_unlocked', [])),
+        'session_seed': data.get('session_seed'),
+        'characters': {
+            char_id: tuple(info.get(name) for name in CHARACTER_STATE_FIELDS)
+            for char_id, info in data.get('characters', {}).items()
+        },
+    }
+
+
+def _changed(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in new.items() if old.get(key, _MISSING) != value}
+
+
+def compute_delta(baseline: Dict[str, Any], data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    计算 data 相对 baseline 的增量
+
+    返回 None 表示无法用增量表示（例如选择历史被截断或改写），需要写完整快照。
+    """
+    choices = data.get('choices_made', [])
+    count = baseline['choices_count']
+    if len(choices) < count or (count and choices[count - 1] != baseline['last_choice']):
+        return None
+
+    delta = {}
+    if len(choices) > count:
+        delta['choices'] = choices[count:]
+    if data.get('current_state') != baseline['current_state']:
+        delta['current_state'] = data.get('current_state')
+
+    variables = _changed(baseline['variables'], data.get('variables', {}))
+    if variables:
+        delta['variables'] = variables
+    chapter_progress = _changed(baseline['chapter_progress'], data.get('chapter_progress', {}))
+    if chapter_progress:
+        delta['chapter_progress'] = chapter_progress
+    endings = data.get('endings_unlocked', [])
+    if endings != baseline['endings_unlocked']:
+        delta['endings_unlocked'] = endings
+    if data.get('session_seed') != baseline.get('session_seed'):
+        delta['session_seed'] = data.get('session_seed')
+
+    characters = {}
+    for char_id, info in data.get('characters', {}).items():
+        state = tuple(info.get(name) for name in CHARACTER_STATE_FIELDS)
+        if baseline['characters'].get(char_id) != state:
+            characters[char_id] = dict(zip(CHARACTER_STATE_FIELDS, state))
+    if characters:
+        delta['characters'] = characters
+    return delta
+
+
+def apply_delta(data: Dict[str, Any], delta: Dict[str, Any]):
+    """把一条增量应用到存档数据上（原地修改）"""
+    if 'choices' in delta:
+        data.setdefault('choices_made', []).extend(delta['choices'])
+    if 'current_state' in delta:
+        data['current_state'] = delta['current_state']
+    if 'variables' in delta:
+        data.setdefault('variables', {}).update(delta['variables'])
+    if 'chapter_progress' in delta:
+        data.setdefault('chapter_progress', {}).update(delta['chapter_progress'])
+    if 'endings_unlocked' in delta:
+        data['endings_unlocked'] = list(delta['endings_unlocked'])
+    if 'session_seed' in delta:
+        data['session_seed'] = delta['session_seed']
+    for char_id, state in delta.get('characters', {}).items():
+        data.setdefault('characters', {}).setdefault(char_id, {'character_id': char_id}).update(state)
+
+
+def append_entry(path: str, seq: int, delta: Dict[str, Any]):
+    """向日志追加一条增量"""
+    line = json.dumps(dict(delta, seq=seq), ensure_ascii=False, separators=(',', ':'))
+    with open(path, 'ab+') as f:
+        # 上次崩溃可能留下没有换行的半行，先补换行，避免新记录与其粘连
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        f.write(line.encode('utf-8') + b'\n')
+        f.flush()
+
+
+def read_entries(path: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+    """
+    读取日志中序号大于 after_seq 的增量（按序号排列，每个序号一条）
+
+    崩溃时写了一半的行会被跳过。同一序号出现多次时只保留最后一条：
+    批量写入中途失败后重试会以相同序号再追加一次，两条都是相对同一个基线计算的，
+    后写的一条包含更新的状态（与 SQLite 后端 INSERT OR REPLACE 的结果一致），重放两次会重复选择记录。
+    """
+    entries = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的记录
+                seq = entry.get('seq', 0)
+                if seq > after_seq:
+                    entries[seq] = entry
+    except OSError:
+        pass
+    return [entries[seq] for seq in sorted(entries)]
+
+
+def remove_journal(path: str):
+    """删除日志文件（快照写入之后调用）"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
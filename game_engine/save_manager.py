@@ -7,59 +7,76 @@
 """
 
 import os
-import json
-import shutil
+import threading
+import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-from story_system.story_manager import StoryProgress
+from story_system.story_manager import StoryContent, StoryProgress
+from game_engine.save_backends import (
+    DEFAULT_PROFILE, JsonSaveBackend, SaveBackend, SqliteSaveBackend, copy_profile
+)
+from game_engine.save_journal import compute_delta, make_baseline
+from game_engine.telemetry import telemetry
 
 class SaveManager:
-    """多存档管理器"""
+    """多存档管理器
 
-    def __init__(self, saves_dir: str = "saves"):
+    每个槽位是一个快照加一串增量（见 save_journal.py），
+    保存时只写入自上次保存以来的变化，增量过多时合并回快照。
+    实际存储交给后端（见 save_backends.py）：默认是存档目录中的 JSON 文件，
+    也可以使用按 (档案, 槽位) 索引的 SQLite 数据库。选择存档界面只读取各槽位的摘要。
+    """
+
+    def __init__(self, saves_dir: str = "saves", max_slots: int = 5, compact_every: int = 50,
+                 backend: Optional[SaveBackend] = None, profile: str = DEFAULT_PROFILE,
+                 story_content: Optional[StoryContent] = None):
+        """
+        Args:
+            saves_dir: 存档目录（JSON 后端使用）
+            max_slots: 最大存档槽位
+            compact_every: 增量达到该条数后合并为快照
+            backend: 存储后端，默认 JsonSaveBackend(saves_dir)
+            profile: 玩家档案名
+            story_content: 估计存档进度用的故事内容，默认为进程内共享实例
+        """
         self.saves_dir = saves_dir
-        self.max_slots = 5  # 最大存档槽位
-        self.ensure_saves_dir()
+        self.max_slots = max_slots  # 最大存档槽位
+        self.compact_every = compact_every  # 增量日志达到该条数后合并为快照
+        self.backend = backend or JsonSaveBackend(saves_dir)
+        self.profile = profile
+        self.story_content = story_content
+        self._save_lock = threading.RLock()
+        self._baselines = {}  # 槽位 -> 上次保存的状态摘要
+        self._journal_lengths = {}  # 槽位 -> 日志条数
+
+    @classmethod
+    def sqlite(cls, db_path: str = os.path.join("saves", "saves.db"),
+               profile: str = DEFAULT_PROFILE, **kwargs) -> 'SaveManager':
+        """使用 SQLite 后端的存档管理器"""
+        return cls(backend=SqliteSaveBackend(db_path), profile=profile, **kwargs)
+
+    def _check_slot(self, slot: int):
+        if not (1 <= slot <= self.max_slots):
+            raise ValueError(f"槽位必须在 1-{self.max_slots} 之间")
 
-    # ---------- 基础目录 ----------
-    def ensure_saves_dir(self):
-        """确保存档目录存在"""
-        if not os.path.exists(self.saves_dir):
-            os.makedirs(self.saves_dir)
+    def _slot_location(self, slot: int) -> str:
+        """槽位的存储位置（用于显示）"""
+        if isinstance(self.backend, JsonSaveBackend):
+            return self.backend.slot_path(self.profile, slot)
+        if isinstance(self.backend, SqliteSaveBackend):
+            return f"{self.backend.db_path}#{self.profile}/{slot}"
+        return f"{self.profile}/{slot}"
 
     # ---------- 存档列表 ----------
     def get_save_files(self) -> List[Dict[str, Any]]:
-        """获取所有存档文件信息"""
+        """获取所有存档信息（来自后端的摘要，不解析存档本身）"""
         saves = []
+        slots = self.backend.list_metadata(self.profile)
 
         for slot in range(1, self.max_slots + 1):
-            save_path = os.path.join(self.saves_dir, f"save_{slot}.json")
-            if os.path.exists(save_path):
-                try:
-                    with open(save_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        saves.append({
-                            'slot': slot,
-                            'path': save_path,
-                            'exists': True,
-                            'last_modified': os.path.getmtime(save_path),
-                            'current_state': data.get('current_state', 'start'),
-                            'choices_count': len(data.get('choices_made', [])),
-                            'current_chapter': data.get('variables', {}).get('current_chapter', 1),
-                            'play_time': self._estimate_play_time(data)
-                        })
-                except Exception:
-                    saves.append({
-                        'slot': slot,
-                        'path': save_path,
-                        'exists': True,
-                        'last_modified': 0,
-                        'current_state': 'error',
-                        'choices_count': 0,
-                        'current_chapter': 1,
-                        'play_time': '未知'
-                    })
-            else:
+            save_path = self._slot_location(slot)
+            entry = slots.get(slot)
+            if entry is None:
                 saves.append({
                     'slot': slot,
                     'path': save_path,
@@ -70,19 +87,54 @@ class SaveManager:
                     'current_chapter': 1,
                     'play_time': '新游戏'
                 })
+            elif entry.get('error'):
+                saves.append({
+                    'slot': slot,
+                    'path': save_path,
+                    'exists': True,
+                    'last_modified': 0,
+                    'current_state': 'error',
+                    'choices_count': 0,
+                    'current_chapter': 1,
+                    'play_time': '未知'
+                })
+            else:
+                saves.append({
+                    'slot': slot,
+                    'path': save_path,
+                    'exists': True,
+                    'last_modified': entry['last_modified'],
+                    'current_state': entry['current_state'],
+                    'choices_count': entry['choices_count'],
+                    'current_chapter': entry['current_chapter'],
+                    'play_time': self._estimate_play_time(entry['choices_count'], entry['current_state'])
+                })
 
         return saves
 
-    def _estimate_play_time(self, data: Dict[str, Any]) -> str:
-        """估算游戏时间"""
-        choices_count = len(data.get('choices_made', []))
+    def _estimate_play_time(self, choices_count: int, current_state: Optional[str] = None) -> str:
+        """
+        估算游戏进度：按当前场景在场景图中的位置（见 SceneGraph.progress_of）
+
+        只使用不需要加载章节的场景图（故事包中的记录或已加载的全部章节），
+        选择存档界面不会因此加载剧情；拿不到场景图时按选择次数估计。
+        """
         if choices_count == 0:
             return "新游戏"
-        elif choices_count < 5:
+        graph = (self.story_content or StoryContent.shared()).peek_graph()
+        progress = None
+        if graph is not None and current_state is not None:
+            if graph.distance_to_ending(current_state) == 0:
+                return "已到结局"
+            progress = graph.progress_of(current_state)
+        if progress is None:
+            # 没有场景图，或场景已不在故事中：按选择次数粗略估计
+            progress = min(choices_count / 30, 0.99)
+        if progress < 0.2:
             return "刚开始"
-        elif choices_count < 15:
+        elif progress < 0.5:
             return "进行中"
-        elif choices_count < 30:
+        elif progress < 0.8:
             return "深入游戏"
         else:
             return "接近完成"
@@ -91,94 +143,170 @@ class SaveManager:
     def select_save_slot(self) -> Optional[int]:
         """
         让用户选择存档槽位。
-        返回 1~5 的整数，或 None（用户输入 quit）。
-        """
+        返回 1~max_slots 的整数，或 None（用户输入 quit）。
 
-        from game_engine.screen_utils import ScreenManager
-        from game_engine.radio_game import TypewriterEffect
-
-        ScreenManager.clear()
-        ScreenManager.print_header("选择存档", "崖边电台主持人")
-        saves = self.get_save_files()
-
-        TypewriterEffect.type_out("请选择存档槽位：", 0.05, 'cyan')
-        print()
+        界面用 ScreenBuffer 绘制：首次整屏写出，输入有误时只重写提示行和输入行。
+        """
+        from game_engine.screen_buffer import ScreenBuffer
+        from game_engine.screen_utils import header_lines
 
-        for save in saves:
+        lines = header_lines("选择存档", "崖边电台主持人")
+        lines += [[("请选择存档槽位：", 'cyan')], '']
+        for save in self.get_save_files():
             slot = save['slot']
             if save['exists']:
                 last_modified = datetime.fromtimestamp(save['last_modified'])
                 time_str = last_modified.strftime("%Y-%m-%d %H:%M")
-
-                TypewriterEffect.type_out(
+                lines.append([(
                     f"  {slot}. 存档 {slot} - {save['play_time']} - "
                     f"第{save['current_chapter']}章 - {save['choices_count']}个选择 - {time_str}",
-                    0.05, 'white'
-                )
+                    'white')])
             else:
-                TypewriterEffect.type_out(
-                    f"  {slot}. 空槽位 - 开始新游戏",
-                    0.05, 'gray'
-                )
-
-        print()
-        TypewriterEffect.type_out(
-            "输入槽位编号 (1-5)，或输入 'quit' 退出：", 0.05, 'yellow'
-        )
+                lines.append([(f"  {slot}. 空槽位 - 开始新游戏", 'gray')])
+        lines += ['', [(f"输入槽位编号 (1-{self.max_slots})，或输入 'quit' 退出：", 'yellow')]]
 
+        screen = ScreenBuffer()
+        screen.clear()
+        status = ''
+        input_row = len(lines) + 1  # 状态行之后是输入行
         while True:
+            screen.render(lines + [[(status, 'red')], ''], cursor=(input_row, 0))
             choice = input("> ").strip().lower()
+            # 输入回显改动了输入行；输入行在屏幕最底部时回车会让整屏上卷，只能整屏重画
+            screen.invalidate([input_row] if input_row < screen.size[1] - 1 else None)
             if choice == 'quit':
                 return None
             if choice.isdigit() and 1 <= int(choice) <= self.max_slots:
                 return int(choice)
-            TypewriterEffect.type_out("请输入 1-5 之间的数字或 'quit'！", 0.05, 'red')
+            status = f"请输入 1-{self.max_slots} 之间的数字或 'quit'！"
 
     # ---------- 存档 / 读档 ----------
     def save_to_slot(self, slot: int, story: StoryProgress):
-        """把 StoryProgress 写入指定槽位"""
-        if not (1 <= slot <= self.max_slots):
-            raise ValueError("槽位必须在 1-5 之间")
+        """把 StoryProgress 写入指定槽位
 
-        save_path = os.path.join(self.saves_dir, f"save_{slot}.json")
-        # 先做备份，防止写入过程崩溃
-        temp_path = save_path + ".tmp"
-
-        data = story.serialize()  # 假设 StoryProgress 提供了 serialize()->dict
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        同一槽位在本进程中已有基线时只追加增量；没有基线、
+        增量无法表示或日志已达 compact_every 条时写完整快照。
+        """
+        self._check_slot(slot)
+        self.save_data_to_slot(slot, story.serialize())
+
+    def _plan_write(self, slot: int, data: Dict[str, Any]):
+        """决定本次保存写快照还是增量，返回 (后端操作, 新基线)；没有变化时返回 None"""
+        baseline = self._baselines.get(slot)
+        delta = None
+        if baseline is not None:
+            delta = compute_delta(baseline, data)
+
+        if delta is None or self._journal_lengths.get(slot, 0) >= self.compact_every:
+            if baseline is not None:
+                seq = baseline['seq'] + 1
+            else:
+                # 序号必须大于旧日志中的记录，否则写快照后、删日志前崩溃会重放旧增量
+                seq = self.backend.last_seq(self.profile, slot) + 1
+            operation = ('snapshot', self.profile, slot, data, seq)
+        elif delta:
+            seq = baseline['seq'] + 1
+            operation = ('delta', self.profile, slot, seq, delta, data)
+        else:
+            return None  # 没有任何变化
+        return operation, make_baseline(data, seq)
 
-        # 原子替换
-        if os.path.exists(save_path):
-            os.replace(temp_path, save_path)
+    def _commit_write(self, slot: int, operation, baseline: Dict[str, Any]):
+        """后端写入成功后更新基线和日志长度"""
+        if operation[0] == 'snapshot':
+            self._journal_lengths[slot] = 0
         else:
-            os.rename(temp_path, save_path)
+            self._journal_lengths[slot] = self._journal_lengths.get(slot, 0) + 1
+        self._baselines[slot] = baseline
+
+    def save_data_to_slot(self, slot: int, data: Dict[str, Any]):
+        """把序列化后的进度写入指定槽位（见 save_to_slot）"""
+        self._check_slot(slot)
+        start = time.perf_counter() if telemetry.enabled else 0.0
+        with self._save_lock:
+            plan = self._plan_write(slot, data)
+            if plan is None:
+                return
+            operation, baseline = plan
+            if operation[0] == 'snapshot':
+                self.backend.write_snapshot(*operation[1:])
+            else:
+                self.backend.append_delta(*operation[1:])
+            self._commit_write(slot, operation, baseline)
+        if telemetry.enabled:
+            telemetry.observe('save_seconds', time.perf_counter() - start,
+                              backend=type(self.backend).__name__, kind=operation[0])
 
-    def load_from_slot(self, slot: int) -> Optional[StoryProgress]:
-        """从指定槽位读取 StoryProgress"""
-        if not (1 <= slot <= self.max_slots):
-            raise ValueError("槽位必须在 1-5 之间")
+    def save_many(self, slot_data: Dict[int, Dict[str, Any]]):
+        """
+        批量保存多个槽位的序列化进度
 
-        save_path = os.path.join(self.saves_dir, f"save_{slot}.json")
-        if not os.path.exists(save_path):
-            return None
+        后端的批量写入是原子的（ATOMIC_BATCH）时在一个事务内完成；否则逐个槽位写入，
+        每写成功一个就更新它的基线，中途失败时已写入的槽位不会在重试时重复追加增量。
+        """
+        for slot in slot_data:
+            self._check_slot(slot)
+        start = time.perf_counter() if telemetry.enabled else 0.0
+        with self._save_lock:
+            plans = {}
+            for slot, data in slot_data.items():
+                plan = self._plan_write(slot, data)
+                if plan is not None:
+                    plans[slot] = plan
+            if self.backend.ATOMIC_BATCH:
+                self.backend.write_batch(operation for operation, _ in plans.values())
+                for slot, (operation, baseline) in plans.items():
+                    self._commit_write(slot, operation, baseline)
+            else:
+                for slot, (operation, baseline) in plans.items():
+                    self.backend.write_batch((operation,))
+                    self._commit_write(slot, operation, baseline)
+        if telemetry.enabled and plans:
+            telemetry.observe('save_seconds', time.perf_counter() - start,
+                              backend=type(self.backend).__name__, kind='batch')
+
+    def load_from_slot(self, slot: int, story_content=None) -> Optional[StoryProgress]:
+        """从指定槽位读取 StoryProgress（快照 + 增量）；story_content 默认为进程内共享实例"""
+        self._check_slot(slot)
 
         try:
-            with open(save_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return StoryProgress.deserialize(data)  # 假设 StoryProgress 支持反序列化
+            with telemetry.timer('load_seconds', backend=type(self.backend).__name__):
+                with self._save_lock:
+                    record = self.backend.read(self.profile, slot)
+                    if record is None:
+                        return None
+                    data, seq, journal_length = record
+                    self._baselines[slot] = make_baseline(data, seq)
+                    self._journal_lengths[slot] = journal_length
+                return StoryProgress.deserialize(data, story_content)
         except Exception as e:
             print(f"读取存档失败：{e}")
             return None
 
+    # ---------- 导入 / 导出 ----------
+    def export_to_json(self, target_dir: str) -> int:
+        """把当前档案的所有槽位导出到 target_dir 下的 JSON 存档文件（save_N.json），返回导出的槽位数"""
+        with self._save_lock:
+            return copy_profile(self.backend, JsonSaveBackend(target_dir), self.profile, DEFAULT_PROFILE)
+
+    def import_from_json(self, source_dir: str) -> int:
+        """从 JSON 存档目录（save_N.json）导入所有槽位到当前档案（覆盖同号槽位），返回导入的槽位数"""
+        with self._save_lock:
+            count = copy_profile(JsonSaveBackend(source_dir), self.backend, DEFAULT_PROFILE, self.profile)
+            # 导入的快照取代了本进程记录的基线
+            self._baselines.clear()
+            self._journal_lengths.clear()
+            return count
+
     # ---------- 删除 / 覆盖确认 ----------
     def delete_slot(self, slot: int):
         """删除指定槽位存档"""
         if not (1 <= slot <= self.max_slots):
             return
-        save_path = os.path.join(self.saves_dir, f"save_{slot}.json")
-        if os.path.exists(save_path):
-            os.remove(save_path)
+        with self._save_lock:
+            self.backend.delete(self.profile, slot)
+            self._baselines.pop(slot, None)
+            self._journal_lengths.pop(slot, None)
 
     def confirm_overwrite(self, slot: int) -> bool:
         """当槽位已有时，询问是否覆盖"""
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+场景预渲染与缓存
+
+每个 StoryScene 只格式化一次：标题、正文各行、颜色码和选项列表
+预先编码成字节段（附带逐字速度和停顿时长），按 (场景ID, 终端能力) 放进 LRU 缓存。
+重复访问同一场景（例如在 chapter1_radio 附近来回）或多个会话显示同一场景时，
+渲染器直接输出缓存的字节，不再做任何格式化。
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+# 颜色码（全局常量，不再每次调用时重建）
+COLOR_CODES = {
+    'red': '\033[91m',
+    'green': '\033[92m',
+    'yellow': '\033[93m',
+    'blue': '\033[94m',
+    'purple': '\033[95m',
+    'cyan': '\033[96m',
+    'white': '\033[97m',
+    'gray': '\033[90m'
+}
+COLOR_RESET = '\033[0m'
+
+# 场景显示节奏（与原 display_scene 一致）
+TITLE_DELAY = 0.05
+CONTENT_DELAY = 0.05
+LINE_PAUSE = 0.5
+CHOICE_DELAY = 0.03
+
+
+class TerminalCaps(NamedTuple):
+    """终端能力（缓存键的一部分）"""
+    color: bool = True
+    encoding: str = 'utf-8'
+
+    @classmethod
+    def detect(cls, stream=None) -> 'TerminalCaps':
+        """根据环境变量和输出流推断终端能力"""
+        stream = stream or sys.stdout
+        color = 'NO_COLOR' not in os.environ and os.environ.get('TERM') != 'dumb'
+        encoding = (getattr(stream, 'encoding', None) or 'utf-8').lower()
+        return cls(color=color, encoding=encoding)
+
+
+class RenderSegment(NamedTuple):
+    """一段预编码的输出：前缀和后缀整体写出，正文按字符速率逐帧写出"""
+    prefix: bytes
+    body: bytes
+    offsets: Tuple[int, ...]  # 各字符在 body 中的起始字节偏移，末尾为 len(body)
+    suffix: bytes
+    delay: float = 0.0
+    pause_after: float = 0.0
+
+    @property
+    def char_count(self) -> int:
+        return len(self.offsets) - 1
+
+
+class RenderedScene(NamedTuple):
+    """预渲染的场景"""
+    scene_id: str
+    body: Tuple[RenderSegment, ...]
+    choices: Tuple[RenderSegment, ...]
+
+
+def compile_segment(text: str, delay: float, color: Optional[str], caps: TerminalCaps,
+                    pause_after: float = 0.0) -> RenderSegment:
+    """把一行文字编码为字节段"""
+    encoding = caps.encoding
+    prefix = COLOR_CODES.get(color, '') if caps.color and color else ''
+    suffix = (COLOR_RESET if caps.color and color else '') + '\n'
+
+    offsets = [0]
+    position = 0
+    for char in text:
+        position += len(char.encode(encoding, 'replace'))
+        offsets.append(position)
+    return RenderSegment(
+        prefix=prefix.encode(encoding),
+        body=text.encode(encoding, 'replace'),
+        offsets=tuple(offsets),
+        suffix=suffix.encode(encoding),
+        delay=delay,
+        pause_after=pause_after,
+    )
+
+
+def compile_scene(scene, caps: TerminalCaps,
+                  visible: Optional[Tuple[int, ...]] = None) -> RenderedScene:
+    """
+    把场景编译为字节段序列（格式与 display_scene 的逐行输出相同）
+
+    visible 为要显示的选项下标（条件不成立的选项被隐藏），None 表示全部显示；
+    显示编号按可见选项重新从 1 开始。
+    """
+    body = []
+    if scene.title:
+        body.append(compile_segment(f"\n=== {scene.title} ===", TITLE_DELAY, 'cyan', caps))
+    for line in scene.content:
+        body.append(compile_segment(line, CONTENT_DELAY, None, caps, pause_after=LINE_PAUSE))
+
+    shown = scene.choices if visible is None else [scene.choices[i] for i in visible]
+    choices = []
+    if shown:
+        choices.append(compile_segment("\n请选择:", TITLE_DELAY, 'yellow', caps))
+        for i, choice in enumerate(shown, 1):
+            choices.append(compile_segment(f"{i}. {choice.text}", CHOICE_DELAY, 'white', caps))
+    return RenderedScene(scene.id, tuple(body), tuple(choices))
+
+
+class SceneRenderCache:
+    """预渲染场景的 LRU 缓存（线程安全，可被多个会话共享）"""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scene, caps: TerminalCaps,
+            visible: Optional[Tuple[int, ...]] = None) -> RenderedScene:
+        """取出场景的预渲染结果，没有（或场景对象已被替换）时编译并缓存"""
+        if visible is not None and len(visible) == len(scene.choices):
+            visible = None  # 全部可见与不筛选共用一个缓存项
+        key = (scene.id, caps, visible)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is scene:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        rendered = compile_scene(scene, caps, visible)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (scene, rendered)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 进程内共享的场景渲染缓存
+scene_render_cache = SceneRenderCache()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+差量刷新的终端画面缓冲区
+
+画面是一组行，每行由 (文字, 颜色) 片段组成。ScreenBuffer 把它展开成按终端单元格
+排列的网格（中日韩全角字符占两格，组合字符不占格），与上一帧逐行比较，
+只把变化的区间用 ANSI 光标定位和颜色码重写，整帧一次 write 写出。
+清屏也只写 ANSI 序列，不再启动 clear / cls 子进程；慢速 SSH 连接上切换画面只传输变化的字节。
+"""
+
+import shutil
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Sequence, TextIO, Tuple, Union
+
+from game_engine.scene_render import COLOR_CODES, COLOR_RESET
+
+CSI = '\033['
+CLEAR_SCREEN = CSI + 'H' + CSI + '2J'  # 光标回到左上角并清屏
+ERASE_LINE_END = CSI + 'K'
+ERASE_LINE = CSI + '2K'
+ERASE_BELOW = CSI + 'J'
+
+# 一行：纯文字，或 (文字, 颜色名) 片段序列
+Line = Union[str, Sequence[Tuple[str, Optional[str]]]]
+# 单元格：(字符, 颜色码)；全角字符的第二格字符为空字符串
+Cell = Tuple[str, str]
+
+
+@lru_cache(maxsize=4096)
+def char_width(char: str) -> int:
+    """字符占用的终端单元格数"""
+    if unicodedata.combining(char) or unicodedata.category(char) in ('Cc', 'Cf', 'Mn', 'Me'):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def text_width(text: str) -> int:
+    """文字的显示宽度"""
+    if text.isascii():
+        return len(text)
+    return sum(char_width(char) for char in text)
+
+
+def center(text: str, width: int) -> str:
+    """按显示宽度居中（str.center 按字符数计算，全角文字会偏移）"""
+    padding = width - text_width(text)
+    if padding <= 0:
+        return text
+    left = padding // 2
+    return ' ' * left + text + ' ' * (padding - left)
+
+
+def _line_cells(line: Line, columns: int) -> Tuple[Cell, ...]:
+    """把一行展开为单元格，超出 columns 的部分截掉（避免终端自动换行打乱定位）"""
+    segments = [(line, None)] if isinstance(line, str) else line
+    cells = []
+    for text, color in segments:
+        style = COLOR_CODES.get(color, '') if color else ''
+        for char in text:
+            width = char_width(char)
+            if width == 0:
+                for index in range(len(cells) - 1, -1, -1):  # 组合字符附着在前一个字符上
+                    if cells[index][0]:
+                        cells[index] = (cells[index][0] + char, cells[index][1])
+                        break
+                continue
+            if len(cells) + width > columns:
+                return tuple(cells)
+            cells.append((char, style))
+            if width == 2:
+                cells.append(('', style))
+    return tuple(cells)
+
+
+_BLANK: Cell = (' ', '')
+
+
+def _cell(cells: Tuple[Cell, ...], index: int) -> Cell:
+    return cells[index] if index < len(cells) else _BLANK
+
+
+class ScreenBuffer:
+    """按帧差量刷新的画面"""
+
+    def __init__(self, stream: Optional[TextIO] = None,
+                 size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            stream: 输出流，默认每次调用时取当前的 sys.stdout
+            size: 固定的 (列数, 行数)；默认按终端大小
+        """
+        self.stream = stream
+        self.fixed_size = size
+        self._rows: Optional[List[Optional[Tuple[Cell, ...]]]] = None  # 上一帧；None 表示屏幕内容未知
+        self.bytes_written = 0
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        if self.fixed_size is not None:
+            return self.fixed_size
+        terminal = shutil.get_terminal_size()
+        return terminal.columns, terminal.lines
+
+    def _write(self, data: str):
+        stream = self.stream or sys.stdout
+        stream.write(data)
+        stream.flush()
+        self.bytes_written += len(data.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace'))
+
+    def clear(self):
+        """清屏（ANSI 序列，不启动子进程）"""
+        self._write(CLEAR_SCREEN)
+        self._rows = []
+
+    def invalidate(self, rows: Optional[Sequence[int]] = None):
+        """
+        标记屏幕内容已被外部输出改动（例如 input() 回显），下一帧重写这些行
+
+        Args:
+            rows: 行号列表；None 表示整个画面
+        """
+        if rows is None or self._rows is None:
+            self._rows = None
+            return
+        for row in rows:
+            if row < len(self._rows):
+                self._rows[row] = None
+
+    def render(self, lines: Sequence[Line], cursor: Optional[Tuple[int, int]] = None) -> int:
+        """
+        绘制一帧，只输出与上一帧不同的部分
+
+        Args:
+            lines: 画面各行（从屏幕第一行开始）
+            cursor: 绘制后光标的 (行, 列)，默认放在画面最后一行的下一行行首
+        Returns:
+            本次写出的字符数
+        """
+        columns, height = self.size
+        new_rows = [_line_cells(line, columns) for line in lines[:height]]
+        old_rows = self._rows
+        parts = []
+        style = ''
+
+        for index, cells in enumerate(new_rows):
+            old = old_rows[index] if old_rows is not None and index < len(old_rows) else None
+            if old_rows is not None and index >= len(old_rows):
+                old = ()  # 清屏后尚未绘制的行是空白的
+            if old == cells:
+                continue
+            if old is None:
+                start, end, erase = 0, len(cells), True  # 内容未知：整行重写并清到行尾
+            else:
+                # 按列比较（超出行尾的部分视为空白），找出第一个和最后一个不同的单元格
+                length = max(len(old), len(cells))
+                start = 0
+                while start < length and _cell(old, start) == _cell(cells, start):
+                    start += 1
+                end = length
+                while end > start and _cell(old, end - 1) == _cell(cells, end - 1):
+                    end -= 1
+                erase = end > len(cells)
+                end = min(end, len(cells))
+                if start > 0 and (_cell(cells, start)[0] == '' or _cell(old, start)[0] == ''):
+                    start -= 1  # 不从全角字符的后半格开始写
+            parts.append(f"{CSI}{index + 1};{start + 1}H")
+            for char, cell_style in cells[start:end]:
+                if not char:
+                    continue
+                if cell_style != style:
+                    parts.append(COLOR_RESET + cell_style if style else cell_style)
+                    style = cell_style
+                parts.append(char)
+            if erase:
+                if style:
+                    parts.append(COLOR_RESET)
+                    style = ''
+                parts.append(ERASE_LINE_END)
+
+        if style:
+            parts.append(COLOR_RESET)
+        if old_rows is None:
+            parts.append(f"{CSI}{len(new_rows) + 1};1H{ERASE_BELOW}")
+        else:
+            for index in range(len(new_rows), len(old_rows)):
+                parts.append(f"{CSI}{index + 1};1H{ERASE_LINE}")
+
+        row, column = cursor if cursor is not None else (len(new_rows), 0)
+        parts.append(f"{CSI}{row + 1};{column + 1}H")
+        self._rows = list(new_rows)
+        data = ''.join(parts)
+        self._write(data)
+        return len(data)
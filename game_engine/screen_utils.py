@@ -2,25 +2,58 @@
 # -*- coding: utf-8 -*-
 """
 屏幕工具类 - 提供清屏和格式化输出功能
+
+清屏和标题都只写 ANSI 序列和文字（一次 write），不启动 clear / cls 子进程；
+需要反复刷新的界面（如存档选择）使用 screen_buffer.ScreenBuffer 差量刷新。
 """
 
-import os
 import sys
 import time
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional
+
+from game_engine.scene_render import COLOR_CODES, COLOR_RESET
+from game_engine.screen_buffer import CLEAR_SCREEN, Line, center
+
+HEADER_WIDTH = 60
+
+
+@lru_cache(maxsize=64)
+def _separator(char: str, length: int, color: Optional[str]) -> str:
+    """分隔线（按参数缓存，不再每次重新拼接）"""
+    separator = char * length
+    if color in COLOR_CODES:
+        separator = f"{COLOR_CODES[color]}{separator}{COLOR_RESET}"
+    return separator
+
+
+def header_lines(title: str, subtitle: Optional[str] = None, width: int = HEADER_WIDTH) -> List[Line]:
+    """标题头的各行（按显示宽度居中），供 print_header 和 ScreenBuffer 画面共用"""
+    lines: List[Line] = [[('=' * width, 'cyan')], [(center(title, width), 'cyan')]]
+    if subtitle:
+        lines.append([(center(subtitle, width), 'gray')])
+    lines.append([('=' * width, 'cyan')])
+    lines.append('')
+    return lines
+
+
+@lru_cache(maxsize=32)
+def _header_text(title: str, subtitle: Optional[str]) -> str:
+    parts = [_separator('=', HEADER_WIDTH, 'cyan')]
+    parts.append(f"{COLOR_CODES['cyan']}{center(title, HEADER_WIDTH)}{COLOR_RESET}")
+    if subtitle:
+        parts.append(f"{COLOR_CODES['gray']}{center(subtitle, HEADER_WIDTH)}{COLOR_RESET}")
+    parts.append(_separator('=', HEADER_WIDTH, 'cyan'))
+    return '\n'.join(parts) + '\n\n'
 
 class ScreenManager:
     """屏幕管理器 - 处理清屏和格式化输出"""
     
     @staticmethod
     def clear():
-        """清屏 - 跨平台支持"""
-        # Windows
-        if os.name == 'nt':
-            os.system('cls')
-        # macOS 和 Linux
-        else:
-            os.system('clear')
+        """清屏（ANSI 序列，不启动子进程）"""
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
     
     @staticmethod
     def clear_with_delay(delay: float = 0.5):
@@ -31,32 +64,13 @@ class ScreenManager:
     @staticmethod
     def print_separator(char: str = '=', length: int = 50, color: str = None):
         """打印分隔线"""
-        separator = char * length
-        if color:
-            colors = {
-                'red': '\033[91m',
-                'green': '\033[92m',
-                'yellow': '\033[93m',
-                'blue': '\033[94m',
-                'purple': '\033[95m',
-                'cyan': '\033[96m',
-                'white': '\033[97m',
-                'gray': '\033[90m'
-            }
-            if color in colors:
-                separator = f"{colors[color]}{separator}\033[0m"
-        print(separator)
+        print(_separator(char, length, color))
     
     @staticmethod
     def print_header(title: str, subtitle: Optional[str] = None):
-        """打印标题头"""
-        ScreenManager.clear()
-        ScreenManager.print_separator('=', 60, 'cyan')
-        print(f"\033[96m{title.center(60)}\033[0m")
-        if subtitle:
-            print(f"\033[90m{subtitle.center(60)}\033[0m")
-        ScreenManager.print_separator('=', 60, 'cyan')
-        print()
+        """清屏并打印标题头（一次写出）"""
+        sys.stdout.write(CLEAR_SCREEN + _header_text(title, subtitle))
+        sys.stdout.flush()
     
     @staticmethod
     def print_section(title: str, color: str = 'yellow'):
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+信号干扰生成
+
+一行文字的干扰掩码一次生成：一次 getrandbits 调用取得每个字符一个随机字节，
+再按预先算好的 256 项替换表决定该字符保留、换成噪声符号还是空格。
+随机数调用次数与干扰强度无关，强干扰和无干扰的文字开销相同
+（强度精度为 1/256）。安装了 NumPy 时，长文本的合并步骤改用数组运算，
+结果与纯 Python 实现逐字相同。
+
+每个频率（14250 ~ 14255 kHz，对应各个角色）有一套干扰配置和固定种子：
+同一段文字、同一频率、同一变体号总是得到相同的干扰结果，
+因此静态台词的干扰版本可以缓存复用（见 noised()）。
+"""
+
+import random
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NOISE_GLYPHS = ('▒', '░', '▓', '█', '■', '□', '▪', '▫')
+# 达到该长度的文字才使用 NumPy（短文本的数组转换开销大于收益）
+NUMPY_MIN_LENGTH = 512
+
+
+class NoiseProfile(NamedTuple):
+    """一个频率的干扰配置"""
+    frequency: int
+    strength: float  # 被干扰字符的比例
+    glyphs: Tuple[str, ...] = NOISE_GLYPHS
+    glyph_ratio: float = 0.5  # 被干扰的字符中换成噪声符号的比例，其余换成空格
+
+
+# 各角色频率的干扰配置
+PROFILES: Dict[int, NoiseProfile] = {
+    14250: NoiseProfile(14250, 0.02, ('░', '▒')),  # 你自己：本地频道，几乎无干扰
+    14251: NoiseProfile(14251, 0.08),  # 成功的你
+    14252: NoiseProfile(14252, 0.12, ('░', '▒', '▫'), 0.3),  # 被爱的你：信号时断时续
+    14253: NoiseProfile(14253, 0.18),  # 平凡的你
+    14254: NoiseProfile(14254, 0.10, ('▪', '▫', '■', '□')),  # 女性的你
+    14255: NoiseProfile(14255, 0.35, ('█', '▓', '▒'), 0.7),  # 神秘男子：强干扰
+}
+
+
+def profile_for(frequency: int) -> NoiseProfile:
+    """频率对应的干扰配置；未登记的频率使用默认强度 0.1"""
+    profile = PROFILES.get(frequency)
+    if profile is None:
+        profile = NoiseProfile(frequency, 0.1)
+    return profile
+
+
+@lru_cache(maxsize=256)
+def replacement_table(strength: float, glyphs: Tuple[str, ...] = NOISE_GLYPHS,
+                      glyph_ratio: float = 0.5) -> Tuple[str, ...]:
+    """
+    随机字节 -> 替换字符的对照表（空字符串表示保留原字符）
+
+    小于 round(strength * 256) 的字节表示被干扰，其中前 glyph_ratio 部分
+    均匀映射到各个噪声符号，其余映射为空格。
+    """
+    corrupted = min(256, max(0, round(strength * 256)))
+    glyph_bytes = round(corrupted * glyph_ratio) if glyphs else 0
+    table = []
+    for byte in range(256):
+        if byte >= corrupted:
+            table.append('')
+        elif byte < glyph_bytes:
+            table.append(glyphs[byte * len(glyphs) // glyph_bytes])
+        else:
+            table.append(' ')
+    return tuple(table)
+
+
+@lru_cache(maxsize=256)
+def _numpy_table(table: Tuple[str, ...]):
+    """替换表的码点数组（0 表示保留原字符）"""
+    return numpy.array([ord(char) if char else 0 for char in table], dtype='<u4')
+
+
+def _apply_table(text: str, table: Tuple[str, ...], rng) -> str:
+    """按替换表和每字一个随机字节合并出干扰后的文字（text 不能为空）"""
+    noise = rng.getrandbits(8 * len(text)).to_bytes(len(text), 'little')
+    if numpy is not None and len(text) >= NUMPY_MIN_LENGTH:
+        codes = numpy.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+        replacements = _numpy_table(table)[numpy.frombuffer(noise, dtype=numpy.uint8)]
+        merged = numpy.where(replacements != 0, replacements, codes)
+        return merged.astype('<u4').tobytes().decode('utf-32-le')
+    return ''.join([table[byte] or char for char, byte in zip(text, noise)])
+
+
+def corrupt(text: str, strength: float = 0.1, rng: Optional[random.Random] = None,
+            glyphs: Tuple[str, ...] = NOISE_GLYPHS, glyph_ratio: float = 0.5) -> str:
+    """
+    给文字加上随机干扰（不缓存）
+
+    Args:
+        strength: 被干扰字符的比例
+        rng: 随机数生成器，默认使用 random 模块的全局状态
+    """
+    if not text or strength <= 0:
+        return text
+    return _apply_table(text, replacement_table(strength, glyphs, glyph_ratio), rng or random)
+
+
+@lru_cache(maxsize=2048)
+def _noised(text: str, profile: NoiseProfile, variant: int, seed: int) -> str:
+    # 字符串种子经 SHA-512 转换，不受 PYTHONHASHSEED 影响，跨进程可复现
+    rng = random.Random(f"{seed}:{profile.frequency}:{variant}:{text}")
+    return _apply_table(text, replacement_table(profile.strength, profile.glyphs, profile.glyph_ratio), rng)
+
+
+def noised(text: str, frequency: int = 14250, variant: int = 0,
+           strength: Optional[float] = None, seed: int = 0) -> str:
+    """
+    按频率配置给文字加上可复现的干扰（结果缓存）
+
+    Args:
+        frequency: 频率（kHz），决定干扰配置和种子
+        variant: 变体号；同一句台词轮换几个变体号即可得到"闪烁"的干扰而不重复计算
+        strength: 覆盖配置中的干扰强度
+        seed: 全局种子（例如每个存档一个），不同种子得到不同但同样可复现的干扰
+    """
+    profile = profile_for(frequency)
+    if strength is not None:
+        profile = profile._replace(strength=strength)
+    if not text or profile.strength <= 0:
+        return text
+    return _noised(text, profile, variant, seed)
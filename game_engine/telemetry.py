@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可选的运行时遥测
+
+记录一局游戏的时间都花在哪里：每个场景的渲染耗时、写入次数和字节数，
+从启动到第一次可以输入的时间，选择延迟（含阻塞在 input() 上的时间），
+存档 / 读档延迟，章节加载耗时和内存峰值。
+
+数据聚合在固定分桶的直方图里（每次记录只是一次二分查找和几次加法），
+可以导出为 JSON Lines（每个指标一行）或 Prometheus 文本格式。
+
+默认关闭：各处埋点只检查 telemetry.enabled 这一个属性，关闭时几乎没有开销。
+设置环境变量 RADIO_TELEMETRY=<输出文件> 即开启，游戏退出时写出
+（以 .prom 结尾时写 Prometheus 文本，否则追加 JSON Lines；值为 1 时写到 telemetry.jsonl）。
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录内存峰值
+    resource = None
+
+# 分桶上界：时间 10us ~ 约 168s，次数和字节数按 2 的幂
+TIME_BUCKETS = tuple(1e-5 * 2 ** i for i in range(25))
+COUNT_BUCKETS = tuple(float(2 ** i) for i in range(21))
+SIZE_BUCKETS = tuple(float(2 ** i) for i in range(6, 31))
+
+METRIC_PREFIX = "radio_"
+
+# 指标键：(名称, 按名称排序的标签元组)
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """固定分桶直方图"""
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """估算分位数（返回所在桶的上界，最后一个桶返回最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if count:
+                buckets.append([bound, cumulative])
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,  # 只列出非空桶：[上界, 累计次数]
+        }
+
+
+class _NullTimer:
+    """遥测关闭时的计时器：什么都不做"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('telemetry', 'name', 'labels', 'start')
+
+    def __init__(self, telemetry: 'Telemetry', name: str, labels: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Telemetry:
+    """指标注册表（线程安全）"""
+
+    def __init__(self, enabled: bool = False, output: Optional[str] = None):
+        self.enabled = False
+        self.output = output
+        self._histograms: Dict[MetricKey, Histogram] = {}
+        self._gauges: Dict[MetricKey, float] = {}  # 只记录最大值的水位
+        self._lock = threading.Lock()
+        if enabled:
+            self.enable(output)
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> MetricKey:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def enable(self, output: Optional[str] = None):
+        """开启记录（output 为退出时写出的文件）；同时挂上章节加载的观察回调"""
+        from story_system.story_manager import StoryContent
+        if output is not None:
+            self.output = output
+        self.enabled = True
+        StoryContent.load_observer = self._observe_chapter_load
+
+    def disable(self):
+        from story_system.story_manager import StoryContent
+        self.enabled = False
+        if StoryContent.load_observer == self._observe_chapter_load:
+            StoryContent.load_observer = None
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._gauges.clear()
+
+    # ---------- 记录 ----------
+    def observe(self, name: str, value: float, bounds: Tuple[float, ...] = TIME_BUCKETS, **labels):
+        """向直方图记录一个值（调用方应先检查 enabled）"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def high_water(self, name: str, value: float, **labels):
+        """记录水位，只保留最大值"""
+        key = self._key(name, labels)
+        with self._lock:
+            if value > self._gauges.get(key, -math.inf):
+                self._gauges[key] = value
+
+    def timer(self, name: str, **labels):
+        """计时上下文；关闭时返回空计时器"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def sample_memory(self):
+        """记录进程内存峰值（需要 resource 模块）"""
+        if resource is None:
+            return
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            peak *= 1024  # Linux 上单位为 KB
+        self.high_water('memory_high_water_bytes', peak)
+
+    def record_scene_render(self, scene_id: str, seconds: float, writes: int, bytes_written: int):
+        """记录一个场景的渲染耗时、写入次数和字节数，并采样内存峰值"""
+        self.observe('scene_render_seconds', seconds, scene=scene_id)
+        self.observe('scene_render_writes', writes, COUNT_BUCKETS, scene=scene_id)
+        self.observe('scene_render_bytes', bytes_written, SIZE_BUCKETS, scene=scene_id)
+        self.sample_memory()
+
+    def _observe_chapter_load(self, chapter: int, source: str, seconds: float):
+        if self.enabled:
+            self.observe('chapter_load_seconds', seconds, chapter=chapter, source=source)
+
+    # ---------- 导出 ----------
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """所有指标的当前值，每个指标一个字典"""
+        with self._lock:
+            histograms = [(key, histogram.to_dict()) for key, histogram in self._histograms.items()]
+            gauges = list(self._gauges.items())
+        records = []
+        for (name, labels), data in sorted(histograms):
+            records.append({'name': METRIC_PREFIX + name, 'type': 'histogram', 'labels': dict(labels), **data})
+        for (name, labels), value in sorted(gauges):
+            records.append({'name': METRIC_PREFIX + name, 'type': 'gauge', 'labels': dict(labels), 'value': value})
+        return records
+
+    def to_jsonl(self) -> str:
+        """JSON Lines：每个指标一行，带同一个时间戳"""
+        timestamp = time.time()
+        return ''.join(json.dumps({'timestamp': timestamp, **record}, ensure_ascii=False) + '\n'
+                       for record in self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            histograms = sorted((key, histogram.to_dict(), histogram.bounds, list(histogram.counts))
+                                for key, histogram in self._histograms.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = []
+        declared = set()
+        for (name, labels), data, bounds, counts in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_labels(labels, le=_format_bound(bound))} {cumulative}")
+            lines.append(f"{metric}_bucket{_labels(labels, le='+Inf')} {data['count']}")
+            lines.append(f"{metric}_sum{_labels(labels)} {data['sum']:.9g}")
+            lines.append(f"{metric}_count{_labels(labels)} {data['count']}")
+        for (name, labels), value in gauges:
+            metric = METRIC_PREFIX + name
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} gauge")
+                declared.add(metric)
+            lines.append(f"{metric}{_labels(labels)} {value:.9g}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Optional[str] = None):
+        """写出指标：.prom 文件覆盖写入 Prometheus 文本，其他文件追加 JSON Lines"""
+        path = path or self.output
+        if not path:
+            return
+        if path.endswith('.prom'):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+        else:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(self.to_jsonl())
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if bound.is_integer() else repr(bound)
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+def _from_environment() -> Telemetry:
+    value = os.environ.get("RADIO_TELEMETRY", "")
+    if value in ("", "0"):
+        return Telemetry()
+    return Telemetry(enabled=True, output="telemetry.jsonl" if value == "1" else value)
+
+
+# 进程内共享的遥测实例
+telemetry = _from_environment()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧驱动的打字机渲染器
+
+按固定帧率输出字符：每一帧根据单调时钟计算"到目前为止应输出多少字"，
+把这一批字符合并成一次写入。睡眠抖动只会让某一帧多输出几个字，
+整体速度始终跟随目标字符速率，而不是每个字一次 flush 加一次 sleep。
+字符速率高于帧率时，写入和唤醒次数按 字符速率/帧率 的比例减少。
+
+设置 skip_event 后立即输出剩余文字并跳过停顿；instant 模式下完全不等待
+（环境变量 RADIO_INSTANT_TEXT=1 可开启默认渲染器的 instant 模式）。
+
+AsyncFrameRenderer 是同一帧调度的 asyncio 版本，等待使用 asyncio.sleep，
+供网络服务端（radio_server.py）在一个事件循环里驱动大量会话。
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional, TextIO
+
+from game_engine.telemetry import telemetry
+
+
+def _due_chars(elapsed: float, written: int, total: int, chars_per_sec: float) -> int:
+    """到 elapsed 秒时应已输出的字符数（第一帧立即输出一个字，之后按实际经过时间补齐）"""
+    return min(total, max(written + 1, int(elapsed * chars_per_sec) + 1))
+
+
+def _next_deadline(deadline: float, frame_interval: float, start: float,
+                   written: int, delay: float) -> float:
+    """下一帧：帧边界与"下一个字的到期时间"中较晚的一个"""
+    return max(deadline + frame_interval, start + written * delay)
+
+
+class FrameRenderer:
+    """按帧批量输出字符的打字机渲染器"""
+
+    def __init__(self, stream: Optional[TextIO] = None, fps: int = 15,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 skip_event: Optional[threading.Event] = None,
+                 instant: bool = False):
+        """
+        Args:
+            stream: 输出流，默认每次调用时取当前的 sys.stdout
+            fps: 每秒帧数（每帧最多一次写入）
+            clock: 单调时钟
+            sleep: 睡眠函数
+            skip_event: 被设置时跳过剩余的逐字输出和停顿
+            instant: 即时文字模式，不做任何等待
+        """
+        self.stream = stream
+        self.frame_interval = 1.0 / fps
+        self.clock = clock
+        self.sleep = sleep
+        self.skip_event = skip_event
+        self.instant = instant
+        self.writes = 0  # 写入次数和字节数，只在遥测开启时统计
+        self.bytes_written = 0
+    
+    @property
+    def skipping(self) -> bool:
+        """当前是否应跳过等待"""
+        return self.instant or (self.skip_event is not None and self.skip_event.is_set())
+    
+    def _wait(self, seconds: float):
+        """等待；有跳过事件时可被按键提前唤醒"""
+        if self.skip_event is not None:
+            self.skip_event.wait(seconds)
+        else:
+            self.sleep(seconds)
+
+    def _write(self, data: str):
+        """写入一帧：一次 write 加一次 flush"""
+        stream = self.stream or sys.stdout
+        stream.write(data)
+        stream.flush()
+        if telemetry.enabled:
+            self.writes += 1
+            self.bytes_written += len(data.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace'))
+
+    def _write_bytes(self, data: bytes):
+        """写入一帧预编码字节（有底层缓冲区时绕过文本层）"""
+        stream = self.stream or sys.stdout
+        if telemetry.enabled:
+            self.writes += 1
+            self.bytes_written += len(data)
+        buffer = getattr(stream, 'buffer', None)
+        if buffer is None:
+            stream.write(data.decode(getattr(stream, 'encoding', None) or 'utf-8', 'replace'))
+            stream.flush()
+            return
+        stream.flush()
+        buffer.write(data)
+        buffer.flush()
+
+    def _animate(self, total: int, delay: float, emit: Callable[[int, int, bool], None]):
+        """
+        帧循环：按时钟决定每帧输出到第几个字符
+
+        emit(start, end, last) 负责写出 [start, end) 范围的字符，last 表示最后一帧。
+        """
+        if delay <= 0 or total == 0 or self.skipping:
+            emit(0, total, True)
+            return
+
+        chars_per_sec = 1.0 / delay
+        start = self.clock()
+        written = 0
+        deadline = start
+
+        while True:
+            due = _due_chars(self.clock() - start, written, total, chars_per_sec)
+            if self.skipping:
+                due = total  # 按键跳过：本帧输出剩余全部文字
+            emit(written, due, due >= total)
+            written = due
+            if written >= total:
+                return
+
+            deadline = _next_deadline(deadline, self.frame_interval, start, written, delay)
+            remaining = deadline - self.clock()
+            if remaining > 0:
+                self._wait(remaining)
+
+    def type_out(self, text: str, delay: float = 0.05, prefix: str = "", suffix: str = "\n"):
+        """
+        以每字 delay 秒的速度输出 text
+
+        Args:
+            text: 要输出的文本
+            delay: 每个字符的目标间隔（秒），<=0 时一次输出
+            prefix: 与第一帧一起写出的前缀（如颜色码）
+            suffix: 与最后一帧一起写出的后缀（如重置码和换行）
+        """
+        def emit(begin, end, last):
+            head = prefix if begin == 0 else ""
+            self._write(head + text[begin:end] + (suffix if last else ""))
+
+        self._animate(len(text), delay, emit)
+
+    def play_segment(self, segment):
+        """输出一个预编码字节段（见 scene_render.RenderSegment），包括其后的停顿"""
+        body, offsets = segment.body, segment.offsets
+
+        def emit(begin, end, last):
+            data = body[offsets[begin]:offsets[end]]
+            if begin == 0:
+                data = segment.prefix + data
+            if last:
+                data += segment.suffix
+            self._write_bytes(data)
+
+        self._animate(len(offsets) - 1, segment.delay, emit)
+        self.pause(segment.pause_after)
+
+    def pause(self, seconds: float):
+        """停顿（不输出）"""
+        if seconds > 0 and not self.skipping:
+            self._wait(seconds)
+
+
+class AsyncFrameRenderer:
+    """FrameRenderer 的 asyncio 版本：把预编码字节段按帧写入 asyncio.StreamWriter"""
+
+    def __init__(self, writer: asyncio.StreamWriter, fps: int = 15,
+                 clock: Callable[[], float] = time.monotonic,
+                 instant: bool = False):
+        """
+        Args:
+            writer: 输出流
+            fps: 每秒帧数（每帧最多一次写入）
+            clock: 单调时钟
+            instant: 即时文字模式，不做任何等待
+        """
+        self.writer = writer
+        self.frame_interval = 1.0 / fps
+        self.clock = clock
+        self.instant = instant
+        self.skip = False  # 由会话在渲染期间收到输入时设置
+        self.writes = 0  # 写入次数和字节数，只在遥测开启时统计
+        self.bytes_written = 0
+
+    @property
+    def skipping(self) -> bool:
+        """当前是否应跳过等待"""
+        return self.instant or self.skip
+
+    async def write(self, data: bytes):
+        """写入并等待发送缓冲区排空（慢客户端在这里被限速）"""
+        self.writer.write(data)
+        if telemetry.enabled:
+            self.writes += 1
+            self.bytes_written += len(data)
+        await self.writer.drain()
+
+    async def play_segment(self, segment):
+        """输出一个预编码字节段（见 scene_render.RenderSegment），包括其后的停顿"""
+        body, offsets = segment.body, segment.offsets
+        total = len(offsets) - 1
+        delay = segment.delay
+        if delay <= 0 or total == 0 or self.skipping:
+            await self.write(segment.prefix + body + segment.suffix)
+        else:
+            chars_per_sec = 1.0 / delay
+            start = deadline = self.clock()
+            written = 0
+            while True:
+                due = total if self.skipping else _due_chars(self.clock() - start, written, total, chars_per_sec)
+                data = body[offsets[written]:offsets[due]]
+                if written == 0:
+                    data = segment.prefix + data
+                if due >= total:
+                    data += segment.suffix
+                await self.write(data)
+                written = due
+                if written >= total:
+                    break
+                deadline = _next_deadline(deadline, self.frame_interval, start, written, delay)
+                remaining = deadline - self.clock()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+        await self.pause(segment.pause_after)
+
+    async def pause(self, seconds: float):
+        """停顿；每帧检查一次是否被跳过"""
+        end = self.clock() + seconds
+        while not self.skipping:
+            remaining = end - self.clock()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, self.frame_interval))
+
+
+# 默认渲染器（输出到当前 sys.stdout）
+default_renderer = FrameRenderer(instant=os.environ.get("RADIO_INSTANT_TEXT", "") not in ("", "0"))
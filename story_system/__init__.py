@@ -5,17 +5,33 @@
 
 from .story_base import *
 from .characters import CharacterManager, CharacterProfile
-from .story_manager import StoryProgress, StoryContent
-from .story_chapter1 import get_chapter1_content
-from .story_chapter2 import get_chapter2_content
-from .story_chapter3 import get_chapter3_content
-from .story_chapter4 import get_chapter4_content
+from .story_manager import StoryProgress, StoryContent, ProgressState, ChapterReload
+from .story_engine import StoryEngine, PlaythroughResult
+from .scene_graph import SceneGraph
+
+
+def __getattr__(name):
+    """章节内容函数按需导入，避免导入包时加载全部章节"""
+    chapter = name[len('get_chapter'):-len('_content')]
+    if name.startswith('get_chapter') and name.endswith('_content') and chapter.isdigit() \
+            and int(chapter) in CHAPTER_MODULES:
+        import importlib
+        module = importlib.import_module(f".{CHAPTER_MODULES[int(chapter)]}", __name__)
+        value = globals()[name] = getattr(module, name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'CharacterManager',
     'CharacterProfile', 
     'StoryProgress',
     'StoryContent',
+    'ProgressState',
+    'ChapterReload',
+    'StoryEngine',
+    'PlaythroughResult',
+    'SceneGraph',
     'get_chapter1_content',
     'get_chapter2_content',
     'get_chapter3_content',
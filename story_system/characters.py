@@ -10,6 +10,14 @@ from typing import List, Optional
 class CharacterManager:
     """角色管理系统"""
     
+    # 各章的固定阵容
+    CHAPTER_CAST = {
+        1: ("main_self",),
+        2: ("successful_self", "loved_self", "ordinary_self", "female_self"),
+        3: ("successful_self", "loved_self", "ordinary_self"),
+        4: ("mysterious_man", "main_self"),
+    }
+    
     def __init__(self):
         self.characters = {}
         self._initialize_characters()
@@ -73,16 +81,20 @@ class CharacterManager:
         if character_id in self.characters:
             self.characters[character_id].trust_level += change
     
-    def get_characters_by_chapter(self, chapter: int) -> List[CharacterProfile]:
-        """按章节获取角色"""
-        chapter_chars = {
-            1: ["main_self"],
-            2: ["successful_self", "loved_self", "ordinary_self", "female_self"],
-            3: ["successful_self", "loved_self", "ordinary_self"],
-            4: ["mysterious_man", "main_self"]
-        }
-        
-        char_ids = chapter_chars.get(chapter, [])
+    def get_characters_by_chapter(self, chapter: int, graph=None) -> List[CharacterProfile]:
+        """按章节获取角色
+
+        先是各章的固定阵容（包括只在旁白中出现、不说话的角色），
+        再并上场景图索引（SceneGraph.characters_in_chapter）中该章场景的 character_id
+        和选项条件、效果引用的角色；只返回有档案的角色。
+
+        Args:
+            graph: 场景图索引，默认使用进程内共享故事内容的索引
+        """
+        if graph is None:
+            from .story_manager import StoryContent  # story_manager 导入了本模块
+            graph = StoryContent.shared().graph
+        char_ids = dict.fromkeys(self.CHAPTER_CAST.get(chapter, ()) + graph.characters_in_chapter(chapter))
         return [self.characters[char_id] for char_id in char_ids if char_id in self.characters]
     
     def get_all_characters(self) -> List[CharacterProfile]:
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选项条件与效果表达式
+
+StoryChoice.condition 决定选项是否显示，StoryChoice.effect 在选择后修改变量。
+表达式只支持下面的语法，不会执行任意 Python 代码：
+
+    条件：  view_count >= 2 and not man_appeared
+            trust(loved_self) > 1 or first_view_choice == 'swap'
+    效果：  view_count += 1; man_appeared = true; trust(loved_self) -= 1
+
+- 变量名读取 StoryProgress.variables（不存在时为 none）
+- trust(角色ID) / discovered(角色ID) 读取角色的信任度 / 是否已发现
+- 字面量：整数、'字符串' / "字符串"、true、false、none
+- 运算：or、and、not、== != < <= > >=、+ -、括号；
+  与 none 比较大小结果为 false
+- 效果由 ; 分隔的赋值组成，支持 = += -=；所有右值按执行效果前的状态计算
+- 计算时的类型错误（如对字符串取负）抛出 ConditionError，消息中带有表达式源码
+
+表达式在加载故事内容时编译为闭包并按源码缓存，同时记录它读取的变量键
+（变量名，或 "trust:角色ID" / "discovered:角色ID"），
+调用方据此只在相关变量变化时重新计算可见选项。
+"""
+
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple
+
+# 闭包签名：(变量字典, 角色ID -> 角色档案) -> 值
+Evaluator = Callable[[Mapping[str, Any], Mapping[str, Any]], Any]
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+)
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<op>==|!=|<=|>=|\+=|-=|[<>=+\-();])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+_CONSTANTS = {'true': True, 'false': False, 'none': None}
+_KEYWORDS = {'and', 'or', 'not'} | set(_CONSTANTS)
+_CHARACTER_FIELDS = {'trust': 'trust_level', 'discovered': 'discovered'}
+
+_COMPARISONS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+
+class ConditionError(ValueError):
+    """条件或效果表达式有误"""
+
+
+class CompiledCondition(NamedTuple):
+    """编译后的条件"""
+    source: str
+    evaluate: Evaluator
+    dependencies: FrozenSet[str]
+
+    def __call__(self, variables: Mapping[str, Any], characters: Mapping[str, Any]) -> bool:
+        return bool(self.evaluate(variables, characters))
+
+
+class CompiledEffect(NamedTuple):
+    """编译后的效果：依次写入的 (变量键, 右值闭包)"""
+    source: str
+    assignments: Tuple[Tuple[str, Evaluator], ...]
+    dependencies: FrozenSet[str]
+    targets: FrozenSet[str]
+
+    def evaluate(self, variables: Mapping[str, Any],
+                 characters: Mapping[str, Any]) -> List[Tuple[str, Any]]:
+        """计算效果产生的 (变量键, 新值) 列表（不修改任何状态）"""
+        return [(key, value(variables, characters)) for key, value in self.assignments]
+
+
+def character_key(function: str, character_id: str) -> str:
+    """角色属性的变量键，如 trust:loved_self"""
+    return f"{function}:{character_id}"
+
+
+def split_key(key: str) -> Tuple[Optional[str], str]:
+    """把变量键拆为 (角色属性名或 None, 名称)"""
+    function, sep, name = key.partition(':')
+    if sep and function in _CHARACTER_FIELDS:
+        return _CHARACTER_FIELDS[function], name
+    return None, key
+
+
+# ---------- 词法 ----------
+def _tokenize(source: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    source = source.rstrip()
+    while position < len(source):
+        match = _TOKEN_PATTERN.match(source, position)
+        if match is None:
+            raise ConditionError(f"无法识别的字符 {source[position:].strip()[:1]!r}: {source}")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'number':
+            tokens.append(('value', int(text)))
+        elif kind == 'string':
+            tokens.append(('value', re.sub(r"\\(.)", r"\1", text[1:-1])))
+        elif kind == 'name' and text.lower() in _KEYWORDS:
+            word = text.lower()
+            tokens.append(('value', _CONSTANTS[word]) if word in _CONSTANTS else ('op', word))
+        else:
+            tokens.append((kind, text))
+    tokens.append(('end', None))
+    return tokens
+
+
+# ---------- 语法 ----------
+class _Parser:
+    """递归下降解析，直接生成闭包"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = _tokenize(source)
+        self.position = 0
+        self.dependencies = set()
+
+    def error(self, message: str) -> ConditionError:
+        return ConditionError(f"{message}: {self.source}")
+
+    def peek(self) -> Tuple[str, Any]:
+        return self.tokens[self.position]
+
+    def accept(self, text: str) -> bool:
+        if self.tokens[self.position] == ('op', text):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, text: str):
+        if not self.accept(text):
+            raise self.error(f"缺少 {text!r}")
+
+    def at_end(self) -> bool:
+        return self.peek()[0] == 'end'
+
+    # 表达式 := or
+    def expression(self) -> Evaluator:
+        return self.or_expr()
+
+    def or_expr(self) -> Evaluator:
+        left = self.and_expr()
+        while self.accept('or'):
+            right = self.and_expr()
+            left = (lambda a, b: lambda v, c: a(v, c) or b(v, c))(left, right)
+        return left
+
+    def and_expr(self) -> Evaluator:
+        left = self.not_expr()
+        while self.accept('and'):
+            right = self.not_expr()
+            left = (lambda a, b: lambda v, c: a(v, c) and b(v, c))(left, right)
+        return left
+
+    def not_expr(self) -> Evaluator:
+        if self.accept('not'):
+            inner = self.not_expr()
+            return lambda v, c: not inner(v, c)
+        return self.comparison()
+
+    def comparison(self) -> Evaluator:
+        left = self.sum_expr()
+        kind, text = self.peek()
+        if kind == 'op' and text in _COMPARISONS:
+            self.position += 1
+            right = self.sum_expr()
+            compare = _COMPARISONS[text]
+            if text in ('==', '!='):
+                return lambda v, c: compare(left(v, c), right(v, c))
+
+            def ordered(v, c):
+                try:
+                    return compare(left(v, c), right(v, c))
+                except TypeError:
+                    return False  # 例如 none < 1
+            return ordered
+        return left
+
+    def sum_expr(self) -> Evaluator:
+        source = self.source
+        left = self.unary()
+        while True:
+            if self.accept('+'):
+                right = self.unary()
+                left = (lambda a, b: lambda v, c: _add(a(v, c), b(v, c), source))(left, right)
+            elif self.accept('-'):
+                right = self.unary()
+                left = (lambda a, b: lambda v, c: _add(a(v, c), _negate(b(v, c), source),
+                                                       source))(left, right)
+            else:
+                return left
+
+    def unary(self) -> Evaluator:
+        if self.accept('-'):
+            source = self.source
+            inner = self.unary()
+            return lambda v, c: _negate(inner(v, c), source)
+        return self.atom()
+
+    def atom(self) -> Evaluator:
+        kind, value = self.peek()
+        if kind == 'value':
+            self.position += 1
+            return lambda v, c: value
+        if self.accept('('):
+            inner = self.expression()
+            self.expect(')')
+            return inner
+        if kind == 'name':
+            self.position += 1
+            if value in _CHARACTER_FIELDS and self.peek() == ('op', '('):
+                return self.character_reference(value)[1]
+            self.dependencies.add(value)
+            return lambda v, c: v.get(value)
+        raise self.error("表达式不完整" if kind == 'end' else f"意外的 {value!r}")
+
+    def character_reference(self, function: str) -> Tuple[str, Evaluator]:
+        """解析 trust(角色ID) / discovered(角色ID)，返回 (变量键, 读取闭包)"""
+        self.expect('(')
+        kind, character_id = self.peek()
+        if kind not in ('name', 'value') or not isinstance(character_id, str):
+            raise self.error(f"{function}() 需要角色ID")
+        self.position += 1
+        self.expect(')')
+        key = character_key(function, character_id)
+        self.dependencies.add(key)
+        field = _CHARACTER_FIELDS[function]
+
+        def read(v, c):
+            character = c.get(character_id)
+            return getattr(character, field, None) if character is not None else None
+        return key, read
+
+    # 效果 := 赋值 (; 赋值)*
+    def assignments(self) -> List[Tuple[str, Evaluator]]:
+        result = []
+        while not self.at_end():
+            kind, name = self.peek()
+            if kind != 'name':
+                raise self.error("赋值目标必须是变量名或 trust()/discovered()")
+            self.position += 1
+            if name in _CHARACTER_FIELDS and self.peek() == ('op', '('):
+                key, current = self.character_reference(name)
+            elif name in _KEYWORDS:
+                raise self.error(f"不能给 {name!r} 赋值")
+            else:
+                key = name
+                current = (lambda n: lambda v, c: v.get(n))(name)
+
+            kind, op = self.peek()
+            if kind != 'op' or op not in ('=', '+=', '-='):
+                raise self.error("缺少 = / += / -=")
+            self.position += 1
+            if op != '=':
+                self.dependencies.add(key)
+            value = self.expression()
+            source = self.source
+            if op == '+=':
+                value = (lambda old, delta: lambda v, c: _add(old(v, c), delta(v, c), source))(current, value)
+            elif op == '-=':
+                value = (lambda old, delta: lambda v, c: _add(old(v, c), _negate(delta(v, c), source),
+                                                              source))(current, value)
+            result.append((key, value))
+            if not self.accept(';'):
+                break
+        if not self.at_end():
+            raise self.error(f"意外的 {self.peek()[1]!r}")
+        return result
+
+
+def _number(value: Any) -> Any:
+    """算术中把 none 当作 0"""
+    return 0 if value is None else value
+
+
+def _negate(value: Any, source: str) -> Any:
+    try:
+        return -_number(value)
+    except TypeError:
+        raise ConditionError(f"不能对 {value!r} 取负: {source}") from None
+
+
+def _add(left: Any, right: Any, source: str) -> Any:
+    if isinstance(left, str) or isinstance(right, str):
+        return f"{'' if left is None else left}{'' if right is None else right}"
+    try:
+        return _number(left) + _number(right)
+    except TypeError:
+        raise ConditionError(f"不能相加 {left!r} 和 {right!r}: {source}") from None
+
+
+# ---------- 编译入口（按源码缓存） ----------
+@lru_cache(maxsize=None)
+def compile_condition(source: str) -> CompiledCondition:
+    """编译条件表达式"""
+    parser = _Parser(source)
+    if parser.at_end():
+        raise ConditionError("条件为空")
+    evaluate = parser.expression()
+    if not parser.at_end():
+        raise parser.error(f"意外的 {parser.peek()[1]!r}")
+    return CompiledCondition(source, evaluate, frozenset(parser.dependencies))
+
+
+@lru_cache(maxsize=None)
+def compile_effect(source: str) -> CompiledEffect:
+    """编译效果（; 分隔的赋值）"""
+    parser = _Parser(source)
+    assignments = parser.assignments()
+    if not assignments:
+        raise ConditionError("效果为空")
+    return CompiledEffect(source, tuple(assignments), frozenset(parser.dependencies),
+                          frozenset(key for key, _ in assignments))
+
+
+class SceneRules(NamedTuple):
+    """一个场景中各选项编译后的条件（无条件的选项为 None）"""
+    conditions: Tuple[Optional[CompiledCondition], ...]
+    dependencies: Tuple[str, ...]
+
+
+def compile_scene_rules(scene) -> Optional[SceneRules]:
+    """编译场景中所有选项的条件和效果；没有任何条件时返回 None"""
+    conditions = []
+    dependencies = set()
+    for choice in scene.choices:
+        try:
+            if choice.effect:
+                compile_effect(choice.effect)  # 提前发现错误并放入缓存
+            condition = compile_condition(choice.condition) if choice.condition else None
+        except ConditionError as e:
+            raise ConditionError(f"场景 {scene.id} 的选项「{choice.text}」: {e}") from e
+        if condition is not None:
+            dependencies.update(condition.dependencies)
+        conditions.append(condition)
+    if not any(conditions):
+        return None
+    return SceneRules(tuple(conditions), tuple(sorted(dependencies)))
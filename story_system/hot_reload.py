@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+故事内容热重载
+
+HotReloader 轮询章节模块（story_chapterN.py）或剧本脚本（见 story_script.py）：
+文件的修改时间或大小变化后再比较 sha1，内容确实变了才重建。
+只重建变化的章节，然后用 StoryContent.reload_chapter 替换进去，
+正在进行的会话不需要重启，停在被删除或改名场景中的进度会转到替代场景。
+
+章节模块用读到的源码直接执行成新模块（与计算哈希的是同一份内容，
+不受 .pyc 时间戳精度的影响）；模块可以定义 SCENE_RENAMES = {旧ID: 新ID}
+指定改名后的场景。源码出错（语法错误、条件无法编译等）时保留原内容并记录错误，
+文件再次变化时重试。
+
+使用标准库轮询而不是 inotify，各平台行为一致；几个源文件的 stat 开销可以忽略。
+
+用法：
+    reloader = HotReloader(story_content)
+    reloader.start()                  # 后台线程每隔 interval 秒检查一次
+    await reloader.watch()            # 或在 asyncio 事件循环中：构建在线程池里进行，替换在事件循环线程中进行
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+import types
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .story_base import CHAPTER_MODULES, StoryScene
+from .story_manager import ChapterReload, StoryContent
+from .story_script import ScriptCompiler
+
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Build(NamedTuple):
+    """一章重建好的内容（尚未替换进 StoryContent）"""
+    chapter: int
+    scenes: Dict[str, StoryScene]
+    renames: Dict[str, str]
+
+
+class _Watched:
+    """一个被监视的源文件"""
+    __slots__ = ('path', 'stat', 'digest')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stat = None  # (mtime_ns, size)
+        self.digest = None
+
+    def read_if_changed(self) -> Optional[bytes]:
+        """文件内容与上次不同时返回新内容，否则返回 None（只改动修改时间不算变化）"""
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        stat = (info.st_mtime_ns, info.st_size)
+        if stat == self.stat:
+            return None
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.stat = stat
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == self.digest:
+            return None
+        self.digest = digest
+        return data
+
+
+class HotReloader:
+    """轮询源文件，重建并替换变化的章节"""
+
+    def __init__(self, story_content: Optional[StoryContent] = None, interval: float = 1.0,
+                 script_paths: Optional[Sequence[str]] = None,
+                 log: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            story_content: 被替换的故事内容，默认进程内共享实例
+            interval: 轮询间隔（秒）
+            script_paths: 剧本脚本路径；提供时监视这些脚本而不是章节模块
+            log: 记录重载结果和错误的回调，默认写到标准错误
+        """
+        self.story_content = story_content or StoryContent.shared()
+        self.interval = interval
+        self.log = log or (lambda message: print(message, file=sys.stderr))
+        self.reloads: List[ChapterReload] = []  # 最近一次 check() 替换的章节
+        self.last_error: Optional[Exception] = None
+        self._stop = threading.Event()
+        self._thread = None
+        if script_paths:
+            self._compiler = ScriptCompiler()
+            self._scripts = [_Watched(os.path.abspath(path)) for path in script_paths]
+            for watched in self._scripts:
+                watched.read_if_changed()
+            self._script_chapters = self._compiler.compile_texts(self._read_scripts())
+        else:
+            self._compiler = None
+            self._modules = {chapter: _Watched(os.path.join(_SOURCE_DIR, f"{module_name}.py"))
+                             for chapter, module_name in CHAPTER_MODULES.items()}
+            for watched in self._modules.values():
+                watched.read_if_changed()  # 记录当前内容作为基准
+
+    # ---------- 构建（可以在任意线程进行） ----------
+    def _error(self, where: str, error: Exception):
+        self.last_error = error
+        self.log(f"热重载失败（{where}），保留原内容: {error}")
+
+    def _build_module(self, chapter: int, source: bytes) -> Optional[_Build]:
+        """把章节模块的源码执行成新模块并构建场景"""
+        module_name = CHAPTER_MODULES[chapter]
+        path = self._modules[chapter].path
+        name = f"{__package__}.{module_name}"
+        module = types.ModuleType(name)
+        module.__file__ = path
+        module.__package__ = __package__
+        try:
+            exec(compile(source, path, 'exec'), module.__dict__)
+            scenes = getattr(module, f"get_chapter{chapter}_content")()
+        except Exception as e:
+            self._error(os.path.basename(path), e)
+            return None
+        # 之后导入到的都是新模块
+        sys.modules[name] = module
+        package = sys.modules[__package__]
+        setattr(package, module_name, module)
+        function = f"get_chapter{chapter}_content"
+        if function in vars(package):
+            setattr(package, function, getattr(module, function))
+        return _Build(chapter, scenes, dict(getattr(module, 'SCENE_RENAMES', {})))
+
+    def _read_scripts(self) -> List[Tuple[str, str]]:
+        texts = []
+        for watched in self._scripts:
+            with open(watched.path, 'r', encoding='utf-8') as f:
+                texts.append((watched.path, f.read()))
+        return texts
+
+    def _build_scripts(self) -> List[_Build]:
+        """重新编译剧本（未改动的小节复用缓存），返回内容有变化的章节"""
+        changed = False
+        for watched in self._scripts:
+            changed = watched.read_if_changed() is not None or changed
+        if not changed:
+            return []
+        try:
+            chapters = self._compiler.compile_texts(self._read_scripts())
+        except Exception as e:
+            self._error("剧本脚本", e)
+            return []
+        previous, self._script_chapters = self._script_chapters, chapters
+        return [_Build(chapter, scenes, {}) for chapter, scenes in sorted(chapters.items())
+                if previous.get(chapter) != scenes]
+
+    def build_changed(self) -> List[_Build]:
+        """检查源文件，构建内容有变化的章节（不修改 StoryContent）"""
+        if self._compiler is not None:
+            return self._build_scripts()
+        builds = []
+        for chapter, watched in self._modules.items():
+            source = watched.read_if_changed()
+            if source is not None:
+                build = self._build_module(chapter, source)
+                if build is not None:
+                    builds.append(build)
+        return builds
+
+    # ---------- 替换 ----------
+    def apply(self, builds: List[_Build]) -> List[ChapterReload]:
+        """把构建好的章节替换进 StoryContent"""
+        results = []
+        for build in builds:
+            try:
+                result = self.story_content.reload_chapter(build.chapter, build.scenes, build.renames)
+            except Exception as e:
+                self._error(f"第 {build.chapter} 章", e)
+                continue
+            results.append(result)
+            self.log(f"热重载第 {result.chapter} 章：新增 {len(result.added)}，修改 {len(result.changed)}，"
+                     f"删除 {len(result.removed)}（{result.seconds * 1000:.1f}ms）")
+        self.reloads = results
+        return results
+
+    def check(self) -> List[ChapterReload]:
+        """检查一次：构建并替换变化的章节"""
+        return self.apply(self.build_changed())
+
+    # ---------- 后台轮询 ----------
+    def start(self):
+        """启动后台轮询线程（单人游戏等不在事件循环中运行的场合）"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hot-reload", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        """停止后台轮询线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def watch(self):
+        """
+        在 asyncio 事件循环中轮询（直到任务被取消）
+
+        读取文件和构建场景在默认线程池中进行；替换在事件循环线程中进行，
+        各会话协程只会在两步之间看到新内容。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            builds = await loop.run_in_executor(None, self.build_changed)
+            if builds:
+                self.apply(builds)
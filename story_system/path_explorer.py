@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+场景图路径探索工具
+
+从 start 出发枚举所有可达路径，统计到达各结局的路径数，
+同时检查不可达场景、指向不存在场景的选项（悬空目标）和死胡同。
+
+状态节点是 (场景ID, 变量状态)，变量状态由沿路径累积的
+StoryChoice.variable_changes 和 effect 决定，condition 不成立的选项不展开。
+同一节点只展开一次；
+像 chapter2_man_appears -> chapter2_man_appears 这样的回边会被记录为环
+并从图中去掉，路径数在剩下的无环图上统计。每条路径恰好终止于一处：
+结局、死胡同（没有选项，或只剩回边、未展开的后继）或悬空目标，
+三类路径数之和即 total_paths。
+
+状态图按层展开，层足够宽时分发到进程池并行计算。
+
+用法：
+    python -m story_system.path_explorer [--workers N]
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from .conditions import compile_condition, compile_effect, split_key
+from .story_base import ENDING_IDS, StoryScene
+from .story_manager import StoryContent, StoryProgress
+
+# (场景ID, 变量状态) —— 变量状态是按键排序的 (键, 值) 元组
+StateNode = Tuple[str, Tuple[Tuple[str, object], ...]]
+
+# 路径计数中悬空目标的键：(_DANGLING, 目标场景ID)；结局和死胡同直接以场景ID为键
+_DANGLING = 'dangling'
+
+
+@dataclass
+class ExplorationReport:
+    """路径探索结果"""
+    ending_path_counts: Dict[str, int] = field(default_factory=dict)
+    dead_end_path_counts: Dict[str, int] = field(default_factory=dict)  # 终止场景 -> 路径数
+    dangling_path_counts: Dict[str, int] = field(default_factory=dict)  # 不存在的目标场景 -> 路径数
+    total_paths: int = 0  # 以上三类之和
+    state_count: int = 0
+    reachable_scenes: List[str] = field(default_factory=list)
+    unreachable_scenes: List[str] = field(default_factory=list)
+    dangling_targets: List[Tuple[str, str, str]] = field(default_factory=list)
+    dead_ends: List[str] = field(default_factory=list)
+    missing_endings: List[str] = field(default_factory=list)
+    cycle_edges: List[Tuple[str, str]] = field(default_factory=list)
+    truncated: bool = False  # 状态数达到上限（例如效果让计数器无限增长），只统计了部分状态
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'ending_path_counts': self.ending_path_counts,
+            'dead_end_path_counts': self.dead_end_path_counts,
+            'dangling_path_counts': self.dangling_path_counts,
+            'total_paths': self.total_paths,
+            'state_count': self.state_count,
+            'reachable_scenes': self.reachable_scenes,
+            'unreachable_scenes': self.unreachable_scenes,
+            'dangling_targets': [
+                {'scene': scene, 'choice': text, 'target': target}
+                for scene, text, target in self.dangling_targets
+            ],
+            'dead_ends': self.dead_ends,
+            'missing_endings': self.missing_endings,
+            'cycle_edges': [list(edge) for edge in self.cycle_edges],
+            'truncated': self.truncated,
+        }
+
+
+def _node_environment(variables: Tuple[Tuple[str, object], ...]):
+    """把节点的变量状态还原为条件表达式使用的 (变量字典, 角色字典)"""
+    plain = {}
+    characters = {}
+    for key, value in variables:
+        field_name, name = split_key(key)
+        if field_name is None:
+            plain[key] = value
+        else:
+            setattr(characters.setdefault(name, SimpleNamespace()), field_name, value)
+    return plain, characters
+
+
+def _successors(content: StoryContent, node: StateNode) -> List[StateNode]:
+    """计算一个状态节点的全部后继（悬空目标也作为节点返回，由调用方过滤）"""
+    scene_id, variables = node
+    scene = content.get_scene(scene_id)
+    if scene is None:
+        return []
+    rules = content.choice_rules(content.scene_number(scene_id))
+    environment = _node_environment(variables) if rules is not None else None
+    result = []
+    for index, choice in enumerate(scene.choices):
+        if rules is not None:
+            condition = rules.conditions[index]
+            if condition is not None and not condition(*environment):
+                continue
+        if choice.variable_changes or choice.effect:
+            merged = dict(variables)
+            if choice.variable_changes:
+                merged.update(choice.variable_changes)
+            if choice.effect:
+                merged.update(compile_effect(choice.effect).evaluate(*_node_environment(merged.items())))
+            next_variables = tuple(sorted(merged.items()))
+        else:
+            next_variables = variables
+        result.append((choice.next_state, next_variables))
+    return result
+
+
+# 工作进程内的故事内容（由 _init_worker 从主进程传来的场景构建）
+_worker_content: Optional[StoryContent] = None
+
+
+def _init_worker(scenes: Dict[str, StoryScene], chapters: Dict[str, int]):
+    """进程池初始化：使用与主进程 PathExplorer 相同的场景，而不是工作进程自己加载的共享内容"""
+    global _worker_content
+    _worker_content = StoryContent.from_scenes(scenes, chapters)
+
+
+def _expand_batch(nodes: List[StateNode]) -> List[List[StateNode]]:
+    """进程池任务：展开一批节点"""
+    return [_successors(_worker_content, node) for node in nodes]
+
+
+class PathExplorer:
+    """场景图路径探索器"""
+
+    def __init__(self, story_content: Optional[StoryContent] = None,
+                 workers: Optional[int] = None, parallel_threshold: int = 512,
+                 max_states: int = 1_000_000):
+        """
+        Args:
+            story_content: 要分析的故事内容，默认使用共享实例
+            workers: 进程数，默认 CPU 数；<=1 时不使用进程池
+            parallel_threshold: 一层节点数超过该值时才分发到进程池
+            max_states: 最多展开的状态数，超过后停止展开并在报告中标记 truncated
+        """
+        self.story_content = story_content or StoryContent.shared()
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.parallel_threshold = parallel_threshold
+        self.max_states = max_states
+        self._truncated = False
+
+    def _initial_node(self) -> StateNode:
+        """起始节点：只跟踪会被选项改变或被条件、效果读取的变量"""
+        tracked = set()
+        for scene in self.story_content.scenes.values():
+            for choice in scene.choices:
+                if choice.variable_changes:
+                    tracked.update(choice.variable_changes)
+                if choice.condition:
+                    tracked.update(compile_condition(choice.condition).dependencies)
+                if choice.effect:
+                    effect = compile_effect(choice.effect)
+                    tracked.update(effect.dependencies | effect.targets)
+        progress = StoryProgress(story_content=self.story_content)
+        characters = progress.character_manager.characters
+
+        def default(key):
+            field_name, name = split_key(key)
+            if field_name is None:
+                return progress.variables.get(key)
+            return getattr(characters[name], field_name) if name in characters else None
+        return ("start", tuple(sorted((key, default(key)) for key in tracked)))
+
+    def _build_state_graph(self, root: StateNode) -> Dict[StateNode, List[StateNode]]:
+        """按层展开状态图"""
+        scenes = self.story_content.scenes
+        graph: Dict[StateNode, List[StateNode]] = {}
+        frontier = [root]
+        pool = None
+        try:
+            while frontier:
+                if self.workers > 1 and len(frontier) >= self.parallel_threshold:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(
+                            max_workers=self.workers, initializer=_init_worker,
+                            initargs=(dict(scenes), {scene_id: self.story_content.chapter_of(scene_id)
+                                                     for scene_id in scenes}))
+                    chunk = max(1, len(frontier) // (self.workers * 4))
+                    batches = [frontier[i:i + chunk] for i in range(0, len(frontier), chunk)]
+                    expanded = [succ for batch in pool.map(_expand_batch, batches) for succ in batch]
+                else:
+                    expanded = [_successors(self.story_content, node) for node in frontier]
+
+                next_frontier = []
+                for node, successors in zip(frontier, expanded):
+                    graph[node] = successors
+                    for succ in successors:
+                        if succ[0] in scenes and succ not in graph:
+                            if len(graph) >= self.max_states:
+                                self._truncated = True
+                                continue
+                            graph[succ] = None  # 占位，防止同层重复加入
+                            next_frontier.append(succ)
+                frontier = next_frontier
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return graph
+
+    def _count_paths(self, root: StateNode, graph: Dict[StateNode, List[StateNode]],
+                     report: ExplorationReport, scenes) -> Dict[StateNode, Counter]:
+        """
+        去掉回边后在无环图上统计各终点的路径数（迭代后序遍历）
+
+        每个指向不存在场景的选项算一条终止于 (_DANGLING, 目标) 的路径；
+        没有任何后继计入路径的节点（没有选项，或只剩回边和超出状态上限未展开的后继）算作死胡同。
+        """
+        counts: Dict[StateNode, Counter] = {}
+        on_stack = set()
+        cycle_edges = set()
+        stack = [(root, iter(graph.get(root) or ()))]
+        on_stack.add(root)
+
+        while stack:
+            node, successors = stack[-1]
+            advanced = False
+            for succ in successors:
+                if succ not in graph:
+                    continue  # 悬空目标
+                if succ in on_stack:
+                    cycle_edges.add((node[0], succ[0]))
+                    continue
+                if succ not in counts:
+                    stack.append((succ, iter(graph.get(succ) or ())))
+                    on_stack.add(succ)
+                    advanced = True
+                    break
+            if advanced:
+                continue
+
+            # 回边指向的节点此时仍在栈上、尚无计数，自然不会被累加
+            stack.pop()
+            on_stack.discard(node)
+            total = Counter()
+            successors = graph.get(node)
+            if node[0] not in ENDING_IDS:
+                for succ in successors or ():
+                    if succ in counts:
+                        total.update(counts[succ])
+                    elif succ[0] not in scenes:
+                        total[(_DANGLING, succ[0])] += 1
+            if not total:
+                total[node[0]] = 1  # 结局或死胡同：路径终点
+            counts[node] = total
+
+        report.cycle_edges = sorted(cycle_edges)
+        return counts
+
+    def explore(self) -> ExplorationReport:
+        """执行完整探索"""
+        scenes = self.story_content.scenes
+        report = ExplorationReport()
+        root = self._initial_node()
+        self._truncated = False
+        graph = self._build_state_graph(root) if root[0] in scenes else {}
+        report.truncated = self._truncated
+
+        reachable = {node[0] for node in graph}
+        report.state_count = len(graph)
+        report.reachable_scenes = sorted(reachable)
+        report.unreachable_scenes = sorted(set(scenes) - reachable)
+        report.dangling_targets = sorted(
+            (scene.id, choice.text, choice.next_state)
+            for scene in scenes.values()
+            for choice in scene.choices
+            if choice.next_state not in scenes
+        )
+        report.dead_ends = sorted(
+            scene_id for scene_id in reachable
+            if not scenes[scene_id].choices and scene_id not in ENDING_IDS
+        )
+        report.missing_endings = [ending for ending in ENDING_IDS if ending not in scenes]
+
+        if graph:
+            counts = self._count_paths(root, graph, report, scenes)
+            root_counts = counts.get(root, Counter())
+            report.ending_path_counts = {ending: root_counts.get(ending, 0) for ending in ENDING_IDS}
+            report.dead_end_path_counts = {
+                key: count for key, count in sorted(root_counts.items(), key=lambda item: str(item[0]))
+                if isinstance(key, str) and key not in ENDING_IDS
+            }
+            report.dangling_path_counts = {
+                key[1]: count for key, count in sorted(root_counts.items(), key=lambda item: str(item[0]))
+                if isinstance(key, tuple)
+            }
+            report.total_paths = sum(root_counts.values())
+        else:
+            report.ending_path_counts = {ending: 0 for ending in ENDING_IDS}
+        return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="枚举场景图中的所有路径")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 数）")
+    parser.add_argument("--threshold", type=int, default=512, help="并行展开的最小层宽")
+    parser.add_argument("--max-states", type=int, default=1_000_000, help="最多展开的状态数")
+    args = parser.parse_args(argv)
+
+    report = PathExplorer(workers=args.workers, parallel_threshold=args.threshold,
+                          max_states=args.max_states).explore()
+    json.dump(report.to_dict(), sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化（不可变、结构共享）容器
+
+PMap 是哈希数组映射字典树（HAMT）：每层按键哈希的 5 位分出 32 路，
+节点用位图 + 紧凑元组保存子项。set / delete 只复制从根到该键的一条路径
+（最多 13 层，实际只有一两层），其余节点由新旧版本共享。
+
+PVector 是 32 路字典树加尾块的向量：append / pop / set 同样只复制一条路径，
+append 通常只复制不超过 32 项的尾块。
+
+两者都不可修改：所有"修改"返回新对象，旧对象保持不变，
+因此保存一个版本只需持有引用（O(1)），撤销和分支就是回到 / 复制旧引用。
+读取接口与 dict / list 相同（Mapping / Sequence），可以直接交给条件表达式等只读代码。
+"""
+
+from collections.abc import Mapping, Sequence
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_MASK = (1 << 64) - 1
+
+_MISSING = object()
+
+if hasattr(int, 'bit_count'):  # Python 3.10+
+    def _popcount(value: int) -> int:
+        return value.bit_count()
+else:
+    def _popcount(value: int) -> int:
+        return bin(value).count('1')
+
+
+# ---------- PMap ----------
+# 条目为 (哈希, 键, 值) 元组；子节点为 _Bitmap 或 _Collision
+
+class _Bitmap:
+    __slots__ = ('bitmap', 'array')
+
+    def __init__(self, bitmap: int, array: tuple):
+        self.bitmap = bitmap
+        self.array = array
+
+
+class _Collision:
+    """哈希完全相同的多个键"""
+    __slots__ = ('hash', 'entries')
+
+    def __init__(self, key_hash: int, entries: tuple):
+        self.hash = key_hash
+        self.entries = entries
+
+
+_EMPTY_NODE = _Bitmap(0, ())
+
+
+def _hash(key) -> int:
+    return hash(key) & _HASH_MASK
+
+
+def _merge(shift: int, first: tuple, second: tuple):
+    """包含两个条目的最小子树"""
+    if first[0] == second[0]:
+        return _Collision(first[0], (first, second))
+    first_index = (first[0] >> shift) & _MASK
+    second_index = (second[0] >> shift) & _MASK
+    if first_index == second_index:
+        return _Bitmap(1 << first_index, (_merge(shift + _BITS, first, second),))
+    if first_index > second_index:
+        first, second = second, first
+        first_index, second_index = second_index, first_index
+    return _Bitmap((1 << first_index) | (1 << second_index), (first, second))
+
+
+def _build(entries: list, shift: int):
+    """由互不相同的键的条目批量构建子树（不做路径复制）"""
+    buckets = {}
+    for entry in entries:
+        buckets.setdefault((entry[0] >> shift) & _MASK, []).append(entry)
+    bitmap = 0
+    array = []
+    for index in sorted(buckets):
+        group = buckets[index]
+        bitmap |= 1 << index
+        if len(group) == 1:
+            array.append(group[0])
+        elif all(entry[0] == group[0][0] for entry in group):
+            array.append(_Collision(group[0][0], tuple(group)))
+        else:
+            array.append(_build(group, shift + _BITS))
+    return _Bitmap(bitmap, tuple(array))
+
+
+def _assoc(node, shift: int, entry: tuple) -> Tuple[Any, bool]:
+    """返回 (新节点, 是否新增了键)；值未变化时返回原节点"""
+    key_hash, key, value = entry
+    if type(node) is _Collision:
+        if key_hash != node.hash:
+            # 放进一个只含该冲突节点的位图节点，再按普通路径插入
+            wrapper = _Bitmap(1 << ((node.hash >> shift) & _MASK), (node,))
+            return _assoc(wrapper, shift, entry)
+        for index, (_, old_key, old_value) in enumerate(node.entries):
+            if old_key is key or old_key == key:
+                if old_value is value:
+                    return node, False
+                entries = node.entries[:index] + (entry,) + node.entries[index + 1:]
+                return _Collision(key_hash, entries), False
+        return _Collision(key_hash, node.entries + (entry,)), True
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    index = _popcount(node.bitmap & (bit - 1))
+    array = node.array
+    if not node.bitmap & bit:
+        return _Bitmap(node.bitmap | bit, array[:index] + (entry,) + array[index:]), True
+    item = array[index]
+    if type(item) is tuple:
+        if item[1] is key or (item[0] == key_hash and item[1] == key):
+            if item[2] is value:
+                return node, False
+            child, added = entry, False
+        else:
+            child, added = _merge(shift + _BITS, item, entry), True
+    else:
+        child, added = _assoc(item, shift + _BITS, entry)
+        if child is item:
+            return node, False
+    return _Bitmap(node.bitmap, array[:index] + (child,) + array[index + 1:]), added
+
+
+def _without(node, shift: int, key_hash: int, key):
+    """
+    删除键后的节点：键不存在时返回原节点，节点变空时返回 None，
+    只剩一个条目时返回该条目（由上一层直接内联）
+    """
+    if type(node) is _Collision:
+        if key_hash != node.hash:
+            return node
+        for index, entry in enumerate(node.entries):
+            if entry[1] is key or entry[1] == key:
+                entries = node.entries[:index] + node.entries[index + 1:]
+                return entries[0] if len(entries) == 1 else _Collision(key_hash, entries)
+        return node
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    index = _popcount(node.bitmap & (bit - 1))
+    item = node.array[index]
+    if type(item) is tuple:
+        if not (item[1] is key or (item[0] == key_hash and item[1] == key)):
+            return node
+        child = None
+    else:
+        child = _without(item, shift + _BITS, key_hash, key)
+        if child is item:
+            return node
+    if child is None:
+        array = node.array[:index] + node.array[index + 1:]
+        if not array:
+            return None
+        if len(array) == 1 and type(array[0]) is tuple:
+            return array[0]
+        return _Bitmap(node.bitmap & ~bit, array)
+    return _Bitmap(node.bitmap, node.array[:index] + (child,) + node.array[index + 1:])
+
+
+def _entries(node) -> Iterator[tuple]:
+    if type(node) is _Collision:
+        yield from node.entries
+        return
+    for item in node.array:
+        if type(item) is tuple:
+            yield item
+        else:
+            yield from _entries(item)
+
+
+class PMap(Mapping):
+    """持久化字典"""
+    __slots__ = ('_root', '_count')
+
+    def __init__(self, items: Optional[Any] = None):
+        """
+        Args:
+            items: 初始内容（字典或 (键, 值) 序列）
+        """
+        contents = dict(items) if items else {}
+        self._root = _build([(_hash(key), key, value) for key, value in contents.items()], 0)
+        self._count = len(contents)
+
+    @classmethod
+    def _make(cls, root, count: int) -> 'PMap':
+        result = cls.__new__(cls)
+        result._root = root
+        result._count = count
+        return result
+
+    # ---------- 读取 ----------
+    def get(self, key, default=None):
+        key_hash = hash(key) & _HASH_MASK
+        node = self._root
+        shift = 0
+        while True:
+            if type(node) is _Collision:
+                for _, entry_key, value in node.entries:
+                    if entry_key is key or entry_key == key:
+                        return value
+                return default
+            bit = 1 << ((key_hash >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+            item = node.array[_popcount(node.bitmap & (bit - 1))]
+            if type(item) is tuple:
+                if item[1] is key or (item[0] == key_hash and item[1] == key):
+                    return item[2]
+                return default
+            node = item
+            shift += _BITS
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator:
+        for entry in _entries(self._root):
+            yield entry[1]
+
+    def items(self):
+        return [(entry[1], entry[2]) for entry in _entries(self._root)]
+
+    def values(self):
+        return [entry[2] for entry in _entries(self._root)]
+
+    def to_dict(self) -> dict:
+        return {entry[1]: entry[2] for entry in _entries(self._root)}
+
+    def __repr__(self) -> str:
+        return f"PMap({self.to_dict()!r})"
+
+    # ---------- 生成新版本 ----------
+    def set(self, key, value) -> 'PMap':
+        """返回设置了 key 的新字典（值未变化时返回自身）"""
+        root, added = _assoc(self._root, 0, (_hash(key), key, value))
+        if root is self._root:
+            return self
+        return PMap._make(root, self._count + added)
+
+    def delete(self, key) -> 'PMap':
+        """返回删除了 key 的新字典（键不存在时返回自身）"""
+        root = _without(self._root, 0, _hash(key), key)
+        if root is self._root:
+            return self
+        if root is None:
+            return PMap()
+        if type(root) is tuple:
+            root = _Bitmap(1 << (root[0] & _MASK), (root,))
+        return PMap._make(root, self._count - 1)
+
+    def merge(self, items) -> 'PMap':
+        """返回合并了 items（字典或 (键, 值) 序列）的新字典"""
+        pairs = list(items.items() if isinstance(items, Mapping) else items)
+        if len(pairs) * 2 > self._count:
+            # 改动的键较多时整体重建比逐个路径复制快
+            contents = self.to_dict()
+            contents.update(pairs)
+            return PMap(contents)
+        root, count = self._root, self._count
+        for key, value in pairs:
+            root, added = _assoc(root, 0, (_hash(key), key, value))
+            count += added
+        if root is self._root:
+            return self
+        return PMap._make(root, count)
+
+
+# ---------- PVector ----------
+# 树节点和尾块都是元组；叶子层每块 32 项
+
+def _new_path(level: int, node: tuple) -> tuple:
+    while level > 0:
+        node = (node,)
+        level -= _BITS
+    return node
+
+
+class PVector(Sequence):
+    """持久化列表"""
+    __slots__ = ('_count', '_shift', '_root', '_tail')
+
+    def __init__(self, items: Iterable = ()):
+        """
+        Args:
+            items: 初始内容（按块批量构建，O(n)）
+        """
+        items = items if isinstance(items, list) else list(items)
+        count = len(items)
+        tail_offset = self._tail_offset_of(count)
+        level = [tuple(items[start:start + _WIDTH]) for start in range(0, tail_offset, _WIDTH)]
+        shift = _BITS
+        while len(level) > _WIDTH:
+            level = [tuple(level[start:start + _WIDTH]) for start in range(0, len(level), _WIDTH)]
+            shift += _BITS
+        self._count = count
+        self._shift = shift
+        self._root = tuple(level)
+        self._tail = tuple(items[tail_offset:])
+
+    @classmethod
+    def _make(cls, count: int, shift: int, root: tuple, tail: tuple) -> 'PVector':
+        result = cls.__new__(cls)
+        result._count = count
+        result._shift = shift
+        result._root = root
+        result._tail = tail
+        return result
+
+    @staticmethod
+    def _tail_offset_of(count: int) -> int:
+        return 0 if count < _WIDTH else ((count - 1) >> _BITS) << _BITS
+
+    def _leaf_for(self, index: int) -> tuple:
+        if index >= self._tail_offset_of(self._count):
+            return self._tail
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node[(index >> level) & _MASK]
+            level -= _BITS
+        return node
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("PVector 下标超出范围")
+        return index
+
+    # ---------- 读取 ----------
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        index = self._normalize(index)
+        return self._leaf_for(index)[index & _MASK]
+
+    def __iter__(self) -> Iterator:
+        for start in range(0, self._tail_offset_of(self._count), _WIDTH):
+            yield from self._leaf_for(start)
+        yield from self._tail
+
+    def to_list(self) -> list:
+        result = []
+        for start in range(0, self._tail_offset_of(self._count), _WIDTH):
+            result.extend(self._leaf_for(start))
+        result.extend(self._tail)
+        return result
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (PVector, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"PVector({self.to_list()!r})"
+
+    # ---------- 生成新版本 ----------
+    def append(self, value) -> 'PVector':
+        """返回末尾追加了 value 的新列表（不修改自身）"""
+        count, shift, root = self._count, self._shift, self._root
+        if count - self._tail_offset_of(count) < _WIDTH:
+            return PVector._make(count + 1, shift, root, self._tail + (value,))
+        if (count >> _BITS) > (1 << shift):
+            root = (root, _new_path(shift, self._tail))
+            shift += _BITS
+        else:
+            root = self._push_tail(shift, root, self._tail)
+        return PVector._make(count + 1, shift, root, (value,))
+
+    def _push_tail(self, level: int, parent: tuple, tail: tuple) -> tuple:
+        sub_index = ((self._count - 1) >> level) & _MASK
+        if level == _BITS:
+            child = tail
+        elif sub_index < len(parent):
+            child = self._push_tail(level - _BITS, parent[sub_index], tail)
+        else:
+            child = _new_path(level - _BITS, tail)
+        return parent[:sub_index] + (child,) + parent[sub_index + 1:]
+
+    def set(self, index: int, value) -> 'PVector':
+        """返回第 index 项替换为 value 的新列表"""
+        index = self._normalize(index)
+        if index >= self._tail_offset_of(self._count):
+            position = index & _MASK
+            tail = self._tail[:position] + (value,) + self._tail[position + 1:]
+            return PVector._make(self._count, self._shift, self._root, tail)
+        return PVector._make(self._count, self._shift,
+                             self._assoc(self._shift, self._root, index, value), self._tail)
+
+    def _assoc(self, level: int, node: tuple, index: int, value) -> tuple:
+        if level == 0:
+            position = index & _MASK
+            return node[:position] + (value,) + node[position + 1:]
+        sub_index = (index >> level) & _MASK
+        child = self._assoc(level - _BITS, node[sub_index], index, value)
+        return node[:sub_index] + (child,) + node[sub_index + 1:]
+
+    def pop(self) -> 'PVector':
+        """返回去掉最后一项的新列表"""
+        count = self._count
+        if count == 0:
+            raise IndexError("空 PVector 无法 pop")
+        if count == 1:
+            return PVector()
+        if count - self._tail_offset_of(count) > 1:
+            return PVector._make(count - 1, self._shift, self._root, self._tail[:-1])
+        tail = self._leaf_for(count - 2)
+        root = self._pop_tail(self._shift, self._root) or ()
+        shift = self._shift
+        if shift > _BITS and len(root) == 1:
+            root = root[0]
+            shift -= _BITS
+        return PVector._make(count - 1, shift, root, tail)
+
+    def _pop_tail(self, level: int, node: tuple) -> Optional[tuple]:
+        sub_index = ((self._count - 2) >> level) & _MASK
+        if level > _BITS:
+            child = self._pop_tail(level - _BITS, node[sub_index])
+            if child is None:
+                return node[:sub_index] or None
+            return node[:sub_index] + (child,)
+        return node[:sub_index] or None
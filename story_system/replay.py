@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选择记录回放
+
+StoryProgress.choices_made 记录了每一次转移 (state, choice_id, choice_text, timestamp)。
+Replay 从新进度出发，用 StoryEngine.apply_choice 逐条重新执行这些选择，
+得到与原进度相同的变量、章节进度、结局和角色状态（选择记录保留原来的时间戳）。
+
+回放时每隔 checkpoint_every 步保存一个状态检查点（StoryProgress.checkpoint()，
+与回放中的进度结构共享，每个检查点只占很少的内存），
+seek(step) 从不晚于 step 的最近检查点恢复再向前回放，
+跳到长历史中任意位置的开销只与到最近检查点的距离有关。
+
+随机性：每一步有一个由会话种子和步号派生的干扰种子（noise_seed），
+游戏显示该步场景时把它传给信号干扰（SignalEffect.add_noise / simulate_static 的 seed，
+见 StoryProgress.noise_seed），回放时即可得到逐字相同的干扰效果。
+会话种子保存在存档和第一条选择记录中（session_seed）；更早的存档没有该字段，
+由第一条选择记录的时间戳派生。
+
+用法：
+    python -m story_system.replay save.json              # 校验整段记录能否回放
+    python -m story_system.replay save.json --step 120   # 输出第 120 步之后的进度
+"""
+
+import argparse
+import json
+import sys
+from bisect import bisect_right
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from .story_engine import StoryEngine
+from .story_manager import ProgressState, StoryContent, StoryProgress, session_seed, step_seed
+
+
+class ReplayError(ValueError):
+    """选择记录无法在当前故事内容上回放"""
+
+
+class ReplayStep(NamedTuple):
+    """回放的一步"""
+    index: int  # 第几条选择记录（从 0 开始）
+    entry: Dict[str, Any]  # 原始选择记录
+    scene_id: str  # 选择之后所在的场景
+    noise_seed: int  # 选择之后显示场景时使用的干扰种子
+    resynced: bool  # 记录中的起始场景与回放状态不一致、已切换到记录中的场景
+
+
+class Replay:
+    """可跳转的选择记录回放"""
+
+    def __init__(self, choices: Sequence[Dict[str, Any]],
+                 story_content: Optional[StoryContent] = None,
+                 checkpoint_every: int = 64, seed: Optional[int] = None,
+                 strict: bool = False):
+        """
+        Args:
+            choices: 选择记录（choices_made），回放期间视为只读
+            story_content: 故事内容，默认使用进程内共享实例
+            checkpoint_every: 检查点间隔（步）
+            seed: 会话种子，默认由第一条记录的时间戳派生
+            strict: 记录中的起始场景与回放状态不一致时抛出 ReplayError；
+                否则像游戏在找不到场景时回到开场那样，切换到记录中的场景继续
+        """
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every 必须大于 0")
+        self.choices = list(choices)
+        self.engine = StoryEngine(story_content)
+        self.checkpoint_every = checkpoint_every
+        self.seed = session_seed(self.choices) if seed is None else seed
+        self.strict = strict
+        self._checkpoints: Dict[int, ProgressState] = {}  # 步号 -> 进度版本
+        self._checkpoint_steps: List[int] = []  # 已保存检查点的步号（升序）
+        self._save_checkpoint(0, self.engine.new_progress())
+
+    @classmethod
+    def from_progress(cls, progress: StoryProgress, **kwargs) -> 'Replay':
+        """回放一份进度的全部选择记录"""
+        kwargs.setdefault('story_content', progress.story_content)
+        kwargs.setdefault('seed', progress.session_seed)
+        return cls(progress.choices_made, **kwargs)
+
+    @classmethod
+    def from_save(cls, data: Dict[str, Any], **kwargs) -> 'Replay':
+        """回放存档数据中的故事进度（接受完整存档或其中的 story_progress）"""
+        story = data.get('story_progress', data)
+        kwargs.setdefault('seed', story.get('session_seed'))
+        return cls(story.get('choices_made', []), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def noise_seed(self, step: int) -> int:
+        """第 step 步（已做出 step 个选择）显示场景时的干扰种子"""
+        return step_seed(self.seed, step)
+
+    # ---------- 检查点 ----------
+    def _save_checkpoint(self, step: int, progress: StoryProgress):
+        if step in self._checkpoints:
+            return
+        self._checkpoints[step] = progress.checkpoint()
+        index = bisect_right(self._checkpoint_steps, step)
+        self._checkpoint_steps.insert(index, step)
+
+    def _restore(self, step: int) -> StoryProgress:
+        """由检查点恢复进度（沿用记录的会话种子，恢复出的进度继续游戏时干扰效果不变）"""
+        progress = StoryProgress.from_state(self._checkpoints[step], self.engine.story_content)
+        progress.session_seed = self.seed
+        return progress
+
+    def nearest_checkpoint(self, step: int) -> int:
+        """不晚于 step 的最近检查点步号"""
+        return self._checkpoint_steps[bisect_right(self._checkpoint_steps, step) - 1]
+
+    # ---------- 回放 ----------
+    def _apply(self, progress: StoryProgress, index: int) -> ReplayStep:
+        """在 progress 上重新执行第 index 条选择"""
+        entry = self.choices[index]
+        resynced = False
+        state = entry.get('state')
+        if state is not None and state != progress.current_state_id:
+            if self.strict:
+                raise ReplayError(f"第 {index} 步: 记录的场景为 {state}，"
+                                  f"回放到的场景为 {progress.current_state_id}")
+            progress.set_state(state)
+            resynced = True
+
+        scene = progress.get_current_scene()
+        if scene is None:
+            raise ReplayError(f"第 {index} 步: 场景 {progress.current_state_id} 不存在")
+        target = entry.get('choice_id')
+        text = entry.get('choice_text')
+        visible = self.engine.visible_choice_indices(progress, scene)
+        matches = [i for i in visible if scene.choices[i].next_state == target]
+        if not matches:
+            raise ReplayError(f"第 {index} 步: 场景 {scene.id} 中没有通往 {target} 的可选选项")
+        # 同一目标有多个选项时按文字区分（文字只影响显示，找不到时取第一个）
+        choice_index = next((i for i in matches if scene.choices[i].text == text), matches[0])
+
+        self.engine.apply_choice(progress, scene.choices[choice_index], choice_index)
+        progress.choices_made = progress.choices_made.set(-1, entry)  # 保留原来的时间戳
+        step = index + 1
+        if step % self.checkpoint_every == 0:
+            self._save_checkpoint(step, progress)
+        return ReplayStep(index, entry, progress.current_state_id, self.noise_seed(step), resynced)
+
+    def steps(self, start: int = 0, stop: Optional[int] = None,
+              progress: Optional[StoryProgress] = None) -> Iterator[ReplayStep]:
+        """
+        从第 start 步回放到第 stop 步，逐步产出 ReplayStep
+
+        Args:
+            progress: 接收回放的进度，默认由最近的检查点恢复；迭代过程中会被原地修改
+        """
+        stop = len(self.choices) if stop is None else stop
+        if not 0 <= start <= stop <= len(self.choices):
+            raise IndexError(f"回放范围超出记录: {start}..{stop}（共 {len(self.choices)} 步）")
+        if progress is None:
+            progress = self.seek(start)
+        for index in range(start, stop):
+            yield self._apply(progress, index)
+
+    def seek(self, step: int) -> StoryProgress:
+        """
+        返回做出前 step 个选择之后的进度（新的独立对象）
+
+        从最近的检查点恢复，只回放其后的 step - 检查点 步，沿途补存检查点。
+        """
+        if not 0 <= step <= len(self.choices):
+            raise IndexError(f"步号超出记录: {step}（共 {len(self.choices)} 步）")
+        checkpoint = self.nearest_checkpoint(step)
+        progress = self._restore(checkpoint)
+        for index in range(checkpoint, step):
+            self._apply(progress, index)
+        return progress
+
+    def verify(self) -> StoryProgress:
+        """回放全部记录（沿途保存检查点），返回最终进度；无法回放时抛出 ReplayError"""
+        return self.seek(len(self.choices))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="回放存档中的选择记录")
+    parser.add_argument("save", help="存档 JSON 文件（完整存档或故事进度）")
+    parser.add_argument("--step", type=int, default=None, help="输出第几步之后的进度（默认最后一步）")
+    parser.add_argument("--strict", action="store_true", help="场景不连续时报错而不是切换场景")
+    args = parser.parse_args(argv)
+
+    with open(args.save, 'r', encoding='utf-8') as f:
+        replay = Replay.from_save(json.load(f), strict=args.strict)
+    try:
+        progress = replay.seek(len(replay) if args.step is None else args.step)
+    except (ReplayError, IndexError) as e:
+        parser.exit(1, f"回放失败: {e}\n")
+    data = progress.serialize()
+    data['steps'] = len(progress.choices_made)
+    data['noise_seed'] = replay.noise_seed(len(progress.choices_made))
+    del data['choices_made']
+    json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+场景图索引
+
+StoryContent 只按场景ID（编号）查场景；「哪些场景通向这里」「某个角色在哪些场景出现」
+「这个场景离结局还有多远」都需要扫描全部场景。SceneGraph 一次性建立这些索引：
+
+    反向边          场景ID -> 有选项跳到它的场景
+    角色索引        角色ID -> 出现的场景（场景的 character_id，以及选项条件、效果中
+                    trust() / discovered() 引用的角色）
+    章节成员        章节 -> 场景（以及 场景ID -> 章节）
+    到结局的距离    结局 -> {场景ID: 最少选择次数}（从各结局沿反向边广度优先）
+    离开场的距离    场景ID -> 从 start 出发的最少选择次数（用于估计还走不到结局的进度）
+
+距离按选项图计算，不考虑选项条件，是实际游玩中所需选择次数的下界。
+索引只需要各场景的选项、character_id 和章节：使用故事包时直接由包中的场景和选项记录建立
+（StoryBundle.scene_graph，不还原场景、不加载章节），否则由加载后的全部场景建立。
+通过 StoryContent.graph 获取（首次访问时构建，热重载替换章节后重建）。
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .conditions import compile_condition, compile_effect, split_key
+from .story_base import ENDING_IDS, StoryScene, StoryState
+
+
+def choice_characters(condition: Optional[str], effect: Optional[str],
+                      variable_keys: Iterable[str] = ()) -> Tuple[str, ...]:
+    """一个选项的条件、效果和 variable_changes 中引用的角色ID"""
+    keys = list(variable_keys)
+    if condition:
+        keys.extend(sorted(compile_condition(condition).dependencies))
+    if effect:
+        compiled = compile_effect(effect)
+        keys.extend(sorted(compiled.dependencies | compiled.targets))
+    return tuple(dict.fromkeys(name for field, name in map(split_key, keys) if field is not None))
+
+
+class SceneGraph:
+    """只读的场景图索引"""
+
+    def __init__(self, edges: Mapping[str, Sequence[str]], characters: Mapping[str, Sequence[str]],
+                 chapters: Mapping[str, int], endings: Iterable[str] = ENDING_IDS):
+        """
+        Args:
+            edges: 场景ID -> 各选项的目标场景ID（每个场景一项）
+            characters: 场景ID -> 出现的角色ID（character_id 在前；没有角色的场景可以省略）
+            chapters: 场景ID -> 章节
+            endings: 结局场景ID（不在 edges 中的忽略）
+        """
+        successors: Dict[str, Tuple[str, ...]] = {}
+        predecessors: Dict[str, List[str]] = {}
+        character_scenes: Dict[str, List[str]] = {}
+        chapter_scenes: Dict[int, List[str]] = {}
+        chapter_characters: Dict[int, Dict[str, None]] = {}
+        for scene_id, targets in edges.items():
+            targets = tuple(dict.fromkeys(targets))
+            successors[scene_id] = targets
+            for target in targets:
+                predecessors.setdefault(target, []).append(scene_id)
+            scene_characters = characters.get(scene_id, ())
+            for character_id in scene_characters:
+                character_scenes.setdefault(character_id, []).append(scene_id)
+            chapter = chapters.get(scene_id)
+            if chapter is not None:
+                chapter_scenes.setdefault(chapter, []).append(scene_id)
+                for character_id in scene_characters:
+                    chapter_characters.setdefault(chapter, {})[character_id] = None
+
+        self._successors = successors
+        self._predecessors = {scene_id: tuple(sources) for scene_id, sources in predecessors.items()}
+        self._character_scenes = {character_id: tuple(ids) for character_id, ids in character_scenes.items()}
+        self._chapter_scenes = {chapter: tuple(ids) for chapter, ids in sorted(chapter_scenes.items())}
+        self._chapters = {scene_id: chapters[scene_id] for scene_id in edges if scene_id in chapters}
+        self._chapter_characters = {chapter: tuple(ids) for chapter, ids in chapter_characters.items()}
+        self._ending_distances = {ending: self._breadth_first(ending, self._predecessors)
+                                  for ending in endings if ending in edges}
+        self._depths = self._breadth_first(StoryState.START.value, self._successors)
+        self._max_depth = max(self._depths.values(), default=0)
+        # 场景ID -> (到最近结局的距离, 结局)
+        self._nearest: Dict[str, Tuple[int, str]] = {}
+        for ending, distances in self._ending_distances.items():
+            for scene_id, distance in distances.items():
+                if scene_id not in self._nearest or distance < self._nearest[scene_id][0]:
+                    self._nearest[scene_id] = (distance, ending)
+
+    @classmethod
+    def from_scenes(cls, scenes: Mapping[str, StoryScene], chapters: Mapping[str, int]) -> 'SceneGraph':
+        """由场景对象构建"""
+        characters = {}
+        for scene_id, scene in scenes.items():
+            ids = [scene.character_id] if scene.character_id else []
+            for choice in scene.choices:
+                ids.extend(choice_characters(choice.condition, choice.effect, choice.variable_changes or ()))
+            if ids:
+                characters[scene_id] = tuple(dict.fromkeys(ids))
+        return cls({scene_id: [choice.next_state for choice in scene.choices]
+                    for scene_id, scene in scenes.items()},
+                   characters, chapters)
+
+    @classmethod
+    def from_content(cls, story_content) -> 'SceneGraph':
+        """由 StoryContent 的场景构建（会加载全部章节）"""
+        scenes = story_content.scenes
+        return cls.from_scenes(scenes, {scene_id: story_content.chapter_of(scene_id) for scene_id in scenes})
+
+    @staticmethod
+    def _breadth_first(origin: str, edges: Mapping[str, Tuple[str, ...]]) -> Dict[str, int]:
+        """从 origin 沿 edges 广度优先：到达的场景 -> 最少步数"""
+        distances = {origin: 0}
+        queue = deque((origin,))
+        while queue:
+            scene_id = queue.popleft()
+            distance = distances[scene_id] + 1
+            for neighbour in edges.get(scene_id, ()):
+                if neighbour not in distances:
+                    distances[neighbour] = distance
+                    queue.append(neighbour)
+        return distances
+
+    # ---------- 边 ----------
+    def predecessors(self, scene_id: str) -> Tuple[str, ...]:
+        """有选项跳到 scene_id 的场景（可能包含 scene_id 自身）"""
+        return self._predecessors.get(scene_id, ())
+
+    def successors(self, scene_id: str) -> Tuple[str, ...]:
+        """scene_id 的选项跳到的场景（去重，保持选项顺序）"""
+        return self._successors.get(scene_id, ())
+
+    # ---------- 角色和章节 ----------
+    def scenes_with_character(self, character_id: str) -> Tuple[str, ...]:
+        """角色出现的场景"""
+        return self._character_scenes.get(character_id, ())
+
+    def characters_in_chapter(self, chapter: int) -> Tuple[str, ...]:
+        """章节中出现的角色ID（按首次出现的顺序）"""
+        return self._chapter_characters.get(chapter, ())
+
+    def chapter_scenes(self, chapter: int) -> Tuple[str, ...]:
+        """章节中的场景"""
+        return self._chapter_scenes.get(chapter, ())
+
+    def chapter_of(self, scene_id: str) -> Optional[int]:
+        """场景所在章节"""
+        return self._chapters.get(scene_id)
+
+    @property
+    def chapters(self) -> Tuple[int, ...]:
+        return tuple(self._chapter_scenes)
+
+    # ---------- 到结局的距离 ----------
+    def distance_to_ending(self, scene_id: str, ending: Optional[str] = None) -> Optional[int]:
+        """
+        从 scene_id 到结局（默认最近的结局）最少还需要几次选择；到不了时返回 None
+        """
+        if ending is not None:
+            return self._ending_distances.get(ending, {}).get(scene_id)
+        nearest = self._nearest.get(scene_id)
+        return None if nearest is None else nearest[0]
+
+    def nearest_ending(self, scene_id: str) -> Optional[str]:
+        """离 scene_id 最近的结局"""
+        nearest = self._nearest.get(scene_id)
+        return None if nearest is None else nearest[1]
+
+    def distance_from_start(self, scene_id: str) -> Optional[int]:
+        """从开场到 scene_id 最少需要几次选择；走不到时返回 None"""
+        return self._depths.get(scene_id)
+
+    def progress_of(self, scene_id: str) -> Optional[float]:
+        """
+        scene_id 在故事中的大致位置（0~1）
+
+        能到达结局时为 离开场距离 / (离开场距离 + 到结局距离)，从开场走不到的场景离开场距离按最深处计；
+        到不了结局时按离开场距离占开场能走到的最深处的比例估计。
+        场景不存在或既不连着开场也不连着结局时返回 None。
+        """
+        depth = self._depths.get(scene_id)
+        remaining = self.distance_to_ending(scene_id)
+        if remaining is not None:
+            if depth is None:
+                depth = self._max_depth
+            return 1.0 if depth + remaining == 0 else depth / (depth + remaining)
+        if depth is None:
+            return None
+        return depth / self._max_depth if self._max_depth else 0.0
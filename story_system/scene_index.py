@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+场景索引（自动生成，请勿手动编辑）
+由 python -m story_system.story_bundle 重新生成
+"""
+
+# 场景来源：modules（章节模块）或 scripts（剧本脚本）
+SCENE_INDEX_SOURCE = 'modules'
+
+# 场景编号 -> 场景ID（编号与故事包中的场景记录顺序一致）
+SCENE_IDS = (
+    'start',  # 0
+    'chapter1_photo',  # 1
+    'chapter1_locked',  # 2
+    'chapter1_exploring',  # 3
+    'chapter1_radio',  # 4
+    'chapter1_rocking_chair',  # 5
+    'chapter1_dialogue_end',  # 6
+    'chapter2_act1_scene1',  # 7
+    'chapter2_act1_contact1',  # 8
+    'chapter2_act1_scene2',  # 9
+    'chapter2_act1_scene3',  # 10
+    'chapter2_act1_scene4',  # 11
+    'chapter2_act1_scene5',  # 12
+    'chapter2_act2_intro',  # 13
+    'chapter2_act2_contact1',  # 14
+    'chapter2_act2_contact2',  # 15
+    'chapter2_act2_contact3',  # 16
+    'chapter2_act2_contact4',  # 17
+    'chapter2_act2_contact5',  # 18
+    'chapter2_act3_intro',  # 19
+    'chapter2_man_appears',  # 20
+    'chapter3_choice_intro',  # 21
+    'chapter3_act1_view1',  # 22
+    'chapter3_act1_view2',  # 23
+    'chapter3_act1_view3',  # 24
+    'chapter3_act2_intro',  # 25
+    'chapter3_final_accept',  # 26
+    'chapter3_final_review',  # 27
+    'chapter4_final_choice',  # 28
+    'ending1_accept',  # 29
+    'ending2_knowledge',  # 30
+)
+
+SCENE_CHAPTERS = {
+    'start': 1,
+    'chapter1_photo': 1,
+    'chapter1_locked': 1,
+    'chapter1_exploring': 1,
+    'chapter1_radio': 1,
+    'chapter1_rocking_chair': 1,
+    'chapter1_dialogue_end': 1,
+    'chapter2_act1_scene1': 2,
+    'chapter2_act1_contact1': 2,
+    'chapter2_act1_scene2': 2,
+    'chapter2_act1_scene3': 2,
+    'chapter2_act1_scene4': 2,
+    'chapter2_act1_scene5': 2,
+    'chapter2_act2_intro': 2,
+    'chapter2_act2_contact1': 2,
+    'chapter2_act2_contact2': 2,
+    'chapter2_act2_contact3': 2,
+    'chapter2_act2_contact4': 2,
+    'chapter2_act2_contact5': 2,
+    'chapter2_act3_intro': 2,
+    'chapter2_man_appears': 2,
+    'chapter3_choice_intro': 3,
+    'chapter3_act1_view1': 3,
+    'chapter3_act1_view2': 3,
+    'chapter3_act1_view3': 3,
+    'chapter3_act2_intro': 3,
+    'chapter3_final_accept': 3,
+    'chapter3_final_review': 3,
+    'chapter4_final_choice': 4,
+    'ending1_accept': 4,
+    'ending2_knowledge': 4,
+}
@@ -4,12 +4,28 @@
 基础类型定义和枚举
 """
 
-from typing import Dict, List, Any, Optional
+import os
+import sys
+from typing import Dict, Iterator, Any, Mapping, Optional, Sequence, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
-class StoryState(Enum):
-    """故事状态枚举"""
+# 章节编号 -> 章节模块名（模块内提供 get_chapterN_content()）
+CHAPTER_MODULES = {
+    1: "story_chapter1",
+    2: "story_chapter2",
+    3: "story_chapter3",
+    4: "story_chapter4",
+}
+
+# 默认的编译故事包位置（见 story_bundle.py）
+DEFAULT_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "story.bundle")
+
+# 结局场景ID
+ENDING_IDS = ("ending1_accept", "ending2_knowledge", "ending3_loop")
+
+class StoryState(str, Enum):
+    """故事状态枚举（成员即场景ID字符串；完整的场景编号表见 scene_index.py）"""
     START = "start"
     CHAPTER1_TRAPPED = "chapter1_trapped"
     CHAPTER1_EXPLORING = "chapter1_exploring"
@@ -33,46 +49,131 @@ class StoryState(Enum):
     ENDING2_KNOWLEDGE = "ending2_knowledge"
     ENDING3_LOOP = "ending3_loop"
 
-@dataclass
+# 内容类型在 Python 3.10+ 上使用 __slots__（dataclass 的 slots 参数从 3.10 开始提供）
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+def intern_text(text: Optional[str]) -> Optional[str]:
+    """把场景ID、标题、正文行等放入进程级字符串池，相同内容只保留一份"""
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+class FrozenMapping(Mapping):
+    """只读、可哈希的映射（用于内容类型中的 variable_changes）"""
+
+    __slots__ = ('_data', '_hash')
+
+    def __init__(self, data: Optional[Mapping[str, Any]] = None):
+        self._data = {intern_text(key): value for key, value in (data or {}).items()}
+        self._hash = None
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"FrozenMapping({self._data!r})"
+
+
+def freeze_mapping(data: Optional[Mapping[str, Any]]) -> Optional[FrozenMapping]:
+    """把普通字典转换为 FrozenMapping（None 保持不变）"""
+    if data is None or isinstance(data, FrozenMapping):
+        return data
+    return FrozenMapping(data)
+
+
+def _set_fields(obj, **values):
+    """在 frozen dataclass 的 __post_init__ 中规范化字段"""
+    for name, value in values.items():
+        object.__setattr__(obj, name, value)
+
+
+@dataclass(frozen=True, **_SLOTS)
 class StoryChoice:
-    """故事选择选项"""
+    """故事选择选项（不可变，可哈希）
+
+    condition 和 effect 是表达式字符串（语法见 conditions.py），
+    例如 condition="view_count >= 2"、effect="view_count += 1"。
+    """
     text: str
     next_state: str
     action: Optional[str] = None
     condition: Optional[str] = None
-    variable_changes: Optional[Dict[str, Any]] = None
+    variable_changes: Optional[Mapping[str, Any]] = None
+    effect: Optional[str] = None
 
-@dataclass
+    def __post_init__(self):
+        _set_fields(
+            self,
+            text=intern_text(self.text),
+            next_state=intern_text(self.next_state),
+            action=intern_text(self.action),
+            condition=intern_text(self.condition),
+            variable_changes=freeze_mapping(self.variable_changes),
+            effect=intern_text(self.effect),
+        )
+
+@dataclass(frozen=True, **_SLOTS)
 class StoryScene:
-    """故事场景"""
+    """故事场景（不可变，可哈希；content 和 choices 为元组）"""
     id: str
     title: str
-    content: List[str]
-    choices: List[StoryChoice]
+    content: Sequence[str]
+    choices: Sequence[StoryChoice]
     audio_effect: Optional[str] = None
     transition_effect: Optional[str] = None
     character_id: Optional[str] = None
-    variable_changes: Optional[Dict[str, Any]] = None
+    variable_changes: Optional[Mapping[str, Any]] = None
+
+    def __post_init__(self):
+        content: Tuple[str, ...] = tuple(intern_text(line) for line in self.content)
+        choices: Tuple[StoryChoice, ...] = tuple(self.choices)
+        _set_fields(
+            self,
+            id=intern_text(self.id),
+            title=intern_text(self.title),
+            content=content,
+            choices=choices,
+            audio_effect=intern_text(self.audio_effect),
+            transition_effect=intern_text(self.transition_effect),
+            character_id=intern_text(self.character_id),
+            variable_changes=freeze_mapping(self.variable_changes),
+        )
 
 class CharacterProfile:
     """角色档案"""
     
+    __slots__ = ('character_id', 'name', 'description', 'personality', 'background',
+                 'voice_style', 'frequency', 'trust_level', 'available', 'discovered',
+                 'callsign', 'color')
+    
     def __init__(self, character_id: str, name: str, description: str, 
                  personality: str, background: str, voice_style: str,
                  frequency: int, trust_level: int = 0):
-        self.character_id = character_id
-        self.name = name
-        self.description = description
-        self.personality = personality
-        self.background = background
-        self.voice_style = voice_style
+        # 静态档案文字在所有会话的角色管理器之间共享同一份字符串
+        self.character_id = intern_text(character_id)
+        self.name = intern_text(name)
+        self.description = intern_text(description)
+        self.personality = intern_text(personality)
+        self.background = intern_text(background)
+        self.voice_style = intern_text(voice_style)
         self.frequency = frequency
         self.trust_level = trust_level
         self.available = True
         self.discovered = False
         
         # 添加callsign和color属性
-        self.callsign = character_id.upper()
+        self.callsign = intern_text(character_id.upper())
         self.color = self._get_character_color(character_id)
     
     def _get_character_color(self, character_id: str) -> str:
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译后的故事包（story bundle）
+
+把各章节模块编译成一个二进制文件，启动时一次读取即可还原全部场景，
+不必再导入章节模块、逐个执行 get_chapterN_content()。
+
+文件布局（小端序）：
+    头部      magic(4) version(u16) reserved(u16)
+              字符串数 行数 场景数 选项数 清单字符串索引（均为 u32）
+    字符串表  (字符串数 + 1) 个 u32 字符偏移 + UTF-8 文本块
+    行表      每行一个 u32 字符串索引（场景 content 的各行）
+    场景表    每个场景一条定长记录，见 _SCENE_RECORD
+    选项表    每个选项一条定长记录，见 _CHOICE_RECORD
+
+清单（manifest）是一段 JSON，记录编译时各源文件的 sha1 和 (st_mtime_ns, st_size)，
+加载时若源文件仍在且内容已变化，则认为故事包过期，回退到 Python 模块。
+检查时先比较 stat，一致就不再读取文件；不一致（例如重新检出了仓库）时才计算 sha1 比较内容。
+由剧本脚本编译的故事包（见 story_script.py）还在清单中记录各场景小节的哈希。
+
+编译时同时重新生成 scene_index.py（场景ID -> 章节编号），
+供 StoryContent 按章节延迟加载。索引中的 SCENE_INDEX_SOURCE 记录它来自章节模块（"modules"）
+还是剧本脚本（"scripts"）：来自剧本的索引不描述章节模块，故事包缺失或过期时
+StoryContent 不会拿它去按章加载章节模块（见 StoryContent._open_source）。
+
+用法：
+    python -m story_system.story_bundle            # 编译到默认路径
+    python -m story_system.story_bundle out.bundle # 编译到指定路径
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import struct
+import sys
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .conditions import compile_scene_rules
+from .scene_graph import SceneGraph, choice_characters
+from .story_base import CHAPTER_MODULES, DEFAULT_BUNDLE_PATH, StoryChoice, StoryScene, intern_text
+
+BUNDLE_MAGIC = b"RSTB"
+BUNDLE_VERSION = 2
+
+_HEADER = struct.Struct("<4sHHIIIII")
+# id title 行起点 行数 选项起点 选项数 章节 audio transition character variable_changes
+_SCENE_RECORD = struct.Struct("<IIIIIIIiiii")
+# text next_state action condition variable_changes effect
+_CHOICE_RECORD = struct.Struct("<IIiiii")
+
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENE_INDEX_PATH = os.path.join(_SOURCE_DIR, "scene_index.py")
+
+
+class BundleError(Exception):
+    """故事包格式错误"""
+
+
+def _file_sha1(path: str) -> Optional[str]:
+    """计算文件 sha1，文件不存在时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _file_stat(path: str) -> Optional[List[int]]:
+    """文件的 [st_mtime_ns, st_size]，文件不存在时返回 None"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return [info.st_mtime_ns, info.st_size]
+
+
+def _fingerprint_sources(files: Mapping[str, str]) -> Tuple[Dict[str, str], Dict[str, List[int]]]:
+    """
+    源文件 相对名 -> 路径 的 (sha1, stat) 清单
+
+    先取 stat 再读内容：读取期间被改写的文件 stat 对不上，过期检查会回到比较 sha1。
+    """
+    stats = {name: _file_stat(path) for name, path in files.items()}
+    sources = {name: _file_sha1(path) for name, path in files.items()}
+    return sources, stats
+
+
+def _chapter_source_files() -> Dict[str, str]:
+    """章节源文件：相对名 -> 绝对路径"""
+    files = {}
+    for module_name in CHAPTER_MODULES.values():
+        name = module_name + ".py"
+        files[name] = os.path.join(_SOURCE_DIR, name)
+    return files
+
+
+class _StringTable:
+    """编译期字符串表（相同字符串只存一份）"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, text: str) -> int:
+        index = self._index.get(text)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(text)
+            self._index[text] = index
+        return index
+
+    def add_optional(self, text: Optional[str]) -> int:
+        return -1 if text is None else self.add(text)
+
+    def add_mapping(self, mapping: Optional[Mapping]) -> int:
+        if mapping is None:
+            return -1
+        return self.add(json.dumps(dict(mapping), ensure_ascii=False, sort_keys=True))
+
+
+def compile_bundle(chapters: Dict[int, Dict[str, StoryScene]],
+                   sources: Optional[Dict[str, str]] = None,
+                   manifest: Optional[Dict[str, Any]] = None,
+                   source_stats: Optional[Dict[str, List[int]]] = None) -> bytes:
+    """
+    把章节场景编译为故事包字节串
+
+    Args:
+        chapters: 章节编号 -> {场景ID: StoryScene}
+        sources: 源文件相对名 -> sha1，写入清单用于过期检查
+        manifest: 写入清单的其他字段
+        source_stats: 源文件相对名 -> [st_mtime_ns, st_size]，过期检查时先比较它
+    """
+    strings = _StringTable()
+    manifest_index = strings.add(json.dumps(
+        {**(manifest or {}), "version": BUNDLE_VERSION, "sources": sources or {},
+         "source_stats": source_stats or {}},
+        ensure_ascii=False, sort_keys=True
+    ))
+
+    lines: List[int] = []
+    scene_records: List[bytes] = []
+    choice_records: List[bytes] = []
+
+    for chapter in sorted(chapters):
+        for scene in chapters[chapter].values():
+            compile_scene_rules(scene)  # 条件或效果写错时在编译阶段报错
+            line_start = len(lines)
+            lines.extend(strings.add(line) for line in scene.content)
+            choice_start = len(choice_records)
+            for choice in scene.choices:
+                choice_records.append(_CHOICE_RECORD.pack(
+                    strings.add(choice.text),
+                    strings.add(choice.next_state),
+                    strings.add_optional(choice.action),
+                    strings.add_optional(choice.condition),
+                    strings.add_mapping(choice.variable_changes),
+                    strings.add_optional(choice.effect),
+                ))
+            scene_records.append(_SCENE_RECORD.pack(
+                strings.add(scene.id),
+                strings.add(scene.title or ""),
+                line_start, len(scene.content),
+                choice_start, len(scene.choices),
+                chapter,
+                strings.add_optional(scene.audio_effect),
+                strings.add_optional(scene.transition_effect),
+                strings.add_optional(scene.character_id),
+                strings.add_mapping(scene.variable_changes),
+            ))
+
+    # 偏移按字符计算，加载时整块解码一次后直接切片
+    offsets = [0]
+    for text in strings.strings:
+        offsets.append(offsets[-1] + len(text))
+    blob = "".join(strings.strings).encode("utf-8")
+
+    parts = [
+        _HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(strings.strings), len(lines),
+                     len(scene_records), len(choice_records), manifest_index),
+        struct.pack("<I", len(blob)),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        blob,
+        struct.pack(f"<{len(lines)}I", *lines),
+    ]
+    parts.extend(scene_records)
+    parts.extend(choice_records)
+    return b"".join(parts)
+
+
+class StoryBundle:
+    """已加载的故事包"""
+
+    def __init__(self, data: bytes):
+        try:
+            self._parse(memoryview(data))
+        except (struct.error, UnicodeDecodeError, ValueError) as e:
+            raise BundleError(f"故事包损坏: {e}") from e
+
+    @classmethod
+    def open(cls, path: str) -> 'StoryBundle':
+        """一次性读取故事包文件"""
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def _parse(self, view: memoryview):
+        (magic, version, _reserved, n_strings, n_lines,
+         n_scenes, n_choices, manifest_index) = _HEADER.unpack_from(view, 0)
+        if magic != BUNDLE_MAGIC:
+            raise BundleError("不是故事包文件")
+        if version != BUNDLE_VERSION:
+            raise BundleError(f"不支持的故事包版本: {version}")
+
+        pos = _HEADER.size
+        (blob_size,) = struct.unpack_from("<I", view, pos)
+        pos += 4
+        offsets = struct.unpack_from(f"<{n_strings + 1}I", view, pos)
+        pos += 4 * (n_strings + 1)
+        text = bytes(view[pos:pos + blob_size]).decode("utf-8")
+        pos += blob_size
+        # 放入进程级字符串池：多次加载同一故事包（或不同版本间相同的文字）只保留一份
+        self.strings = [intern_text(text[offsets[i]:offsets[i + 1]]) for i in range(n_strings)]
+
+        self._lines = struct.unpack_from(f"<{n_lines}I", view, pos)
+        pos += 4 * n_lines
+        self._scenes = list(_SCENE_RECORD.iter_unpack(view[pos:pos + _SCENE_RECORD.size * n_scenes]))
+        pos += _SCENE_RECORD.size * n_scenes
+        self._choices = list(_CHOICE_RECORD.iter_unpack(view[pos:pos + _CHOICE_RECORD.size * n_choices]))
+
+        self.manifest = json.loads(self.strings[manifest_index])
+        self._records_by_id = None
+
+    # ---------- 过期检查 ----------
+    def is_stale(self) -> bool:
+        """
+        源文件仍在且内容变化时视为过期；源文件不存在（只发布故事包）时不算过期
+
+        stat 与清单记录一致的源文件不再读取；只有 stat 变化的文件才计算 sha1。
+        """
+        stats = self.manifest.get("source_stats", {})
+        for name, digest in self.manifest.get("sources", {}).items():
+            path = os.path.join(_SOURCE_DIR, name)
+            stat = _file_stat(path)
+            if stat is None or stat == stats.get(name):
+                continue
+            current = _file_sha1(path)
+            if current is not None and current != digest:
+                return True
+        return False
+
+    # ---------- 解码 ----------
+    def _string(self, index: int) -> Optional[str]:
+        return None if index < 0 else self.strings[index]
+
+    def _mapping(self, index: int) -> Optional[dict]:
+        return None if index < 0 else json.loads(self.strings[index])
+
+    def _build_scene(self, record) -> StoryScene:
+        (scene_id, title, line_start, line_count, choice_start, choice_count,
+         _chapter, audio, transition, character, variable_changes) = record
+        strings = self.strings
+        choices = tuple(
+            StoryChoice(
+                strings[text], strings[next_state],
+                action=self._string(action),
+                condition=self._string(condition),
+                variable_changes=self._mapping(choice_changes),
+                effect=self._string(effect),
+            )
+            for text, next_state, action, condition, choice_changes, effect in
+            self._choices[choice_start:choice_start + choice_count]
+        )
+        return StoryScene(
+            id=strings[scene_id],
+            title=strings[title],
+            content=tuple(strings[i] for i in self._lines[line_start:line_start + line_count]),
+            choices=choices,
+            audio_effect=self._string(audio),
+            transition_effect=self._string(transition),
+            character_id=self._string(character),
+            variable_changes=self._mapping(variable_changes),
+        )
+
+    def load_all(self) -> Dict[str, StoryScene]:
+        """还原全部场景"""
+        return {self.strings[record[0]]: self._build_scene(record) for record in self._scenes}
+
+    def load_chapter(self, chapter: int) -> Dict[str, StoryScene]:
+        """只还原指定章节的场景"""
+        return {self.strings[record[0]]: self._build_scene(record)
+                for record in self._scenes if record[6] == chapter}
+
+    def scene(self, scene_id: str) -> Optional[StoryScene]:
+        """还原单个场景（不存在时返回 None）"""
+        if self._records_by_id is None:
+            self._records_by_id = {self.strings[record[0]]: record for record in self._scenes}
+        record = self._records_by_id.get(scene_id)
+        return None if record is None else self._build_scene(record)
+
+    def scene_chapters(self) -> Dict[str, int]:
+        """场景ID -> 章节编号"""
+        return {self.strings[record[0]]: record[6] for record in self._scenes}
+
+    def scene_graph(self) -> SceneGraph:
+        """由场景和选项记录直接建立场景图索引（不还原场景对象）"""
+        strings = self.strings
+        edges: Dict[str, List[str]] = {}
+        characters: Dict[str, tuple] = {}
+        chapters: Dict[str, int] = {}
+        for record in self._scenes:
+            scene_id = strings[record[0]]
+            choice_start, choice_count = record[4], record[5]
+            choices = self._choices[choice_start:choice_start + choice_count]
+            edges[scene_id] = [strings[choice[1]] for choice in choices]
+            ids = [strings[record[9]]] if record[9] >= 0 else []
+            for _text, _next_state, _action, condition, changes, effect in choices:
+                ids.extend(choice_characters(self._string(condition), self._string(effect),
+                                             self._mapping(changes) or ()))
+            if ids:
+                characters[scene_id] = tuple(dict.fromkeys(ids))
+            chapters[scene_id] = record[6]
+        return SceneGraph(edges, characters, chapters)
+
+
+def load_bundle(path: str = DEFAULT_BUNDLE_PATH) -> Optional[StoryBundle]:
+    """读取故事包；不存在、损坏或已过期时返回 None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = StoryBundle.open(path)
+    except (OSError, BundleError):
+        return None
+    if bundle.is_stale():
+        return None
+    return bundle
+
+
+def _load_chapter_modules() -> Dict[int, Dict[str, StoryScene]]:
+    """直接从章节模块构建全部场景"""
+    chapters = {}
+    for chapter, module_name in CHAPTER_MODULES.items():
+        module = importlib.import_module(f".{module_name}", __package__)
+        chapters[chapter] = getattr(module, f"get_chapter{chapter}_content")()
+    return chapters
+
+
+# scene_index.py 的来源 -> 重新生成它的命令
+SCENE_INDEX_COMMANDS = {
+    "modules": "python -m story_system.story_bundle",
+    "scripts": "python -m story_system.story_script build",
+}
+
+
+def write_scene_index(chapters: Dict[int, Dict[str, StoryScene]],
+                      output_path: str = SCENE_INDEX_PATH, source: str = "modules") -> str:
+    """
+    生成 scene_index.py：场景编号表和 场景ID -> 章节编号
+
+    Args:
+        source: 场景来自章节模块（"modules"）还是剧本脚本（"scripts"）
+    """
+    ordered = [(scene_id, chapter) for chapter in sorted(chapters) for scene_id in chapters[chapter]]
+    lines = [
+        "# -*- coding: utf-8 -*-",
+        '"""',
+        "场景索引（自动生成，请勿手动编辑）",
+        f"由 {SCENE_INDEX_COMMANDS[source]} 重新生成",
+        '"""',
+        "",
+        "# 场景来源：modules（章节模块）或 scripts（剧本脚本）",
+        f"SCENE_INDEX_SOURCE = {source!r}",
+        "",
+        "# 场景编号 -> 场景ID（编号与故事包中的场景记录顺序一致）",
+        "SCENE_IDS = (",
+    ]
+    for number, (scene_id, _chapter) in enumerate(ordered):
+        lines.append(f"    {scene_id!r},  # {number}")
+    lines.extend([")", "", "SCENE_CHAPTERS = {"])
+    for scene_id, chapter in ordered:
+        lines.append(f"    {scene_id!r}: {chapter},")
+    lines.append("}")
+
+    temp_path = output_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def build_bundle(output_path: str = DEFAULT_BUNDLE_PATH,
+                 index_path: Optional[str] = SCENE_INDEX_PATH) -> str:
+    """从章节模块编译故事包并原子写入 output_path，同时刷新场景索引"""
+    chapters = _load_chapter_modules()
+    if index_path:
+        write_scene_index(chapters, index_path)
+
+    sources, stats = _fingerprint_sources(_chapter_source_files())
+    data = compile_bundle(chapters, sources, source_stats=stats)
+
+    temp_path = output_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BUNDLE_PATH
+    path = build_bundle(target)
+    print(f"故事包已生成: {path} ({os.path.getsize(path)} 字节)")
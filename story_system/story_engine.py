@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面故事推进引擎
+
+只负责状态转移：按 condition 筛选可见选项，应用选项的 variable_changes、
+effect 和 action，切换场景、记录结局。
+不打印、不等待、不读取输入，交互式游戏和批量模拟共用同一套转移逻辑。
+"""
+
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .conditions import SceneRules, compile_scene_rules
+from .story_base import ENDING_IDS, StoryChoice, StoryScene
+from .story_manager import StoryContent, StoryProgress
+
+# 策略回调：(进度, 当前场景, 可选项) -> 选项下标
+ChoicePolicy = Callable[[StoryProgress, StoryScene, List[StoryChoice]], int]
+# 特殊动作回调：(动作名, 进度)
+ActionHandler = Callable[[str, StoryProgress], None]
+
+
+@dataclass
+class PlaythroughResult:
+    """一次游玩的结果"""
+    progress: StoryProgress
+    ending: Optional[str] = None
+    steps: int = 0
+    path: List[str] = field(default_factory=list)
+    stopped: str = "ending"  # ending / dead_end / missing_scene / choices_exhausted / max_steps
+
+
+def random_policy(seed: Optional[int] = None) -> ChoicePolicy:
+    """随机选择策略（可指定种子以便复现）"""
+    rng = random.Random(seed)
+
+    def policy(progress, scene, choices):
+        return rng.randrange(len(choices))
+    return policy
+
+
+class StoryEngine:
+    """故事状态转移引擎"""
+
+    def __init__(self, story_content: Optional[StoryContent] = None,
+                 action_handler: Optional[ActionHandler] = None):
+        self.story_content = story_content or StoryContent.shared()
+        self.action_handler = action_handler
+
+    def new_progress(self) -> StoryProgress:
+        """创建一份不读写磁盘的新进度"""
+        return StoryProgress(story_content=self.story_content)
+
+    @staticmethod
+    def is_ending(scene: Optional[StoryScene]) -> bool:
+        """检查是否为结局场景"""
+        return scene is not None and scene.id in ENDING_IDS
+
+    def visible_choice_indices(self, progress: StoryProgress,
+                               scene: Optional[StoryScene] = None) -> Tuple[int, ...]:
+        """
+        场景（默认当前场景）中条件成立的选项下标
+
+        结果按场景缓存在 progress 中，只有条件依赖的变量被修改后才重新计算。
+        scene 是热重载前的旧场景对象时按它自己的条件计算，不使用缓存。
+        """
+        content = self.story_content
+        number = progress.state_number if scene is None else content.scene_number(scene.id)
+        # 先取条件再取场景（热重载先替换场景），两者总是对应同一版本
+        rules = content.choice_rules(number)
+        current = content.scene_at(number)
+        if scene is None:
+            scene = current
+            if scene is None:
+                return ()
+        elif scene is not current:
+            rules = compile_scene_rules(scene)
+            if rules is None:
+                return tuple(range(len(scene.choices)))
+            return self._evaluate(progress, rules)
+        if rules is None:
+            return tuple(range(len(scene.choices)))
+
+        revision = progress.revision_of(rules.dependencies)
+        cached = progress.choice_cache.get(number)
+        if cached is not None and cached[0] == revision and cached[2] is rules:
+            return cached[1]
+        visible = self._evaluate(progress, rules)
+        progress.choice_cache[number] = (revision, visible, rules)
+        return visible
+
+    @staticmethod
+    def _evaluate(progress: StoryProgress, rules: SceneRules) -> Tuple[int, ...]:
+        variables = progress.variables
+        characters = progress.character_manager.characters
+        return tuple(index for index, condition in enumerate(rules.conditions)
+                     if condition is None or condition(variables, characters))
+
+    def available_choices(self, progress: StoryProgress,
+                          scene: Optional[StoryScene] = None) -> List[StoryChoice]:
+        """当前场景中可以选择的选项（条件不成立的选项被隐藏）"""
+        if scene is None:
+            scene = progress.get_current_scene()
+        if scene is None:
+            return []
+        return [scene.choices[index] for index in self.visible_choice_indices(progress, scene)]
+
+    def apply_choice(self, progress: StoryProgress, choice: StoryChoice,
+                     choice_index: Optional[int] = None) -> Optional[StoryScene]:
+        """
+        执行一个选项，返回转移后的场景
+
+        Args:
+            choice_index: choice 在当前场景 choices 中的下标；提供时直接按场景跳转表切换
+                （当前场景已被热重载替换时退回按 choice.next_state 切换）
+        """
+        progress.make_choice(choice.next_state, choice.text)
+
+        # 处理变量变化
+        if choice.variable_changes:
+            for key, value in choice.variable_changes.items():
+                progress.set_variable(key, value)
+        if choice.effect:
+            progress.apply_effect(choice.effect)
+
+        number = None
+        if choice_index is not None:
+            number = self.story_content.choice_target(progress.state_number, choice_index, choice)
+        if number is not None:
+            progress.state_number = number
+        else:
+            progress.set_state(choice.next_state)
+        if choice.next_state in ENDING_IDS:
+            progress.unlock_ending(choice.next_state)
+
+        # 处理特殊动作
+        if choice.action and self.action_handler:
+            self.action_handler(choice.action, progress)
+
+        return progress.get_current_scene()
+
+    def choose(self, progress: StoryProgress, index: int) -> Optional[StoryScene]:
+        """按可选项下标（从 0 开始，只计可见选项）执行选择"""
+        scene = progress.get_current_scene()
+        visible = self.visible_choice_indices(progress, scene) if scene else ()
+        if not 0 <= index < len(visible):
+            raise IndexError(f"选项下标超出范围: {index}（共 {len(visible)} 项）")
+        return self.apply_choice(progress, scene.choices[visible[index]], visible[index])
+
+    def run(self, progress: Optional[StoryProgress] = None,
+            choices: Optional[Iterable[int]] = None,
+            policy: Optional[ChoicePolicy] = None,
+            max_steps: int = 1000) -> PlaythroughResult:
+        """
+        推进故事直到结局或无法继续
+
+        Args:
+            progress: 起始进度，默认新建
+            choices: 依次使用的选项下标（从 0 开始）
+            policy: choices 用完（或未提供）后用于决定选项的回调
+            max_steps: 最多推进的步数，防止循环剧情无限进行
+        """
+        if progress is None:
+            progress = self.new_progress()
+        scripted = iter(choices) if choices is not None else None
+        result = PlaythroughResult(progress=progress)
+        scene = progress.get_current_scene()
+        result.path.append(progress.current_state_id)
+
+        while True:
+            if scene is None:
+                result.stopped = "missing_scene"
+                return result
+            if self.is_ending(scene):
+                result.ending = scene.id
+                result.stopped = "ending"
+                return result
+            visible = self.visible_choice_indices(progress)
+            options = [scene.choices[i] for i in visible]
+            if not options:
+                result.stopped = "dead_end"
+                return result
+            if result.steps >= max_steps:
+                result.stopped = "max_steps"
+                return result
+
+            index = next(scripted, None) if scripted is not None else None
+            if index is None:
+                if policy is None:
+                    result.stopped = "choices_exhausted"
+                    return result
+                index = policy(progress, scene, options)
+            if not 0 <= index < len(options):
+                raise IndexError(f"选项下标超出范围: {index}（场景 {scene.id} 共 {len(options)} 项）")
+
+            scene = self.apply_choice(progress, options[index], visible[index])
+            result.steps += 1
+            result.path.append(progress.current_state_id)
+
+    def run_many(self, count: int, policy: ChoicePolicy, max_steps: int = 1000) -> Counter:
+        """批量游玩，返回各结局（或停止原因）的次数分布"""
+        outcomes = Counter()
+        for _ in range(count):
+            result = self.run(policy=policy, max_steps=max_steps)
+            outcomes[result.ending or result.stopped] += 1
+        return outcomes
@@ -4,76 +4,493 @@
 故事内容整合器和进度管理器
 """
 
+import hashlib
+import importlib
 import json
 import os
+import random
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
-from .story_base import StoryState
+from types import MappingProxyType
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+from .story_base import StoryState, CHAPTER_MODULES, DEFAULT_BUNDLE_PATH, intern_text
 from .characters import CharacterManager
+from .conditions import SceneRules, compile_effect, compile_scene_rules, split_key
+from .persistent import PMap, PVector
+from .scene_graph import SceneGraph
+
+_MISSING = object()
+
+
+class ChapterReload(NamedTuple):
+    """StoryContent.reload_chapter 的结果"""
+    chapter: int
+    added: Tuple[str, ...]  # 新增的场景ID
+    changed: Tuple[str, ...]  # 内容有变化的场景ID（章节尚未加载过时全部计入）
+    removed: Tuple[str, ...]  # 删除（或改名）的场景ID
+    redirects: Dict[str, str]  # 删除的场景ID -> 停在其中的进度转去的场景ID
+    seconds: float
+
 
 class StoryContent:
-    """故事内容整合器"""
+    """故事内容整合器
+
+    故事内容在进程内只读共享：通过 StoryContent.shared() 获取同一份实例，
+    各个 StoryProgress 只引用它，不再各自构建。
+
+    章节按需加载：get_scene 借助场景索引（场景ID -> 章节）只构建所在章节，
+    访问 scenes 属性时才加载全部章节。
+
+    每个场景ID对应一个稠密的整数编号（初始顺序来自生成的场景索引或故事包），
+    scene_at / next_scene_number 按编号直接索引场景表和选项跳转表，
+    场景ID字符串只在存档、显示等边界上使用。
+
+    reload_chapter 可以在运行中替换一章的内容（热重载，见 hot_reload.py），
+    场景编号保持不变，已有进度继续有效。
+    """
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    # 章节加载完成后的回调 (章节, 来源, 耗时秒)，供遥测使用；为 None 时不计时
+    load_observer = None
+    
+    def __init__(self, bundle_path: Optional[str] = DEFAULT_BUNDLE_PATH,
+                 lazy: bool = True, prefetch: bool = True):
+        """
+        Args:
+            bundle_path: 编译后的故事包路径；为 None 时总是从章节模块加载
+            lazy: 是否按章节延迟加载；False 时构造时即加载全部章节
+            prefetch: 进入某章后是否在后台预加载下一章
+        """
+        self.bundle_path = bundle_path
+        self.prefetch = prefetch
+        self.source = "modules"
+        self._scenes = {}
+        self._loaded_chapters = set()
+        self._prefetching = set()
+        self._load_lock = threading.RLock()
+        self._bundle = None
+        self._scene_chapters = {}
+        self._scene_ids = []  # 编号 -> 场景ID
+        self._scene_numbers = {}  # 场景ID -> 编号
+        self._scene_table = []  # 编号 -> 场景（未加载时为 None）
+        self._transitions = []  # 编号 -> 各选项目标场景的编号
+        self._choice_rules = []  # 编号 -> 编译后的选项条件（SceneRules，无条件时为 None）
+        self._redirects = {}  # 热重载时删除的场景编号 -> 替代场景编号
+        self.generation = 0  # 热重载次数
+        self._graph = None  # 场景图索引（首次访问 graph 时构建）
+        self._open_source()
+        if not lazy:
+            self._load_all_content()
+    
+    @classmethod
+    def shared(cls) -> 'StoryContent':
+        """获取进程内共享的故事内容（首次调用时构建）"""
+        if StoryContent._shared is None:
+            with StoryContent._shared_lock:
+                if StoryContent._shared is None:
+                    StoryContent._shared = cls()
+        return StoryContent._shared
     
-    def __init__(self):
-        self.scenes = {}
+    @classmethod
+    def from_scenes(cls, scenes: Dict[str, Any], chapters: Optional[Dict[str, int]] = None) -> 'StoryContent':
+        """
+        由现成的场景构建（不读取故事包或章节模块，例如在工作进程中还原主进程的内容）
+
+        Args:
+            scenes: 全部场景
+            chapters: 场景ID -> 章节
+        """
+        content = cls(bundle_path=None, prefetch=False)
+        with content._load_lock:
+            content.source = "scenes"
+            content._scene_chapters = dict(chapters or {})
+            content._register_scenes(scenes)
+            content._scenes.update(scenes)
+            content._loaded_chapters.update(CHAPTER_MODULES)
+        return content
+    
+    @property
+    def scenes(self):
+        """全部场景的只读视图（会加载所有章节）"""
         self._load_all_content()
+        return MappingProxyType(self._scenes)
+    
+    @property
+    def graph(self) -> SceneGraph:
+        """
+        场景图索引：反向边、角色、章节成员、到结局的距离（首次访问时构建）
+
+        使用故事包且没有热重载过时由故事包记录直接建立，不加载章节；否则加载全部章节后建立。
+        """
+        graph = self._graph
+        if graph is None:
+            with self._load_lock:
+                if self._graph is None:
+                    if self._bundle is not None and self.generation == 0:
+                        self._graph = self._bundle.scene_graph()
+                    else:
+                        self._graph = SceneGraph.from_content(self)
+                graph = self._graph
+        return graph
+    
+    def peek_graph(self) -> Optional[SceneGraph]:
+        """不需要加载章节就能得到的场景图索引（来自故事包或全部章节已加载）；否则返回 None"""
+        if self._graph is None and not ((self._bundle is not None and self.generation == 0)
+                                        or len(self._loaded_chapters) >= len(CHAPTER_MODULES)):
+            return None
+        return self.graph
+    
+    def _open_source(self):
+        """
+        确定内容来源：优先使用未过期的故事包，否则使用章节模块
+
+        场景索引来自剧本脚本（见 story_bundle.write_scene_index）时内容只能来自剧本故事包：
+        故事包缺失或过期时抛出 BundleError，而不是改用章节模块。
+        """
+        if self.bundle_path:
+            from .story_bundle import load_bundle
+            bundle = load_bundle(self.bundle_path)
+            if bundle is not None:
+                self._bundle = bundle
+                self._scene_chapters = bundle.scene_chapters()
+                for scene_id in self._scene_chapters:
+                    self.scene_number(scene_id)
+                self.source = "bundle"
+                return
+        
+        try:
+            from . import scene_index
+        except ImportError:
+            # 没有索引时只能整体加载
+            self._scene_chapters = {}
+            return
+        if getattr(scene_index, 'SCENE_INDEX_SOURCE', 'modules') != 'modules':
+            # 索引由剧本脚本生成，内容只在剧本故事包中，不能改用章节模块拼凑
+            if self.bundle_path:
+                from .story_bundle import BundleError
+                raise BundleError(f"故事内容由剧本脚本编译，但故事包 {self.bundle_path} 缺失或已过期；"
+                                  f"请重新运行 python -m story_system.story_script build，"
+                                  f"或运行 python -m story_system.story_bundle 改用章节模块")
+            self._scene_chapters = {}  # 明确要求章节模块：不使用剧本的索引，整体加载
+            return
+        self._scene_chapters = dict(scene_index.SCENE_CHAPTERS)
+        for scene_id in scene_index.SCENE_IDS:
+            self.scene_number(scene_id)
+    
+    # ---------- 场景编号 ----------
+    def scene_number(self, scene_id: str) -> int:
+        """场景ID对应的编号；未知的ID（如尚未加载或悬空的跳转目标）会分配新编号"""
+        number = self._scene_numbers.get(scene_id)
+        if number is not None:
+            return number
+        with self._load_lock:
+            number = self._scene_numbers.get(scene_id)
+            if number is None:
+                number = len(self._scene_ids)
+                self._scene_ids.append(intern_text(scene_id))
+                self._scene_table.append(None)
+                self._transitions.append(None)
+                self._choice_rules.append(None)
+                self._scene_numbers[self._scene_ids[number]] = number
+            return number
+    
+    def scene_id(self, number: int) -> str:
+        """编号对应的场景ID"""
+        return self._scene_ids[number]
+    
+    @property
+    def scene_count(self) -> int:
+        """已分配编号的场景数"""
+        return len(self._scene_ids)
+    
+    def _register_scenes(self, scenes: Dict[str, Any]):
+        """把新加载的场景填入场景表、跳转表和条件表（条件在这里一次性编译）"""
+        for scene_id, scene in scenes.items():
+            number = self.scene_number(scene_id)
+            self._transitions[number] = tuple(self.scene_number(choice.next_state)
+                                              for choice in scene.choices)
+            self._choice_rules[number] = compile_scene_rules(scene)
+            self._scene_table[number] = scene
+    
+    def scene_at(self, number: int):
+        """按编号获取场景（按需加载所在章节）"""
+        scene = self._scene_table[number]
+        if scene is None and number not in self._redirects:
+            scene = self.get_scene(self._scene_ids[number])
+        return scene
+    
+    def choice_rules(self, number: int) -> Optional[SceneRules]:
+        """编号为 number 的场景的选项条件；没有条件时返回 None"""
+        if self._scene_table[number] is None:
+            self.scene_at(number)
+        return self._choice_rules[number]
+    
+    def next_scene_number(self, number: int, choice_index: int) -> int:
+        """编号为 number 的场景中第 choice_index 个选项跳转到的场景编号"""
+        transitions = self._transitions[number]
+        if transitions is None:
+            self.scene_at(number)
+            transitions = self._transitions[number]
+        return transitions[choice_index]
+    
+    def choice_target(self, number: int, choice_index: int, choice) -> Optional[int]:
+        """
+        与 next_scene_number 相同，但只在该场景第 choice_index 个选项仍是 choice 时返回
+
+        调用方持有热重载之前的场景对象时返回 None，应改为按 choice.next_state 跳转。
+        先取跳转表再核对场景（reload_chapter 先替换场景），两者总是对应同一版本。
+        """
+        transitions = self._transitions[number]
+        scene = self._scene_table[number]
+        if (scene is None or transitions is None or choice_index >= len(scene.choices)
+                or scene.choices[choice_index] is not choice):
+            return None
+        return transitions[choice_index]
+    
+    def resolve_number(self, number: int) -> int:
+        """热重载中删除的场景转到替代场景（可能连续替代）；其余编号原样返回"""
+        seen = 0
+        while number in self._redirects and seen < len(self._redirects):
+            number = self._redirects[number]
+            seen += 1
+        return number
+    
+    def _load_chapter(self, chapter: int):
+        """加载单个章节（线程安全，重复调用无副作用）"""
+        if chapter in self._loaded_chapters or chapter not in CHAPTER_MODULES:
+            return
+        with self._load_lock:
+            if chapter in self._loaded_chapters:
+                return
+            observer = StoryContent.load_observer
+            start = time.perf_counter() if observer is not None else 0.0
+            if self._bundle is not None:
+                scenes = self._bundle.load_chapter(chapter)
+            else:
+                module = importlib.import_module(f".{CHAPTER_MODULES[chapter]}", __package__)
+                scenes = getattr(module, f"get_chapter{chapter}_content")()
+            self._register_scenes(scenes)
+            self._scenes.update(scenes)
+            for scene_id in scenes:
+                self._scene_chapters.setdefault(scene_id, chapter)
+            self._loaded_chapters.add(chapter)
+            if observer is not None:
+                observer(chapter, self.source, time.perf_counter() - start)
     
     def _load_all_content(self):
         """加载所有章节内容"""
-        from .story_chapter1 import get_chapter1_content
-        from .story_chapter2 import get_chapter2_content
-        from .story_chapter3 import get_chapter3_content
-        from .story_chapter4 import get_chapter4_content
-        
-        # 合并所有章节内容
-        self.scenes.update(get_chapter1_content())
-        self.scenes.update(get_chapter2_content())
-        self.scenes.update(get_chapter3_content())
-        self.scenes.update(get_chapter4_content())
+        if len(self._loaded_chapters) < len(CHAPTER_MODULES):
+            for chapter in CHAPTER_MODULES:
+                self._load_chapter(chapter)
+    
+    def chapter_of(self, scene_id: str) -> Optional[int]:
+        """查询场景所在章节（不触发加载）"""
+        return self._scene_chapters.get(scene_id)
+    
+    def prefetch_chapter(self, chapter: int):
+        """在后台线程预加载指定章节"""
+        if (not self.prefetch or chapter in self._loaded_chapters
+                or chapter in self._prefetching or chapter not in CHAPTER_MODULES):
+            return
+        self._prefetching.add(chapter)
+        thread = threading.Thread(target=self._load_chapter, args=(chapter,), daemon=True)
+        thread.start()
+    
+    # ---------- 热重载 ----------
+    def reload_chapter(self, chapter: int, scenes: Dict[str, Any],
+                       renames: Optional[Dict[str, str]] = None) -> ChapterReload:
+        """
+        用新构建的场景替换一章，其他章节不受影响
+
+        场景编号保持不变，与原来相等的场景保留原对象（渲染缓存和选项缓存继续有效）。
+        新场景的跳转表和条件全部编译成功后才开始替换，出错时原内容不变。
+
+        删除的场景记录一个替代场景，停在其中的进度在下一次 get_current_scene() 时转过去，
+        依次取：renames 指定的新ID、标题和正文都相同的新场景（视为改名）、
+        旧内容中跳到它且仍然存在的场景、本章第一个场景。
+
+        替换在 _load_lock 下进行，但读取场景表不加锁；多会话服务端应在事件循环线程中调用，
+        让会话只在两步之间看到新内容（见 hot_reload.py）。
+        """
+        start = time.perf_counter()
+        renames = renames or {}
+        with self._load_lock:
+            old_ids = [scene_id for scene_id, owner in self._scene_chapters.items() if owner == chapter]
+            old_set = set(old_ids)
+            added, changed, rows = [], [], []
+            for scene_id, scene in scenes.items():
+                number = self.scene_number(scene_id)
+                old = self._scene_table[number]
+                if old is not None and old == scene and scene_id in old_set:
+                    continue
+                (changed if scene_id in old_set else added).append(scene_id)
+                rows.append((number, scene,
+                             tuple(self.scene_number(choice.next_state) for choice in scene.choices),
+                             compile_scene_rules(scene)))
+            removed = [scene_id for scene_id in old_ids if scene_id not in scenes]
+            
+            renamed = {(scenes[scene_id].title, scenes[scene_id].content): scene_id for scene_id in added}
+            first = next(iter(scenes), StoryState.START.value)
+            redirects = {}
+            for scene_id in removed:
+                number = self._scene_numbers[scene_id]
+                old = self._scene_table[number]
+                target = renames.get(scene_id)
+                if target is None and old is not None:
+                    target = renamed.get((old.title, old.content))
+                if target is None:
+                    target = next((source for source in old_ids if source in scenes
+                                   and number in (self._transitions[self._scene_numbers[source]] or ())),
+                                  first)
+                redirects[scene_id] = target
+            
+            # 替换：每个编号先写场景，再写跳转表和条件（读取方按相反顺序读取并核对）
+            for number, scene, transitions, rules in rows:
+                self._scene_table[number] = scene
+                self._transitions[number] = transitions
+                self._choice_rules[number] = rules
+                self._redirects.pop(number, None)
+                self._scenes[self._scene_ids[number]] = scene
+                self._scene_chapters[self._scene_ids[number]] = chapter
+            for scene_id, target in redirects.items():
+                number = self._scene_numbers[scene_id]
+                self._redirects[number] = self.scene_number(target)
+                self._scene_table[number] = None
+                self._transitions[number] = None
+                self._choice_rules[number] = None
+                self._scenes.pop(scene_id, None)
+                self._scene_chapters.pop(scene_id, None)
+            self._loaded_chapters.add(chapter)
+            self._graph = None
+            self.generation += 1
+            seconds = time.perf_counter() - start
+            observer = StoryContent.load_observer
+            if observer is not None:
+                observer(chapter, "reload", seconds)
+        return ChapterReload(chapter, tuple(added), tuple(changed), tuple(removed), redirects, seconds)
     
     def get_scene(self, scene_id: str):
-        """获取指定场景"""
-        return self.scenes.get(scene_id)
+        """获取指定场景（按需加载所在章节）"""
+        scene = self._scenes.get(scene_id)
+        if scene is not None:
+            return scene
+        
+        chapter = self._scene_chapters.get(scene_id)
+        if chapter is not None and chapter not in self._loaded_chapters:
+            self._load_chapter(chapter)
+            scene = self._scenes.get(scene_id)
+            if scene is not None:
+                return scene
+        
+        # 索引中没有（或索引过期），退回到加载全部章节
+        self._load_all_content()
+        return self._scenes.get(scene_id)
+
+# ---------- 干扰种子 ----------
+def session_seed(choices) -> int:
+    """
+    选择记录所属会话的种子
+
+    优先使用第一条记录中保存的 session_seed；旧存档没有时由第一条记录的时间戳派生，没有记录时为 0。
+    """
+    if not choices:
+        return 0
+    first = choices[0]
+    if first.get('session_seed') is not None:
+        return first['session_seed']
+    timestamp = str(first.get('timestamp', ''))
+    return int.from_bytes(hashlib.sha256(timestamp.encode('utf-8')).digest()[:8], 'little')
+
+
+def step_seed(seed: int, step: int) -> int:
+    """第 step 步（已做出 step 个选择）的干扰种子"""
+    return int.from_bytes(hashlib.sha256(f"{seed}:{step}".encode('ascii')).digest()[:8], 'little')
+
+
+_INITIAL_VARIABLES = PMap({
+    'player_code_name': None,
+    'view_count': 0,
+    'first_view_choice': None,
+    'second_view_choice': None,
+    'third_view_choice': None,
+    'man_appeared': False,
+    'loop_count': 0,
+    'current_chapter': 1
+})
+_INITIAL_CHAPTER_PROGRESS = PMap({
+    "chapter1": False,
+    "chapter2": False,
+    "chapter3": False,
+    "chapter4": False
+})
+
+
+class ProgressState(NamedTuple):
+    """进度的一个不可变版本（由 StoryProgress.checkpoint() 生成，与之后的修改结构共享）"""
+    state_number: int
+    choices_made: PVector
+    variables: PMap
+    chapter_progress: PMap
+    endings_unlocked: Tuple[str, ...]
+    characters: Tuple[Tuple[str, int, bool, bool], ...]  # (角色ID, 信任度, 可用, 已发现)
+
 
 class StoryProgress:
-    """故事进度管理"""
+    """故事进度管理
+
+    选择记录、变量和章节进度保存在持久化容器（persistent.py）中：
+    每次修改生成新版本并与旧版本共享结构，因此 checkpoint() / fork() / undo()
+    的开销与选择历史长度无关。variables 等属性是只读映射，修改变量请使用 set_variable。
+    """
     
-    def __init__(self, save_file: str = "story_save.json"):
+    def __init__(self, save_file: Optional[str] = None,
+                 story_content: Optional[StoryContent] = None,
+                 autoload: bool = True, undo_limit: int = 100):
+        """
+        Args:
+            save_file: 独立进度文件路径（如 "story_save.json"），需要时显式指定；
+                默认 None，不读写文件（进度交给 SaveManager 保存）
+            story_content: 引用的故事内容，默认使用进程内共享实例
+            autoload: 指定了 save_file 时是否在构造时读取它
+            undo_limit: undo() 至少可以撤销最近这么多个选择（历史按批裁剪，最多保留两倍）；为 0 时不记录撤销历史
+        """
         self.save_file = save_file
-        self.current_state = StoryState.START
-        self.choices_made = []
-        self.variables = {
-            'player_code_name': None,
-            'view_count': 0,
-            'first_view_choice': None,
-            'second_view_choice': None,
-            'third_view_choice': None,
-            'man_appeared': False,
-            'loop_count': 0,
-            'current_chapter': 1
-        }
-        self.chapter_progress = {
-            "chapter1": False,
-            "chapter2": False,
-            "chapter3": False,
-            "chapter4": False
-        }
-        self.endings_unlocked = []
+        self.story_content = story_content or StoryContent.shared()
+        self.state_number = self.story_content.scene_number(StoryState.START.value)  # 当前场景编号
+        self._choices_made = PVector()
+        # 初始值是不可变的持久化字典，所有新进度共享同一份
+        self._variables = _INITIAL_VARIABLES
+        self._chapter_progress = _INITIAL_CHAPTER_PROGRESS
+        self._endings_unlocked = ()
+        # 会话种子：决定各步的信号干扰（noise_seed），随存档和第一条选择记录保存，回放时据此复现
+        self.session_seed = random.getrandbits(64)
         self.character_manager = CharacterManager()
-        self.story_content = StoryContent()
-        self.load_progress()
+        # 变量修订号：set_variable 等修改时递增，用于判断可见选项是否需要重新计算
+        self._revision = 0
+        self._key_revisions = {}  # 变量键 -> 最后一次修改时的修订号
+        self.choice_cache = {}  # 场景编号 -> (依赖修订号, 可见选项下标, 计算时的条件)
+        self._character_state = None  # 缓存的角色状态元组，角色状态修改后置为 None
+        # 撤销历史：(ProgressState, 更早的历史) 链表，多个分支可以共享同一段
+        self.undo_limit = undo_limit
+        self._history = None
+        self._history_depth = 0
+        if autoload:
+            self.load_progress()
     
     def load_progress(self):
         """加载进度"""
-        if os.path.exists(self.save_file):
+        if self.save_file and os.path.exists(self.save_file):
             try:
                 with open(self.save_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.current_state = StoryState(data.get('current_state', 'start'))
+                    self.set_state(data.get('current_state', 'start'))
                     self.choices_made = data.get('choices_made', [])
-                    self.variables.update(data.get('variables', {}))
-                    self.chapter_progress.update(data.get('chapter_progress', {}))
+                    self.variables = self.variables.merge(data.get('variables', {}))
+                    self.chapter_progress = self.chapter_progress.merge(data.get('chapter_progress', {}))
                     self.endings_unlocked = data.get('endings_unlocked', [])
+                    self._restore_session_seed(data)
                     
                     # 加载角色状态
                     char_data = data.get('characters', {})
@@ -89,32 +506,34 @@ class StoryProgress:
     
     def save_progress(self):
         """保存进度"""
+        if not self.save_file:
+            return
         try:
-            # 准备角色数据
-            char_data = {}
-            for char_id, char in self.character_manager.characters.items():
-                char_data[char_id] = char.to_dict()
-            data = {
-                'current_state': self.current_state.value if hasattr(self.current_state, 'value') else str(self.current_state),
-                'choices_made': self.choices_made,
-                'variables': self.variables,
-                'chapter_progress': self.chapter_progress,
-                'endings_unlocked': self.endings_unlocked,
-                'characters': char_data
-            }
+            data = self.serialize()
             with open(self.save_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"保存存档失败: {e}")
     
     def make_choice(self, choice_id: str, choice_text: str):
-        """记录选择"""
-        self.choices_made.append({
-            'state': self.current_state.value if hasattr(self.current_state, 'value') else str(self.current_state),
+        """记录选择（选择前的进度压入撤销历史）"""
+        if self.undo_limit > 0:
+            self._push_history()
+        entry = {
+            'state': self.current_state_id,
             'choice_id': choice_id,
             'choice_text': choice_text,
             'timestamp': str(datetime.now())
-        })
+        }
+        if not self._choices_made:
+            entry['session_seed'] = self.session_seed  # 只有选择记录时（如回放工具）也能找到种子
+        self._choices_made = self._choices_made.append(entry)
+        
+        # 进入某章后预加载下一章
+        if choice_id.startswith('chapter'):
+            chapter = self.story_content.chapter_of(choice_id)
+            if chapter is not None:
+                self.story_content.prefetch_chapter(chapter + 1)
         
         # 检查是否完成章节
         if choice_id.startswith('chapter2_') and not self.chapter_progress['chapter2']:
@@ -127,9 +546,129 @@ class StoryProgress:
             self.update_chapter_progress(4)
             self.set_variable('current_chapter', 4)
     
+    # ---------- 状态容器 ----------
+    @property
+    def choices_made(self) -> PVector:
+        """选择记录（只读序列，每项写入后不再修改）"""
+        return self._choices_made
+    
+    @choices_made.setter
+    def choices_made(self, choices):
+        self._choices_made = choices if isinstance(choices, PVector) else PVector(choices)
+    
+    @property
+    def variables(self) -> PMap:
+        """故事变量（只读映射）"""
+        return self._variables
+    
+    @variables.setter
+    def variables(self, variables):
+        self._variables = variables if isinstance(variables, PMap) else PMap(variables)
+        self.invalidate_choices()
+    
+    @property
+    def chapter_progress(self) -> PMap:
+        """各章是否已进入（只读映射）"""
+        return self._chapter_progress
+    
+    @chapter_progress.setter
+    def chapter_progress(self, chapter_progress):
+        self._chapter_progress = chapter_progress if isinstance(chapter_progress, PMap) \
+            else PMap(chapter_progress)
+    
+    @property
+    def endings_unlocked(self) -> Tuple[str, ...]:
+        return self._endings_unlocked
+    
+    @endings_unlocked.setter
+    def endings_unlocked(self, endings):
+        self._endings_unlocked = tuple(endings)
+    
+    def unlock_ending(self, ending_id: str):
+        """记录解锁的结局"""
+        if ending_id not in self._endings_unlocked:
+            self._endings_unlocked += (ending_id,)
+    
+    @property
+    def current_state_id(self) -> str:
+        """当前状态的场景ID字符串"""
+        return self.story_content.scene_id(self.state_number)
+    
+    @property
+    def current_state(self) -> str:
+        """当前场景ID（兼容旧接口；StoryState 成员可以直接与它比较）"""
+        return self.story_content.scene_id(self.state_number)
+    
+    @current_state.setter
+    def current_state(self, state):
+        self.set_state(state)
+    
+    def set_state(self, state_id: str):
+        """切换到指定场景（任何场景ID都可以，包括尚未加载的章节）"""
+        if isinstance(state_id, StoryState):
+            state_id = state_id.value
+        self.state_number = self.story_content.scene_number(state_id)
+    
+    def advance(self, choice_index: int):
+        """按当前场景第 choice_index 个选项的跳转表切换场景"""
+        self.state_number = self.story_content.next_scene_number(self.state_number, choice_index)
+    
+    def _touch(self, key: str):
+        self._revision += 1
+        self._key_revisions[key] = self._revision
+    
     def set_variable(self, key: str, value: Any):
         """设置变量"""
-        self.variables[key] = value
+        old = self._variables.get(key, _MISSING)
+        if old is _MISSING or type(old) is not type(value) or old != value:
+            self._variables = self._variables.set(key, value)
+            self._touch(key)
+    
+    def set_character_field(self, key: str, value: Any):
+        """按变量键（trust:角色ID / discovered:角色ID）设置角色状态"""
+        field, character_id = split_key(key)
+        character = self.character_manager.get_character(character_id)
+        if field is None or character is None:
+            return
+        old = getattr(character, field)
+        if type(old) is not type(value) or old != value:
+            setattr(character, field, value)
+            self._character_state = None
+            self._touch(key)
+    
+    def update_trust_level(self, character_id: str, change: int):
+        """调整角色信任度"""
+        character = self.character_manager.get_character(character_id)
+        if character is not None:
+            self.set_character_field(f"trust:{character_id}", character.trust_level + change)
+    
+    def apply_changes(self, changes):
+        """应用 (变量键, 新值) 列表（效果表达式的计算结果）"""
+        for key, value in changes:
+            if split_key(key)[0] is None:
+                self.set_variable(key, value)
+            else:
+                self.set_character_field(key, value)
+    
+    def apply_effect(self, source: str):
+        """执行效果表达式（语法见 conditions.py）"""
+        effect = compile_effect(source)
+        self.apply_changes(effect.evaluate(self.variables, self.character_manager.characters))
+    
+    def revision_of(self, keys) -> int:
+        """这些变量键中最近一次修改的修订号（从未修改过为 0）"""
+        revisions = self._key_revisions
+        latest = 0
+        for key in keys:
+            revision = revisions.get(key, 0)
+            if revision > latest:
+                latest = revision
+        return latest
+    
+    def invalidate_choices(self):
+        """丢弃缓存的可见选项和角色状态（绕过 set_variable 直接修改角色等状态后调用）"""
+        self.choice_cache.clear()
+        self._character_state = None
     
     def get_variable(self, key: str, default=None):
         """获取变量"""
@@ -137,12 +676,30 @@ class StoryProgress:
     
     def update_chapter_progress(self, chapter: int):
         """更新章节进度"""
-        self.chapter_progress[f"chapter{chapter}"] = True
+        self._chapter_progress = self._chapter_progress.set(f"chapter{chapter}", True)
+    
+    @property
+    def noise_seed(self) -> int:
+        """显示当前这一步场景时使用的信号干扰种子（与 Replay.noise_seed 相同）"""
+        return step_seed(self.session_seed, len(self._choices_made))
+    
+    def _restore_session_seed(self, data: Dict[str, Any]):
+        """从存档恢复会话种子；旧存档没有该字段时与回放工具一样由选择记录派生"""
+        seed = data.get('session_seed')
+        if seed is None and self._choices_made:
+            seed = session_seed(self._choices_made)
+        if seed is not None:
+            self.session_seed = seed
     
     def get_current_scene(self):
-        """获取当前场景"""
-        current_state = self.current_state.value if hasattr(self.current_state, 'value') else str(self.current_state)
-        return self.story_content.get_scene(current_state)
+        """获取当前场景（所在场景已被热重载删除时先转到替代场景）"""
+        scene = self.story_content.scene_at(self.state_number)
+        if scene is None:
+            number = self.story_content.resolve_number(self.state_number)
+            if number != self.state_number:
+                self.state_number = number
+                scene = self.story_content.scene_at(number)
+        return scene
     
     def serialize(self) -> Dict[str, Any]:
         """序列化故事进度为字典"""
@@ -152,25 +709,112 @@ class StoryProgress:
             char_data[char_id] = char.to_dict()
         
         return {
-            'current_state': self.current_state.value if hasattr(self.current_state, 'value') else str(self.current_state),
-            'choices_made': self.choices_made,
-            'variables': self.variables,
-            'chapter_progress': self.chapter_progress,
-            'endings_unlocked': self.endings_unlocked,
-            'characters': char_data
+            'current_state': self.current_state_id,
+            'choices_made': self._choices_made.to_list(),
+            'variables': self._variables.to_dict(),
+            'chapter_progress': self._chapter_progress.to_dict(),
+            'endings_unlocked': list(self._endings_unlocked),
+            'characters': char_data,
+            'session_seed': self.session_seed
         }
     
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        序列化为与当前对象不共享可变容器的字典
+
+        可以交给其他线程（如后台自动存档）使用，之后继续游戏不会改动它。
+        serialize() 的结果已经是新建的容器（选择记录的各项写入后不再修改，可以共享）。
+        """
+        return self.serialize()
+    
+    # ---------- 版本：检查点 / 撤销 / 分支 ----------
+    def _characters_state(self) -> Tuple[Tuple[str, int, bool, bool], ...]:
+        if self._character_state is None:
+            self._character_state = tuple(
+                (char_id, char.trust_level, char.available, char.discovered)
+                for char_id, char in self.character_manager.characters.items())
+        return self._character_state
+    
+    def checkpoint(self) -> ProgressState:
+        """当前进度的不可变版本（O(1)，与之后的修改共享结构）"""
+        return ProgressState(self.state_number, self._choices_made, self._variables,
+                             self._chapter_progress, self._endings_unlocked, self._characters_state())
+    
+    def restore(self, state: ProgressState):
+        """回到 checkpoint() 保存的版本（不改动撤销历史）"""
+        self.state_number = state.state_number
+        self._choices_made = state.choices_made
+        self._variables = state.variables
+        self._chapter_progress = state.chapter_progress
+        self._endings_unlocked = state.endings_unlocked
+        for char_id, trust_level, available, discovered in state.characters:
+            char = self.character_manager.get_character(char_id)
+            if char:
+                char.trust_level = trust_level
+                char.available = available
+                char.discovered = discovered
+        self.invalidate_choices()
+        self._character_state = state.characters
+    
+    def _push_history(self):
+        self._history = (self.checkpoint(), self._history)
+        self._history_depth += 1
+        if self._history_depth >= 2 * self.undo_limit:
+            # 只保留最近 undo_limit 个版本（每 undo_limit 次选择重建一次，均摊 O(1)）
+            states = []
+            node = self._history
+            while len(states) < self.undo_limit:
+                states.append(node[0])
+                node = node[1]
+            history = None
+            for state in reversed(states):
+                history = (state, history)
+            self._history = history
+            self._history_depth = len(states)
+    
+    @property
+    def can_undo(self) -> bool:
+        return self._history is not None
+    
+    def undo(self) -> bool:
+        """撤销最近一次选择，回到选择前的进度；没有可撤销的选择时返回 False"""
+        if self._history is None:
+            return False
+        state, self._history = self._history
+        self._history_depth -= 1
+        self.restore(state)
+        return True
+    
+    def fork(self) -> 'StoryProgress':
+        """复制出一个独立的分支（共享选择记录等结构和撤销历史，之后各自修改互不影响）"""
+        branch = type(self).from_state(self.checkpoint(), self.story_content, self.undo_limit)
+        branch.session_seed = self.session_seed
+        branch._history = self._history
+        branch._history_depth = self._history_depth
+        return branch
+    
+    @classmethod
+    def from_state(cls, state: ProgressState, story_content: Optional[StoryContent] = None,
+                   undo_limit: int = 100) -> 'StoryProgress':
+        """由 checkpoint() 保存的版本创建不读写文件的进度"""
+        progress = cls(save_file=None, story_content=story_content, autoload=False, undo_limit=undo_limit)
+        progress.restore(state)
+        return progress
+    
     @classmethod
-    def deserialize(cls, data: Dict[str, Any]) -> 'StoryProgress':
+    def deserialize(cls, data: Dict[str, Any],
+                    story_content: Optional[StoryContent] = None) -> 'StoryProgress':
         """从字典反序列化故事进度"""
-        story_progress = cls()
+        # 数据完全来自 data，不需要再读取 story_save.json
+        story_progress = cls(save_file=None, story_content=story_content, autoload=False)
         
         # 恢复基本状态
-        story_progress.current_state = StoryState(data.get('current_state', 'start'))
+        story_progress.set_state(data.get('current_state', 'start'))
         story_progress.choices_made = data.get('choices_made', [])
-        story_progress.variables.update(data.get('variables', {}))
-        story_progress.chapter_progress.update(data.get('chapter_progress', {}))
+        story_progress.variables = story_progress.variables.merge(data.get('variables', {}))
+        story_progress.chapter_progress = story_progress.chapter_progress.merge(data.get('chapter_progress', {}))
         story_progress.endings_unlocked = data.get('endings_unlocked', [])
+        story_progress._restore_session_seed(data)
         
         # 恢复角色状态
         char_data = data.get('characters', {})
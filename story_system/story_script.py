@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+剧本脚本编译器
+
+用结构化的 Markdown 编写剧情，直接编译成场景 / 选项模型和故事包，
+不必再手工誊写成 get_chapterN_content() 字典。格式：
+
+    # 第 2 章：真相
+
+    ## chapter2_act1_contact1 | 第一次连线·夜班病房
+    @character hospital_patient
+    @audio radio_static
+    @set man_appeared = true
+
+    "我姓……"我顿住，喉结滚动，"叫我Y。"
+    对面轻笑："行，那就叫你Y。我代号L。"
+
+    * 等待下一个声音 -> chapter2_act1_scene2
+    * 离开小屋 -> chapter2_act1_scene1 [if: view_count >= 2] [do: view_count += 1]
+    * 选择互换 -> chapter3_act2_intro [set: first_view_choice = "swap"] [action: save]
+
+- "# 第 N 章" 开始一章；"## 场景ID | 标题" 开始一个场景（标题可省略）
+- @character / @audio / @transition 设置场景属性，@set 键 = JSON 值 设置场景的 variable_changes
+- "* 文字 -> 目标场景" 是一个选项，后面可以跟 [if: 条件] [do: 效果] [set: 键 = JSON 值] [action: 动作]
+  （条件和效果的语法见 conditions.py；[set] 可以出现多次）
+- 其余各行是正文，场景首尾的空行被忽略、中间的空行保留；
+  以 #、@、*、\\ 开头的正文行前面加 \\ 转义，只有一个 \\ 的行表示首尾处的空行
+
+编译按场景（"##" 小节）进行：每个小节的文字计算 sha1，结果按哈希缓存，
+修改一个场景只重新编译这一个场景。编译故事包时小节哈希写入清单，
+下一次构建时可以直接从旧故事包还原未改动的场景；脚本完全没有变化时不重写故事包。
+
+用法：
+    python -m story_system.story_script export scripts/          # 把现有章节模块导出为脚本
+    python -m story_system.story_script build scripts/*.md       # 编译脚本到默认故事包
+    python -m story_system.story_script build scripts/*.md -o out.bundle
+    python -m story_system.story_script build scripts/*.md --index  # 同时改用剧本的场景索引
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .conditions import ConditionError, compile_scene_rules
+from .story_base import CHAPTER_MODULES, DEFAULT_BUNDLE_PATH, StoryChoice, StoryScene
+from .story_bundle import (_SOURCE_DIR, SCENE_INDEX_PATH, BundleError, StoryBundle, _file_stat,
+                           compile_bundle, write_scene_index)
+
+_CHAPTER_HEADING = re.compile(r'#\s*第\s*(\d+)\s*章')
+_SCENE_ID = re.compile(r'[A-Za-z_][A-Za-z0-9_]*$')
+_SCENE_DIRECTIVES = {'@character': 'character_id', '@audio': 'audio_effect',
+                     '@transition': 'transition_effect'}
+_CHOICE_ATTRIBUTES = ('if', 'do', 'set', 'action')
+# 需要转义的正文行开头
+_ESCAPED_PREFIXES = ('#', '@', '* ', '\\')
+
+
+class ScriptError(ValueError):
+    """剧本脚本语法错误（消息包含文件名和行号）"""
+
+
+class CompileStats(NamedTuple):
+    """一次编译的统计"""
+    sections: int  # 场景小节数
+    compiled: int  # 重新解析的小节数
+    reused: int  # 命中缓存的小节数
+    seconds: float
+
+
+class _Section(NamedTuple):
+    """脚本中的一个场景小节"""
+    chapter: int
+    line: int  # "##" 所在行号（从 1 开始）
+    lines: List[str]  # 含 "##" 行
+    digest: str
+
+
+def _section_digest(lines: List[str]) -> str:
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def split_sections(text: str, path: str = '<script>') -> List[_Section]:
+    """把脚本切分为场景小节（不解析小节内容）"""
+    sections = []
+    chapter = None
+    current: Optional[List[str]] = None
+    start = 0
+    for number, line in enumerate(text.splitlines(), 1):
+        if line.startswith('#'):
+            if line.startswith('##'):
+                if chapter is None:
+                    raise ScriptError(f"{path}:{number}: 场景必须位于某一章（# 第 N 章）之下")
+                if current is not None:
+                    sections.append(_Section(chapter, start, current, _section_digest(current)))
+                current = [line]
+                start = number
+                continue
+            match = _CHAPTER_HEADING.match(line)
+            if not match:
+                raise ScriptError(f"{path}:{number}: 无法识别的标题: {line}")
+            if current is not None:
+                sections.append(_Section(chapter, start, current, _section_digest(current)))
+                current = None
+            chapter = int(match.group(1))
+            if chapter not in CHAPTER_MODULES:
+                raise ScriptError(f"{path}:{number}: 未登记的章节 {chapter}（见 story_base.CHAPTER_MODULES）")
+        elif current is not None:
+            current.append(line)
+        elif line.strip():
+            raise ScriptError(f"{path}:{number}: 场景标题（## 场景ID）之前不能有正文")
+    if current is not None:
+        sections.append(_Section(chapter, start, current, _section_digest(current)))
+    return sections
+
+
+# ---------- 小节解析 ----------
+def _json_value(source: str, where: str) -> Any:
+    try:
+        return json.loads(source)
+    except ValueError:
+        raise ScriptError(f"{where}: 无效的 JSON 值: {source}") from None
+
+
+def _assignment(source: str, where: str) -> Tuple[str, Any]:
+    """解析 "键 = JSON 值" """
+    key, sep, value = source.partition('=')
+    key = key.strip()
+    if not sep or not _SCENE_ID.match(key):
+        raise ScriptError(f"{where}: 应为 键 = 值: {source}")
+    return key, _json_value(value.strip(), where)
+
+
+def _split_attributes(source: str, where: str) -> List[Tuple[str, str]]:
+    """解析选项末尾的 [名称: 值] 序列（值中的 JSON 字符串可以包含方括号）"""
+    attributes = []
+    position = 0
+    length = len(source)
+    while position < length:
+        if source[position].isspace():
+            position += 1
+            continue
+        if source[position] != '[':
+            raise ScriptError(f"{where}: 选项属性应写成 [名称: 值]: {source[position:]}")
+        index = position + 1
+        in_string = False
+        while index < length:
+            char = source[index]
+            if in_string:
+                if char == '\\':
+                    index += 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == ']':
+                break
+            index += 1
+        else:
+            raise ScriptError(f"{where}: 选项属性缺少 ]: {source[position:]}")
+        name, sep, value = source[position + 1:index].partition(':')
+        name = name.strip()
+        if not sep or name not in _CHOICE_ATTRIBUTES:
+            raise ScriptError(f"{where}: 未知的选项属性: {source[position:index + 1]}")
+        attributes.append((name, value.strip()))
+        position = index + 1
+    return attributes
+
+
+def _parse_choice(source: str, where: str) -> StoryChoice:
+    # 文字中可以含有 " -> "，以属性（第一个 " ["）之前的最后一个为准
+    attributes_at = source.find(' [')
+    arrow_at = source.rfind(' -> ', 0, attributes_at if attributes_at >= 0 else len(source))
+    if arrow_at < 0:
+        raise ScriptError(f"{where}: 选项缺少 -> 目标场景: {source}")
+    text = source[:arrow_at].strip()
+    target, _, rest = source[arrow_at + 4:].strip().partition(' ')
+    if not text or not _SCENE_ID.match(target):
+        raise ScriptError(f"{where}: 选项应写成 * 文字 -> 场景ID: {source}")
+
+    fields: Dict[str, Any] = {}
+    changes: Dict[str, Any] = {}
+    for name, value in _split_attributes(rest, where):
+        if name == 'set':
+            key, parsed = _assignment(value, where)
+            if key in changes:
+                raise ScriptError(f"{where}: 重复设置变量 {key}")
+            changes[key] = parsed
+            continue
+        field = {'if': 'condition', 'do': 'effect', 'action': 'action'}[name]
+        if field in fields:
+            raise ScriptError(f"{where}: 重复的选项属性 [{name}]")
+        fields[field] = value
+    return StoryChoice(text, target, variable_changes=changes or None, **fields)
+
+
+def parse_section(section: _Section, path: str = '<script>') -> StoryScene:
+    """把一个场景小节解析为 StoryScene（并检查条件和效果能否编译）"""
+    heading = section.lines[0][2:].strip()
+    scene_id, _, title = heading.partition('|')
+    scene_id = scene_id.strip()
+    if not _SCENE_ID.match(scene_id):
+        raise ScriptError(f"{path}:{section.line}: 无效的场景ID: {scene_id!r}")
+
+    attributes: Dict[str, Any] = {}
+    changes: Dict[str, Any] = {}
+    content: List[str] = []
+    explicit: List[bool] = []  # 对应的正文行是否经过 \ 转义（转义的空行不会被当作首尾空行去掉）
+    choices: List[StoryChoice] = []
+    for offset, line in enumerate(section.lines[1:], 1):
+        where = f"{path}:{section.line + offset}"
+        if line.startswith('* '):
+            choices.append(_parse_choice(line[2:].strip(), where))
+        elif line.startswith('@'):
+            directive, _, value = line.partition(' ')
+            value = value.strip()
+            if directive == '@set':
+                key, parsed = _assignment(value, where)
+                changes[key] = parsed
+            elif directive in _SCENE_DIRECTIVES and value:
+                attributes[_SCENE_DIRECTIVES[directive]] = value
+            else:
+                raise ScriptError(f"{where}: 未知的指令: {line}")
+        elif not line.strip():
+            if content and not choices:
+                content.append(line)
+                explicit.append(False)
+        elif choices:
+            raise ScriptError(f"{where}: 正文必须写在选项之前")
+        elif line.startswith('\\'):
+            content.append(line[1:])
+            explicit.append(True)
+        else:
+            content.append(line)
+            explicit.append(False)
+    while content and not explicit[-1] and not content[-1].strip():
+        content.pop()
+        explicit.pop()
+
+    scene = StoryScene(id=scene_id, title=title.strip(), content=content, choices=choices,
+                       variable_changes=changes or None, **attributes)
+    try:
+        compile_scene_rules(scene)
+    except ConditionError as e:
+        raise ScriptError(f"{path}:{section.line}: {e}") from None
+    return scene
+
+
+# ---------- 增量编译 ----------
+# 脚本格式或解析规则变化时递增，旧故事包中的小节哈希随之失效
+SCRIPT_FORMAT = 1
+
+
+class ScriptCompiler:
+    """按场景小节增量编译剧本脚本（同一个实例在多次编译之间保留小节缓存）"""
+
+    def __init__(self):
+        # 小节 sha1 -> 场景，或从旧故事包还原场景的函数（第一次命中时调用）
+        self._cache: Dict[str, Union[StoryScene, Callable[[], Optional[StoryScene]]]] = {}
+        self.sections: Dict[str, str] = {}  # 最近一次编译的 小节 sha1 -> 场景ID
+        self.last_stats: Optional[CompileStats] = None
+
+    def seed_from_bundle(self, bundle: StoryBundle):
+        """用旧故事包清单中的小节哈希预填缓存（未改动的场景直接从故事包还原，不再解析）"""
+        if bundle.manifest.get('script_format') != SCRIPT_FORMAT:
+            return
+        for digest, scene_id in bundle.manifest.get('sections', {}).items():
+            self._cache.setdefault(digest, lambda scene_id=scene_id: bundle.scene(scene_id))
+
+    def compile_texts(self, texts: Iterable[Tuple[str, str]]) -> Dict[int, Dict[str, StoryScene]]:
+        """
+        编译若干脚本
+
+        Args:
+            texts: (路径, 脚本文字) 序列；路径只用于错误信息
+        Returns:
+            章节编号 -> {场景ID: StoryScene}
+        """
+        start = time.perf_counter()
+        chapters: Dict[int, Dict[str, StoryScene]] = {}
+        cache: Dict[str, StoryScene] = {}
+        locations: Dict[str, str] = {}
+        compiled = reused = 0
+        for path, text in texts:
+            for section in split_sections(text, path):
+                scene = cache.get(section.digest) or self._cache.get(section.digest)
+                if scene is not None and not isinstance(scene, StoryScene):
+                    scene = scene()
+                if scene is None:
+                    scene = parse_section(section, path)
+                    compiled += 1
+                else:
+                    reused += 1
+                location = f"{path}:{section.line}"
+                if scene.id in locations:
+                    raise ScriptError(f"{location}: 场景ID {scene.id} 与 {locations[scene.id]} 重复")
+                locations[scene.id] = location
+                cache[section.digest] = scene
+                chapters.setdefault(section.chapter, {})[scene.id] = scene
+        # 只保留仍然存在的小节，缓存不会随编辑次数增长
+        self._cache = dict(cache)
+        self.sections = {digest: scene.id for digest, scene in cache.items()}
+        self.last_stats = CompileStats(compiled + reused, compiled, reused, time.perf_counter() - start)
+        return chapters
+
+    def compile_files(self, paths: Iterable[str]) -> Dict[int, Dict[str, StoryScene]]:
+        """编译若干脚本文件"""
+        texts = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                texts.append((path, f.read()))
+        return self.compile_texts(texts)
+
+
+def _source_name(path: str) -> str:
+    """清单中的源文件名：相对 story_system 目录（StoryBundle.is_stale 按此查找）"""
+    try:
+        return os.path.relpath(os.path.abspath(path), _SOURCE_DIR)
+    except ValueError:  # Windows 上不在同一个盘符
+        return os.path.abspath(path)
+
+
+def build_from_scripts(paths: List[str], output_path: str = DEFAULT_BUNDLE_PATH,
+                       compiler: Optional[ScriptCompiler] = None,
+                       force: bool = False,
+                       index_path: Optional[str] = None) -> Optional[CompileStats]:
+    """
+    把剧本脚本编译为故事包并原子写入 output_path
+
+    旧故事包的清单与各脚本的 sha1 和 stat 一致时直接返回 None（不重写）；
+    否则只解析改动过的场景小节，其余场景从旧故事包还原。
+
+    Args:
+        index_path: 同时生成的场景索引路径（仓库中的是 story_bundle.SCENE_INDEX_PATH），默认不生成。
+            生成的索引标记为来自剧本（SCENE_INDEX_SOURCE = "scripts"）：此后内容只来自剧本故事包，
+            故事包缺失时不会改用章节模块；改回章节模块请运行 python -m story_system.story_bundle。
+    """
+    texts = []
+    sources = {}
+    stats = {}
+    for path in paths:
+        stats[_source_name(path)] = _file_stat(path)  # 先取 stat 再读，见 story_bundle._fingerprint_sources
+        with open(path, 'rb') as f:
+            raw = f.read()
+        sources[_source_name(path)] = hashlib.sha1(raw).hexdigest()
+        texts.append((path, raw.decode('utf-8')))
+
+    old = None
+    if os.path.exists(output_path):
+        try:
+            old = StoryBundle.open(output_path)
+        except (OSError, BundleError):
+            old = None
+    if (old is not None and not force and not index_path and old.manifest.get('sources') == sources
+            and old.manifest.get('source_stats') == stats
+            and old.manifest.get('script_format') == SCRIPT_FORMAT):
+        return None
+
+    compiler = compiler or ScriptCompiler()
+    if old is not None:
+        compiler.seed_from_bundle(old)
+    chapters = compiler.compile_texts(texts)
+    if index_path:
+        write_scene_index(chapters, index_path, source="scripts")
+    data = compile_bundle(chapters, sources,
+                          {'script_format': SCRIPT_FORMAT, 'sections': compiler.sections}, stats)
+    temp_path = output_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, output_path)
+    return compiler.last_stats
+
+
+# ---------- 导出 ----------
+def _escape_content(lines: List[str]) -> List[str]:
+    nonblank = [index for index, line in enumerate(lines) if line.strip()]
+    first, last = (nonblank[0], nonblank[-1]) if nonblank else (len(lines), -1)
+    escaped = []
+    for index, line in enumerate(lines):
+        if not line.strip():
+            escaped.append(line if first < index < last else '\\' + line)
+        elif line.startswith(_ESCAPED_PREFIXES):
+            escaped.append('\\' + line)
+        else:
+            escaped.append(line)
+    return escaped
+
+
+def _format_assignment(key: str, value: Any) -> str:
+    return f"{key} = {json.dumps(value, ensure_ascii=False)}"
+
+
+def format_scene(scene: StoryScene) -> List[str]:
+    """把场景写成脚本小节的各行"""
+    lines = [f"## {scene.id} | {scene.title}" if scene.title else f"## {scene.id}"]
+    for directive, field in _SCENE_DIRECTIVES.items():
+        value = getattr(scene, field)
+        if value is not None:
+            lines.append(f"{directive} {value}")
+    for key, value in (scene.variable_changes or {}).items():
+        lines.append(f"@set {_format_assignment(key, value)}")
+    lines.append("")
+    lines.extend(_escape_content(list(scene.content)))
+    if scene.choices:
+        lines.append("")
+    for choice in scene.choices:
+        line = f"* {choice.text} -> {choice.next_state}"
+        if choice.condition is not None:
+            line += f" [if: {choice.condition}]"
+        if choice.effect is not None:
+            line += f" [do: {choice.effect}]"
+        for key, value in (choice.variable_changes or {}).items():
+            line += f" [set: {_format_assignment(key, value)}]"
+        if choice.action is not None:
+            line += f" [action: {choice.action}]"
+        lines.append(line)
+    lines.append("")
+    return lines
+
+
+def format_chapter(chapter: int, scenes: Dict[str, StoryScene], path: str = '<script>') -> str:
+    """把一章写成脚本；每个场景写出后立即解析回来比较，无法无损表示时抛出 ScriptError"""
+    lines = [f"# 第 {chapter} 章", ""]
+    for scene in scenes.values():
+        section_lines = format_scene(scene)
+        section = _Section(chapter, len(lines) + 1, section_lines, '')
+        if parse_section(section, path) != scene:
+            raise ScriptError(f"{path}:{section.line}: 场景 {scene.id} 无法无损写成脚本")
+        lines.extend(section_lines)
+    return "\n".join(lines)
+
+
+def export_scripts(directory: str) -> List[str]:
+    """把各章节模块的内容导出为 directory/chapterN.md，返回写出的文件"""
+    from .story_bundle import _load_chapter_modules
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for chapter, scenes in sorted(_load_chapter_modules().items()):
+        path = os.path.join(directory, f"chapter{chapter}.md")
+        text = format_chapter(chapter, scenes, path)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        written.append(path)
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="编译剧本脚本（结构化 Markdown）为故事包")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="把现有章节模块导出为脚本")
+    export.add_argument("directory", help="输出目录")
+    build = commands.add_parser("build", help="编译脚本为故事包")
+    build.add_argument("scripts", nargs="+", help="脚本文件（按章节顺序）")
+    build.add_argument("-o", "--output", default=DEFAULT_BUNDLE_PATH, help="故事包路径")
+    build.add_argument("--force", action="store_true", help="脚本没有变化时也重新编译")
+    build.add_argument("--index", action="store_true",
+                       help="同时把 story_system/scene_index.py 改为剧本的场景索引（此后不再回退到章节模块）")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            for path in export_scripts(args.directory):
+                print(f"已导出: {path}")
+            return
+        stats = build_from_scripts(args.scripts, args.output, force=args.force,
+                                   index_path=SCENE_INDEX_PATH if args.index else None)
+    except ScriptError as e:
+        parser.exit(1, f"脚本错误: {e}\n")
+    if stats is None:
+        print(f"故事包已是最新: {args.output}")
+    else:
+        print(f"故事包已生成: {args.output} ({os.path.getsize(args.output)} 字节，"
+              f"解析 {stats.compiled}/{stats.sections} 个场景，{stats.seconds * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试后台自动存档：合并写入、失败重试和同步保存的提示
+"""
+
+import threading
+import time
+
+from game_engine import radio_game
+from game_engine.autosave import AutosaveWorker
+from game_engine.radio_game import RadioGame
+from game_engine.save_manager import SaveManager
+
+
+class _RecordingManager:
+    """记录 save_many 调用的存档管理器；fail 次数内抛出异常"""
+
+    def __init__(self, fail=0):
+        self.batches = []
+        self.fail = fail
+        self.written = threading.Event()
+
+    def save_many(self, batch):
+        if self.fail:
+            self.fail -= 1
+            raise OSError("disk full")
+        self.batches.append(dict(batch))
+        self.written.set()
+
+
+def test_submits_within_an_interval_are_coalesced():
+    """距上次写入不满一个间隔时提交的快照合并成一次写入，每个槽位只写最新的一份"""
+    manager = _RecordingManager()
+    worker = AutosaveWorker(manager, interval=0.3)
+    worker._last_write = time.monotonic()  # 刚写过一次
+    for step in range(5):
+        worker.submit(1, {'step': step})
+    worker.submit(2, {'step': 0})
+    assert manager.written.wait(5)
+    worker.close()
+    assert manager.batches == [{1: {'step': 4}, 2: {'step': 0}}]
+    assert worker.writes == 1 and not worker.pending
+
+
+def test_failed_batch_is_requeued_and_flush_reports_it():
+    manager = _RecordingManager(fail=1)
+    worker = AutosaveWorker(manager, interval=60)
+    with worker._cond:
+        worker._pending[1] = {'step': 1}  # 不启动后台线程，只用 flush
+    assert worker.flush() is False
+    assert isinstance(worker.last_error, OSError) and worker.pending
+
+    worker._pending[1] = {'step': 2}  # 失败期间提交的更新快照优先
+    assert worker.flush() is True
+    assert worker.last_error is None and manager.batches == [{1: {'step': 2}}]
+    assert worker.close() is True
+
+
+def test_sync_save_reports_failure(tmp_path, monkeypatch):
+    messages = []
+    monkeypatch.setattr(radio_game.TypewriterEffect, 'type_out',
+                        staticmethod(lambda text, *args, **kwargs: messages.append((text, args))))
+    game = RadioGame(SaveManager(str(tmp_path)))
+    game.current_save_slot = 2
+
+    def broken(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(game.save_manager, 'save_many', broken)
+    game.save_game(sync=True)
+    assert "失败" in messages[-1][0] and "disk full" in messages[-1][0]
+
+    monkeypatch.undo()
+    monkeypatch.setattr(radio_game.TypewriterEffect, 'type_out',
+                        staticmethod(lambda text, *args, **kwargs: messages.append((text, args))))
+    game.save_game(sync=True)
+    assert messages[-1][0] == "游戏进度已保存到存档 2。"
+    assert game.save_manager.load_from_slot(2) is not None
+    game.shutdown()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试选项条件与效果表达式
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from story_system.conditions import ConditionError, compile_condition, compile_effect, split_key
+
+CHARACTERS = {'loved_self': SimpleNamespace(trust_level=2, discovered=True)}
+
+
+@pytest.mark.parametrize('source, variables, expected', [
+    ("view_count >= 2 and not man_appeared", {'view_count': 2, 'man_appeared': False}, True),
+    ("view_count >= 2 and not man_appeared", {'view_count': 1}, False),
+    ("trust(loved_self) > 1 or first_view_choice == 'swap'", {}, True),
+    ("discovered(female_self)", {}, False),
+    ("missing < 1", {}, False),  # 与 none 比较大小结果为 false
+    ("missing == none", {}, True),
+    ("-a + 3 == 1", {'a': 2}, True),
+    ("name + '!' == \"Y!\"", {'name': 'Y'}, True),
+])
+def test_condition_evaluation(source, variables, expected):
+    assert compile_condition(source)(variables, CHARACTERS) is expected
+
+
+def test_condition_dependencies():
+    condition = compile_condition("view_count >= 2 and trust(loved_self) > 1")
+    assert condition.dependencies == {'view_count', 'trust:loved_self'}
+    assert split_key('trust:loved_self') == ('trust_level', 'loved_self')
+    assert split_key('view_count') == (None, 'view_count')
+
+
+def test_compile_is_cached_by_source():
+    assert compile_condition("a == 1") is compile_condition("a == 1")
+
+
+@pytest.mark.parametrize('source', ["", "a ==", "a = 1", "(a", "a $ b", "a * 2", "trust() > 1"])
+def test_condition_syntax_errors(source):
+    with pytest.raises(ConditionError):
+        compile_condition(source)
+
+
+def test_effect_uses_state_before_the_effect():
+    effect = compile_effect("a = b; b = a; view_count += 1; trust(loved_self) -= 1")
+    assert effect.targets == {'a', 'b', 'view_count', 'trust:loved_self'}
+    assert effect.evaluate({'a': 1, 'b': 2}, CHARACTERS) == [
+        ('a', 2), ('b', 1), ('view_count', 1), ('trust:loved_self', 1)]
+
+
+@pytest.mark.parametrize('source', ["", "1 = 2", "true = 1", "a += ", "a = 1 b = 2"])
+def test_effect_syntax_errors(source):
+    with pytest.raises(ConditionError):
+        compile_effect(source)
+
+
+@pytest.mark.parametrize('source, variables', [
+    ("-name > 1", {'name': 'abc'}),
+    ("items + 1 > 0", {'items': [1]}),
+])
+def test_condition_type_errors_report_the_source(source, variables):
+    with pytest.raises(ConditionError, match=source.replace('+', r'\+')):
+        compile_condition(source)(variables, CHARACTERS)
+
+
+def test_effect_type_errors_report_the_source():
+    with pytest.raises(ConditionError, match="x -= y"):
+        compile_effect("x -= y").evaluate({'x': 1, 'y': 'abc'}, CHARACTERS)
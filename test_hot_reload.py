@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试热重载：章节替换和被删除场景的重定向
+"""
+
+from story_system.hot_reload import HotReloader
+from story_system.story_base import StoryChoice, StoryScene
+from story_system.story_manager import StoryContent, StoryProgress
+from story_system.story_script import format_chapter
+
+
+def _scene(scene_id, title, *targets):
+    return StoryScene(scene_id, title, [f"{title}的正文"],
+                      [StoryChoice(f"去{target}", target) for target in targets])
+
+
+def _chapter():
+    return {
+        'start': _scene('start', '开场', 'hall', 'cellar'),
+        'hall': _scene('hall', '大厅', 'attic'),
+        'attic': _scene('attic', '阁楼', 'start'),
+        'cellar': _scene('cellar', '地窖', 'start'),
+    }
+
+
+def _content():
+    scenes = _chapter()
+    return StoryContent.from_scenes(scenes, dict.fromkeys(scenes, 1))
+
+
+def _progress_at(content, scene_id):
+    progress = StoryProgress(story_content=content)
+    progress.set_state(scene_id)
+    return progress
+
+
+def test_reload_keeps_unchanged_scenes_and_numbers():
+    content = _content()
+    hall = content.get_scene('hall')
+    number = content.scene_number('attic')
+    scenes = _chapter()
+    scenes['attic'] = _scene('attic', '新阁楼', 'start')
+
+    result = content.reload_chapter(1, scenes)
+    assert result.changed == ('attic',) and not result.added and not result.removed
+    assert content.get_scene('hall') is hall
+    assert content.scene_number('attic') == number
+    assert content.get_scene('attic').title == '新阁楼'
+
+
+def test_explicit_rename_redirects_progress():
+    content = _content()
+    progress = _progress_at(content, 'attic')
+    scenes = _chapter()
+    del scenes['attic']
+    scenes['loft'] = _scene('loft', '顶楼', 'start')
+    scenes['hall'] = _scene('hall', '大厅', 'loft')
+
+    result = content.reload_chapter(1, scenes, renames={'attic': 'loft'})
+    assert result.removed == ('attic',) and result.redirects == {'attic': 'loft'}
+    assert progress.get_current_scene().id == 'loft'
+    assert progress.current_state == 'loft'
+
+
+def test_same_title_and_text_counts_as_rename():
+    content = _content()
+    progress = _progress_at(content, 'cellar')
+    scenes = _chapter()
+    scenes['basement'] = StoryScene('basement', '地窖', ['地窖的正文'], [StoryChoice('回去', 'start')])
+    del scenes['cellar']
+
+    content.reload_chapter(1, scenes)
+    assert progress.get_current_scene().id == 'basement'
+
+
+def test_removed_scene_falls_back_to_predecessor_then_first_scene():
+    content = _content()
+    at_attic = _progress_at(content, 'attic')
+    scenes = _chapter()
+    del scenes['attic']
+    content.reload_chapter(1, scenes)
+    assert at_attic.get_current_scene().id == 'hall'  # 旧内容中跳到它且仍然存在的场景
+
+    at_hall = _progress_at(content, 'hall')
+    content.reload_chapter(1, {'start': _scene('start', '开场')})
+    assert at_hall.get_current_scene().id == 'start'
+    assert at_attic.get_current_scene().id == 'start'  # 连续重定向
+
+
+def test_hot_reloader_rebuilds_changed_scripts(tmp_path):
+    content = _content()
+    progress = _progress_at(content, 'cellar')
+    script = tmp_path / "chapter1.md"
+    script.write_text(format_chapter(1, _chapter()), encoding='utf-8')
+    messages = []
+    reloader = HotReloader(content, script_paths=[str(script)], log=messages.append)
+    assert reloader.check() == []
+
+    scenes = _chapter()
+    del scenes['cellar']
+    scenes['start'] = _scene('start', '开场', 'hall')
+    script.write_text(format_chapter(1, scenes), encoding='utf-8')
+    results = reloader.check()
+    assert [result.removed for result in results] == [('cellar',)]
+    assert progress.get_current_scene().id == 'start'
+    assert content.get_scene('start').choices == scenes['start'].choices
+
+    script.write_text("# 第 1 章\n## start\n* 去 -> hall [if: a ==]\n", encoding='utf-8')
+    assert reloader.check() == []
+    assert reloader.last_error is not None and messages[-1].startswith("热重载失败")
+    assert content.get_scene('start') == scenes['start']  # 出错时保留原内容
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试路径探索：各类终点的路径计数和串行 / 并行结果一致
+"""
+
+from story_system.path_explorer import PathExplorer
+from story_system.story_base import StoryChoice, StoryScene
+from story_system.story_manager import StoryContent
+
+
+def _scene(scene_id, *targets):
+    return StoryScene(scene_id, scene_id, [scene_id],
+                      [StoryChoice(f"去{target}", target) for target in targets])
+
+
+def test_every_path_ends_somewhere():
+    """只剩回边的节点算死胡同，悬空目标单独计数，三类之和等于 total_paths"""
+    scenes = {
+        'start': _scene('start', 'loop', 'broken', 'hall', 'ending1_accept'),
+        'loop': _scene('loop', 'loop'),
+        'broken': _scene('broken', 'missing'),
+        'hall': _scene('hall', 'ending1_accept'),
+        'ending1_accept': _scene('ending1_accept'),
+    }
+    content = StoryContent.from_scenes(scenes, dict.fromkeys(scenes, 1))
+    report = PathExplorer(content, workers=1).explore()
+
+    assert report.ending_path_counts == {'ending1_accept': 2, 'ending2_knowledge': 0, 'ending3_loop': 0}
+    assert report.dead_end_path_counts == {'loop': 1}
+    assert report.dangling_path_counts == {'missing': 1}
+    assert report.total_paths == 4
+    assert report.dangling_targets == [('broken', '去missing', 'missing')]
+
+
+def test_parallel_matches_serial():
+    serial = PathExplorer(workers=1).explore()
+    parallel = PathExplorer(workers=2, parallel_threshold=1).explore()
+    assert parallel.to_dict() == serial.to_dict()
+    assert serial.total_paths == (sum(serial.ending_path_counts.values())
+                                  + sum(serial.dead_end_path_counts.values())
+                                  + sum(serial.dangling_path_counts.values()))
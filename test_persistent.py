@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试持久化容器 PMap / PVector
+"""
+
+import random
+
+import pytest
+
+from story_system.persistent import PMap, PVector
+
+
+class _CollidingKey:
+    """哈希值相同、内容不同的键，用于覆盖冲突节点"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 42
+
+    def __eq__(self, other):
+        return isinstance(other, _CollidingKey) and other.name == self.name
+
+
+def test_pmap_set_keeps_old_version():
+    """set / delete 返回新版本，旧版本不变"""
+    first = PMap({'a': 1})
+    second = first.set('b', 2)
+    third = second.delete('a')
+    assert dict(first) == {'a': 1}
+    assert dict(second) == {'a': 1, 'b': 2}
+    assert dict(third) == {'b': 2}
+    assert 'a' not in third and third.get('a', 'missing') == 'missing'
+    with pytest.raises(KeyError):
+        third['a']
+
+
+def test_pmap_merge_and_to_dict():
+    merged = PMap({'a': 1, 'b': 2}).merge({'b': 3, 'c': 4})
+    assert merged.to_dict() == {'a': 1, 'b': 3, 'c': 4}
+    assert len(merged) == 3
+
+
+def test_pmap_hash_collisions():
+    keys = [_CollidingKey(i) for i in range(5)]
+    mapping = PMap()
+    for index, key in enumerate(keys):
+        mapping = mapping.set(key, index)
+    assert [mapping[key] for key in keys] == list(range(5))
+    shrunk = mapping.delete(keys[2])
+    assert keys[2] not in shrunk and len(shrunk) == 4
+    assert mapping[keys[2]] == 2
+
+
+def test_pmap_matches_dict_under_random_operations():
+    """随机增删与 dict 对照（包括多层 HAMT 节点）"""
+    rng = random.Random(7)
+    mapping, expected = PMap(), {}
+    for _ in range(3000):
+        key = rng.randrange(500)
+        if rng.random() < 0.3:
+            mapping = mapping.delete(key)
+            expected.pop(key, None)
+        else:
+            mapping = mapping.set(key, key * 2)
+            expected[key] = key * 2
+    assert mapping.to_dict() == expected
+    assert len(mapping) == len(expected)
+
+
+def test_pvector_append_set_pop():
+    """跨越尾部和多层树节点的 append / set / pop"""
+    vector = PVector()
+    for index in range(2000):
+        vector = vector.append(index)
+    assert len(vector) == 2000
+    assert vector[0] == 0 and vector[1055] == 1055 and vector[-1] == 1999
+    changed = vector.set(1055, 'x')
+    assert changed[1055] == 'x' and vector[1055] == 1055
+    shorter = vector
+    for _ in range(1000):
+        shorter = shorter.pop()
+    assert shorter.to_list() == list(range(1000))
+    assert len(vector) == 2000
+
+
+def test_pvector_slicing_and_equality():
+    vector = PVector(range(40))
+    assert list(vector[5:10]) == [5, 6, 7, 8, 9]
+    assert vector == PVector(range(40))
+    assert vector != PVector(range(39))
+    with pytest.raises(IndexError):
+        vector[40]
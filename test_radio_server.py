@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多人服务端：并发会话、槽位占用和断线存档
+"""
+
+import asyncio
+
+from game_engine.radio_server import RadioServer
+from game_engine.save_backends import JsonSaveBackend
+from game_engine.scene_render import TerminalCaps
+from story_system.story_base import StoryChoice, StoryScene
+from story_system.story_manager import StoryContent
+
+
+def _content():
+    scenes = {
+        'start': StoryScene('start', '开场', ["电台开播"], [StoryChoice('去大厅', 'hall'),
+                                                         StoryChoice('结束', 'ending1_accept')]),
+        'hall': StoryScene('hall', '大厅', ["空无一人"], [StoryChoice('回去', 'start')]),
+        'ending1_accept': StoryScene('ending1_accept', '结局', ["信号消失"], []),
+    }
+    return StoryContent.from_scenes(scenes, dict.fromkeys(scenes, 1))
+
+
+class _Client:
+    """按行发送输入、等待指定输出的测试客户端"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.buffer = ""
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def expect(self, text, timeout=5):
+        """读到 text 为止，返回 text 之前（含 text）的输出"""
+        async def read():
+            while text not in self.buffer:
+                chunk = await self.reader.read(4096)
+                if not chunk:
+                    raise ConnectionError(f"连接已关闭，没有等到 {text!r}：{self.buffer!r}")
+                self.buffer += chunk.decode('utf-8')
+        await asyncio.wait_for(read(), timeout)
+        end = self.buffer.index(text) + len(text)
+        output, self.buffer = self.buffer[:end], self.buffer[end:]
+        return output
+
+    async def send(self, line):
+        self.writer.write(f"{line}\n".encode('utf-8'))
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def _wait_for(condition, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+
+async def _enter(client, profile, slot):
+    await client.expect("档案名")
+    await client.send(profile)
+    await client.expect("输入槽位编号")
+    await client.send(slot)
+
+
+def test_sessions_share_content_and_keep_slots_apart(tmp_path):
+    backend = JsonSaveBackend(str(tmp_path))
+
+    async def scenario():
+        server = RadioServer(port=0, backend=backend, story_content=_content(), instant=True,
+                             caps=TerminalCaps(color=False, encoding='utf-8'))
+        await server.start()
+        try:
+            first = await _Client.connect(server.port)
+            await _enter(first, "alice", 1)
+            assert "开始新游戏 - 存档 1" in await first.expect("请输入选择 (1-2)")
+            await first.send("1")
+            assert "空无一人" in await first.expect("请输入选择 (1-1)")
+
+            second = await _Client.connect(server.port)
+            await _enter(second, "alice", 1)
+            assert "正在被另一个连接使用" in await second.expect("输入槽位编号")
+            await second.send(2)
+            assert "电台开播" in await second.expect("请输入选择 (1-2)")
+            assert {session.progress.current_state for session in server.sessions} == {'hall', 'start'}
+            assert all(session.engine.story_content is server.story_content for session in server.sessions)
+
+            await first.close()  # 断线时写完存档并释放槽位
+            await _wait_for(lambda: len(server.sessions) == 1)
+            assert backend.read("alice", 1)[0]['current_state'] == 'hall'
+
+            third = await _Client.connect(server.port)
+            await _enter(third, "alice", 1)
+            assert "继续游戏 - 存档 1" in await third.expect("请输入选择 (1-1)")
+            await third.send(1)
+            await third.expect("请输入选择 (1-2)")
+            await third.send(2)
+            assert "信号消失" in await third.expect("游戏结束。")
+            await third.close()
+            await second.close()
+            await _wait_for(lambda: not server.sessions)
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+    data = backend.read("alice", 1)[0]
+    assert data['current_state'] == 'ending1_accept' and 'ending1_accept' in data['endings_unlocked']
+    assert backend.read("alice", 2)[0]['current_state'] == 'start'
+
+
+def test_invalid_profile_is_rejected(tmp_path):
+    async def scenario():
+        server = RadioServer(port=0, backend=JsonSaveBackend(str(tmp_path)), story_content=_content(),
+                             instant=True, caps=TerminalCaps(color=False, encoding='utf-8'))
+        await server.start()
+        try:
+            client = await _Client.connect(server.port)
+            await client.expect("档案名")
+            await client.send("../escape")
+            await client.expect("档案名")
+            await client.send("quit")
+            await _wait_for(lambda: not server.sessions)
+            await client.close()
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试选择记录回放：seek / verify 和会话种子
+"""
+
+import pytest
+
+from game_engine.radio_game import SignalEffect
+from story_system.replay import Replay, ReplayError
+from story_system.story_engine import StoryEngine, random_policy
+from story_system.story_manager import StoryProgress, step_seed
+
+SEED = 0x5EED
+
+
+@pytest.fixture(scope='module')
+def played():
+    """一局固定种子的随机游玩"""
+    progress = StoryProgress()
+    progress.session_seed = SEED
+    StoryEngine().run(progress, policy=random_policy(3), max_steps=40)
+    assert len(progress.choices_made) >= 8
+    return progress
+
+
+def _state(progress):
+    return (progress.current_state_id, dict(progress.variables),
+            dict(progress.chapter_progress), list(progress.endings_unlocked))
+
+
+def test_verify_reproduces_the_progress(played):
+    replay = Replay.from_progress(played, checkpoint_every=4)
+    final = replay.verify()
+    assert _state(final) == _state(played)
+    assert list(final.choices_made) == list(played.choices_made)
+
+
+def test_seek_matches_step_by_step_replay(played):
+    replay = Replay.from_progress(played, checkpoint_every=3)
+    steps = list(replay.steps())
+    for step in (0, 1, 4, len(played.choices_made)):
+        expected = steps[step - 1].scene_id if step else 'start'
+        assert replay.seek(step).current_state_id == expected
+    assert replay.nearest_checkpoint(7) == 6
+
+
+def test_seek_keeps_the_recorded_session_seed(played):
+    replay = Replay.from_save(played.serialize())
+    assert replay.seed == SEED
+    for step in (0, 5):
+        progress = replay.seek(step)
+        assert progress.session_seed == replay.seed
+        assert progress.noise_seed == replay.noise_seed(step) == step_seed(SEED, step)
+        text = "信号断断续续"
+        assert (SignalEffect.add_noise(text, 0.5, seed=progress.noise_seed)
+                == SignalEffect.add_noise(text, 0.5, seed=step_seed(SEED, step)))
+        assert progress.serialize()['session_seed'] == SEED
+
+
+def test_seed_is_recorded_in_the_first_choice(played):
+    choices = [dict(entry) for entry in played.choices_made]
+    assert Replay(choices).seed == SEED
+
+
+def test_unreplayable_records(played):
+    choices = [dict(entry) for entry in played.choices_made]
+    choices[2]['choice_id'] = 'no_such_scene'
+    with pytest.raises(ReplayError):
+        Replay(choices).verify()
+
+    choices = [dict(entry) for entry in played.choices_made]
+    choices[2]['state'] = 'chapter1_photo' if choices[2]['state'] != 'chapter1_photo' else 'start'
+    with pytest.raises(ReplayError):
+        Replay(choices, strict=True).verify()
+    with pytest.raises(IndexError):
+        Replay(choices).seek(len(choices) + 1)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试存档后端：JSON 文件、SQLite 和两者之间的导入导出
+"""
+
+import copy
+
+import pytest
+
+from game_engine.save_backends import JsonSaveBackend, SaveBackend, SqliteSaveBackend, copy_profile
+from game_engine.save_journal import compute_delta, make_baseline, read_entries
+from game_engine.save_manager import SaveManager
+
+
+def _data(*choices, state='start'):
+    return {'current_state': state,
+            'choices_made': [{'state': 'start', 'choice_id': choice} for choice in choices],
+            'variables': {'current_chapter': 2, 'view_count': len(choices)},
+            'chapter_progress': {}, 'endings_unlocked': [], 'characters': {}}
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'json':
+        yield JsonSaveBackend(str(tmp_path / "saves"))
+    else:
+        backend = SqliteSaveBackend(str(tmp_path / "saves.db"))
+        yield backend
+        backend.close()
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        SaveBackend()
+
+
+def test_snapshot_and_deltas(backend):
+    old = _data('a')
+    backend.write_snapshot('default', 1, old, 1)
+    new = _data('a', 'b', state='chapter1_photo')
+    backend.append_delta('default', 1, 2, compute_delta(make_baseline(old, 1), new), new)
+
+    assert backend.read('default', 1) == (new, 2, 1)
+    assert backend.last_seq('default', 1) == 2
+    meta = backend.list_metadata('default')[1]
+    assert (meta['current_state'], meta['choices_count'], meta['current_chapter']) == ('chapter1_photo', 2, 2)
+
+    backend.write_snapshot('default', 1, new, 3)  # 合并增量
+    assert backend.read('default', 1) == (new, 3, 0)
+
+
+def test_profiles_are_separate_and_delete(backend):
+    backend.write_snapshot('default', 1, _data('a'), 1)
+    backend.write_snapshot('player-2', 1, _data('x', 'y'), 1)
+    assert backend.list_metadata('player-2')[1]['choices_count'] == 2
+    backend.delete('default', 1)
+    assert backend.read('default', 1) is None
+    assert backend.list_metadata('default') == {}
+    assert backend.read('player-2', 1) is not None
+
+
+def test_append_without_snapshot_writes_snapshot(backend):
+    data = _data('a')
+    backend.append_delta('default', 3, 5, {'choices': data['choices_made']}, data)
+    assert backend.read('default', 3) == (data, 5, 0)
+
+
+def test_sqlite_batch_is_atomic(tmp_path):
+    backend = SqliteSaveBackend(str(tmp_path / "saves.db"))
+    backend.write_snapshot('default', 1, _data('a'), 1)
+    with pytest.raises(TypeError):
+        backend.write_batch([('snapshot', 'default', 1, _data('a', 'b'), 2),
+                             ('snapshot', 'default', 2, {'bad': object()}, 1)])
+    assert backend.read('default', 1) == (_data('a'), 1, 0)
+    assert 2 not in backend.list_metadata('default')
+    backend.close()
+
+
+def test_copy_profile_round_trip(tmp_path):
+    source = JsonSaveBackend(str(tmp_path / "json"))
+    source.write_snapshot('default', 1, _data('a'), 1)
+    new = _data('a', 'b')
+    source.append_delta('default', 1, 2, compute_delta(make_baseline(_data('a'), 1), new), new)
+    source.write_snapshot('default', 4, _data('c'), 1)
+    with open(source.slot_path('default', 5), 'w', encoding='utf-8') as f:
+        f.write("{broken")
+
+    database = SqliteSaveBackend(str(tmp_path / "saves.db"))
+    assert copy_profile(source, database, target_profile='imported') == 2  # 损坏的槽位被跳过
+    assert database.read('imported', 1)[0] == new
+
+    exported = JsonSaveBackend(str(tmp_path / "exported"))
+    assert copy_profile(database, exported, 'imported', 'default') == 2
+    assert exported.read('default', 4)[0] == _data('c')
+    database.close()
+
+
+def test_invalid_profile_name(tmp_path):
+    with pytest.raises(ValueError):
+        JsonSaveBackend(str(tmp_path)).profile_dir('../escape')
+
+
+def test_save_many_commits_each_slot_on_json(tmp_path, monkeypatch):
+    """JSON 批量写入不原子：中途失败后重试，已写入的槽位不会以相同序号再追加"""
+    manager = SaveManager(str(tmp_path))
+    assert not manager.backend.ATOMIC_BATCH
+    first = {1: _data('a'), 2: _data('x')}
+    manager.save_many(first)
+
+    append_delta = manager.backend.append_delta
+
+    def failing_for_slot_2(profile, slot, *args):
+        if slot == 2:
+            raise OSError("disk full")
+        return append_delta(profile, slot, *args)
+    monkeypatch.setattr(manager.backend, 'append_delta', failing_for_slot_2)
+    second = {1: _data('a', 'b'), 2: _data('x', 'y')}
+    with pytest.raises(OSError):
+        manager.save_many(second)
+    monkeypatch.setattr(manager.backend, 'append_delta', append_delta)
+    manager.save_many(copy.deepcopy(second))
+
+    journal = manager.backend.journal_path('default', 1)
+    with open(journal, 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    assert [entry['seq'] for entry in read_entries(journal)] == [2]
+    for slot, data in second.items():
+        assert manager.backend.read('default', slot)[0] == data
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试存档增量日志和 JSON 存档后端
+"""
+
+import copy
+import os
+
+import pytest
+
+from game_engine.save_backends import JsonSaveBackend
+from game_engine.save_journal import (append_entry, apply_delta, compute_delta, make_baseline,
+                                      read_entries)
+from game_engine.save_manager import SaveManager
+
+
+def _save_data(choices=(), **variables):
+    return {
+        'current_state': 'start',
+        'choices_made': [{'scene': 'start', 'choice': text} for text in choices],
+        'variables': dict({'view_count': 0}, **variables),
+        'chapter_progress': {'1': False},
+        'endings_unlocked': [],
+        'session_seed': 12345,
+        'characters': {'loved_self': {'character_id': 'loved_self', 'trust_level': 0,
+                                      'available': True, 'discovered': False}},
+    }
+
+
+def test_delta_round_trip():
+    """baseline + delta 还原出新数据"""
+    old = _save_data(['a'])
+    new = copy.deepcopy(old)
+    new['choices_made'].append({'scene': 'chapter1_photo', 'choice': 'b'})
+    new['current_state'] = 'chapter1_photo'
+    new['variables']['view_count'] = 2
+    new['endings_unlocked'] = ['ending_a']
+    new['characters']['loved_self']['trust_level'] = 3
+
+    delta = compute_delta(make_baseline(old, 1), new)
+    assert delta['choices'] == [{'scene': 'chapter1_photo', 'choice': 'b'}]
+    assert delta['variables'] == {'view_count': 2}
+    assert 'chapter_progress' not in delta and 'session_seed' not in delta
+
+    restored = copy.deepcopy(old)
+    apply_delta(restored, delta)
+    assert restored == new
+
+
+def test_unchanged_data_gives_empty_delta():
+    data = _save_data(['a'])
+    assert compute_delta(make_baseline(data, 3), copy.deepcopy(data)) == {}
+
+
+def test_rewritten_history_needs_snapshot():
+    """选择历史被截断或改写时无法用增量表示"""
+    baseline = make_baseline(_save_data(['a', 'b']), 1)
+    assert compute_delta(baseline, _save_data(['a'])) is None
+    assert compute_delta(baseline, _save_data(['a', 'c', 'd'])) is None
+
+
+def _with_choice(data, text):
+    data = copy.deepcopy(data)
+    data['choices_made'].append({'scene': 'start', 'choice': text})
+    return data
+
+
+def test_duplicate_seq_keeps_the_last_entry(tmp_path):
+    path = str(tmp_path / "save_1.journal")
+    append_entry(path, 1, {'choices': ['a']})
+    append_entry(path, 2, {'choices': ['b']})
+    append_entry(path, 2, {'choices': ['b', 'c']})  # 重试时以相同序号追加
+    assert [entry['choices'] for entry in read_entries(path)] == [['a'], ['b', 'c']]
+
+
+def test_retry_after_partial_batch_failure(tmp_path, monkeypatch):
+    """批量写入中途失败后重试，读档不会重复选择记录"""
+    manager = SaveManager(str(tmp_path))
+    first = {1: _save_data(['a']), 2: _save_data(['x'])}
+    manager.save_many(first)
+
+    backend = manager.backend
+    append_delta = backend.append_delta
+    failed = []
+
+    def flaky_append(profile, slot, *args):
+        if slot == 2 and not failed:
+            failed.append(slot)
+            raise OSError("disk full")
+        return append_delta(profile, slot, *args)
+    monkeypatch.setattr(backend, 'append_delta', flaky_append)
+
+    second = {slot: _with_choice(data, 'b') for slot, data in first.items()}
+    with pytest.raises(OSError):
+        manager.save_many(second)
+    third = {1: _with_choice(second[1], 'c'), 2: second[2]}  # 重试时槽位 1 已有更新的进度
+    manager.save_many(third)
+
+    for slot, data in third.items():
+        assert backend.read('default', slot)[0] == data
+
+
+def test_journal_skips_old_and_torn_entries(tmp_path):
+    path = str(tmp_path / "save_1.journal")
+    append_entry(path, 1, {'current_state': 'a'})
+    append_entry(path, 2, {'current_state': 'b'})
+    with open(path, 'ab') as f:
+        f.write(b'{"seq": 3, "current_st')  # 崩溃时写了一半的记录
+    append_entry(path, 4, {'current_state': 'd'})
+    assert [entry['seq'] for entry in read_entries(path)] == [1, 2, 4]
+    assert [entry['current_state'] for entry in read_entries(path, after_seq=2)] == ['d']
+
+
+def test_json_backend_replays_deltas_without_rewriting_index(tmp_path):
+    backend = JsonSaveBackend(str(tmp_path))
+    data = _save_data()
+    backend.write_snapshot('default', 1, data, 0)
+    index_path = tmp_path / "index.json"
+    index_mtime = os.stat(index_path).st_mtime_ns
+
+    baseline = make_baseline(data, 0)
+    for seq in range(1, 4):
+        new = copy.deepcopy(data)
+        new['choices_made'].append({'scene': 'start', 'choice': str(seq)})
+        new['variables']['view_count'] = seq
+        backend.append_delta('default', 1, seq, compute_delta(baseline, new), new)
+        data, baseline = new, make_baseline(new, seq)
+    assert os.stat(index_path).st_mtime_ns == index_mtime
+
+    restored, seq, replayed = backend.read('default', 1)
+    assert restored == data and seq == 3 and replayed == 3
+    # 列出存档时发现索引之后追加的增量
+    assert backend.list_metadata('default')[1]['choices_count'] == 3
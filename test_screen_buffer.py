@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试差量刷新的画面缓冲区：用一个最小的终端模拟器重放输出，检查屏幕内容与画面一致
+"""
+
+import io
+import random
+import re
+
+from game_engine.scene_render import COLOR_CODES
+from game_engine.screen_buffer import CLEAR_SCREEN, ScreenBuffer, center, char_width, text_width
+
+COLUMNS, HEIGHT = 12, 6
+_SEQUENCE = re.compile(r'\033\[([0-9;]*)([A-Za-z])')
+
+
+class _Terminal:
+    """只支持 ScreenBuffer 用到的 ANSI 序列：光标定位、擦除和颜色"""
+
+    def __init__(self, columns=COLUMNS, height=HEIGHT):
+        self.columns = columns
+        self.grid = [[(' ', '')] * columns for _ in range(height)]
+        self.row = self.column = 0
+        self.style = ''
+
+    def feed(self, data):
+        position = 0
+        for match in _SEQUENCE.finditer(data):
+            self._text(data[position:match.start()])
+            self._control(match.group(1), match.group(2), match.group(0))
+            position = match.end()
+        self._text(data[position:])
+
+    def _control(self, params, command, sequence):
+        if command == 'H':
+            row, column = (params or '1;1').split(';')
+            self.row, self.column = int(row) - 1, int(column) - 1
+        elif command == 'K':
+            start = 0 if params == '2' else self.column
+            self.grid[self.row][start:] = [(' ', '')] * (self.columns - start)
+        elif command == 'J':
+            first = 0 if params == '2' else self.row + 1
+            if params != '2':
+                self.grid[self.row][self.column:] = [(' ', '')] * (self.columns - self.column)
+            for row in range(first, len(self.grid)):
+                self.grid[row] = [(' ', '')] * self.columns
+        elif command == 'm':
+            self.style = '' if params == '0' else sequence
+
+    def _text(self, text):
+        line = self.grid[self.row] if self.row < len(self.grid) else None
+        for char in text:
+            width = char_width(char)
+            if width == 0:
+                previous = self.column - 1
+                while line[previous][0] == '':
+                    previous -= 1
+                line[previous] = (line[previous][0] + char, line[previous][1])
+                continue
+            assert self.column + width <= self.columns, "输出超出行宽会让终端自动换行"
+            if line[self.column][0] == '':  # 覆盖全角字符的后半格
+                line[self.column - 1] = (' ', '')
+            end = self.column + width
+            if end < self.columns and line[end][0] == '':  # 覆盖全角字符的前半格
+                line[end] = (' ', '')
+            line[self.column] = (char, self.style)
+            if width == 2:
+                line[self.column + 1] = ('', self.style)
+            self.column = end
+
+    def text(self):
+        return [''.join(char for char, _ in line).rstrip() for line in self.grid]
+
+
+def _expected(lines, columns=COLUMNS, height=HEIGHT):
+    """画面各行截断到行宽后的文字（不足的行补空）"""
+    rows = []
+    for line in lines[:height]:
+        text = line if isinstance(line, str) else ''.join(segment for segment, _ in line)
+        visible, width = '', 0
+        for char in text:
+            if width + char_width(char) > columns:
+                break
+            visible += char
+            width += char_width(char)
+        rows.append(visible.rstrip())
+    return rows + [''] * (height - len(rows))
+
+
+def _buffer():
+    return ScreenBuffer(stream=io.StringIO(), size=(COLUMNS, HEIGHT))
+
+
+def _render(buffer, terminal, lines):
+    start = buffer.stream.tell()
+    buffer.render(lines)
+    data = buffer.stream.getvalue()[start:]
+    terminal.feed(data)
+    return data
+
+
+def test_display_width():
+    assert char_width('a') == 1 and char_width('电') == 2 and char_width('́') == 0
+    assert text_width("电台 FM") == 7
+    assert center("电台", 8) == "  电台  "
+
+
+def test_random_frames_match_the_screen():
+    """随机的画面序列（全角、组合字符、颜色、超宽、超高）逐帧重放后屏幕与画面一致"""
+    rng = random.Random(20)
+    words = ["电台", "a", "崖边", "é", "FM 88.7", "   ", "信号", "xyz"]
+    colors = [None, 'red', 'green']
+    buffer, terminal = _buffer(), _Terminal()
+    for _ in range(300):
+        lines = []
+        for _ in range(rng.randrange(HEIGHT + 3)):
+            if rng.random() < 0.5:
+                lines.append(''.join(rng.choice(words) for _ in range(rng.randrange(5))))
+            else:
+                lines.append([(rng.choice(words), rng.choice(colors)) for _ in range(rng.randrange(4))])
+        _render(buffer, terminal, lines)
+        assert terminal.text() == _expected(lines)
+        assert terminal.style == ''  # 每帧结束时颜色已复位
+
+
+def test_unchanged_frame_only_moves_the_cursor():
+    buffer, terminal = _buffer(), _Terminal()
+    lines = ["崖边电台", [("信号", 'green'), (" 良好", None)]]
+    _render(buffer, terminal, lines)
+    assert _render(buffer, terminal, lines) == "\033[3;1H"
+
+    changed = _render(buffer, terminal, ["崖边电台", [("信号", 'green'), (" 中断", None)]])
+    assert "崖边" not in changed and "信号" not in changed and "中断" in changed
+    assert terminal.grid[1][0] == ("信", COLOR_CODES['green'])
+
+
+def test_clear_and_invalidate():
+    buffer, terminal = _buffer(), _Terminal()
+    lines = ["第一行", "第二行"]
+    _render(buffer, terminal, lines)
+    terminal.grid[1] = [('#', '')] * COLUMNS  # 外部输出改动了第二行
+    buffer.invalidate([1])
+    data = _render(buffer, terminal, lines)
+    assert "第一行" not in data and terminal.text() == _expected(lines)
+
+    buffer.clear()
+    assert buffer.stream.getvalue().endswith(CLEAR_SCREEN)
+    terminal.feed(CLEAR_SCREEN)
+    _render(buffer, terminal, lines)
+    assert terminal.text() == _expected(lines)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试故事内容：进程内共享和按章节延迟加载
+"""
+
+import pytest
+
+from game_engine.radio_game import RadioGame
+from game_engine.save_manager import SaveManager
+from story_system.story_bundle import build_bundle
+from story_system.story_manager import StoryContent, StoryProgress
+
+
+def test_shared_content_is_one_instance(tmp_path):
+    """新进度、反序列化的进度、存档读出的进度和 RadioGame 都引用同一份内容"""
+    shared = StoryContent.shared()
+    assert StoryContent.shared() is shared
+    progress = StoryProgress()
+    assert progress.story_content is shared
+
+    progress.make_choice('look', '看照片')
+    restored = StoryProgress.deserialize(progress.serialize())
+    assert restored.story_content is shared
+
+    manager = SaveManager(str(tmp_path))
+    manager.save_to_slot(1, progress)
+    assert manager.load_from_slot(1).story_content is shared
+
+    game = RadioGame(manager)
+    assert game.story_content is shared and game.story_progress.story_content is shared
+    game.shutdown()
+
+
+def test_progress_does_not_share_mutable_state():
+    first, second = StoryProgress(), StoryProgress()
+    first.set_variable('view_count', 3)
+    first.set_state('chapter1_photo')
+    assert second.get_variable('view_count') != 3
+    assert second.current_state == 'start'
+
+
+@pytest.fixture(scope='module')
+def bundle_path(tmp_path_factory):
+    return build_bundle(str(tmp_path_factory.mktemp("bundle") / "story.bundle"), index_path=None)
+
+
+def test_get_scene_loads_only_its_chapter():
+    content = StoryContent(bundle_path=None, prefetch=False)
+    assert content.source == "modules" and not content._loaded_chapters
+    assert content.chapter_of('chapter2_man_appears') == 2  # 查索引不加载
+    assert not content._loaded_chapters
+
+    scene = content.get_scene('chapter2_man_appears')
+    assert scene.id == 'chapter2_man_appears'
+    assert content._loaded_chapters == {2}
+    assert content.scene_at(content.scene_number('chapter2_man_appears')) is scene
+
+    scenes = content.scenes
+    assert content._loaded_chapters == {1, 2, 3, 4}
+    assert scenes == StoryContent(bundle_path=None, lazy=False).scenes
+
+
+def test_bundle_content_matches_modules(bundle_path):
+    content = StoryContent(bundle_path=bundle_path, prefetch=False)
+    assert content.source == "bundle"
+    assert content.peek_graph() is not None  # 场景图直接来自故事包
+    assert not content._loaded_chapters
+
+    modules = StoryContent(bundle_path=None, prefetch=False)
+    assert content.get_scene('chapter3_act2_intro') == modules.get_scene('chapter3_act2_intro')
+    assert content._loaded_chapters == {3}
+    assert dict(content.scenes) == dict(modules.scenes)
+
+
+def test_missing_bundle_falls_back_to_modules(tmp_path):
+    content = StoryContent(bundle_path=str(tmp_path / "missing.bundle"), prefetch=False)
+    assert content.source == "modules"
+    assert content.get_scene('start').id == 'start'
+    assert content.get_scene('no_such_scene') is None
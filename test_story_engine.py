@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试无界面故事引擎：选项筛选、状态转移和批量模拟
+"""
+
+import pytest
+
+from story_system.story_base import StoryChoice, StoryScene
+from story_system.story_engine import StoryEngine, random_policy
+from story_system.story_manager import StoryContent
+
+
+def _content():
+    scenes = {
+        'start': StoryScene('start', '开场', ["门外有人"], [
+            StoryChoice('开门', 'hall', variable_changes={'man_appeared': True}),
+            StoryChoice('敲门', 'start', effect='view_count += 1'),
+            StoryChoice('离开', 'ending1_accept', condition='view_count >= 2'),
+            StoryChoice('存档', 'start', action='save'),
+        ]),
+        'hall': StoryScene('hall', '大厅', ["空无一人"], [
+            StoryChoice('上楼', 'attic'),
+            StoryChoice('下楼', 'void'),
+        ]),
+        'attic': StoryScene('attic', '阁楼', ["没有出路"], []),
+        'ending1_accept': StoryScene('ending1_accept', '结局', ["结束"], []),
+    }
+    return StoryContent.from_scenes(scenes, dict.fromkeys(scenes, 1))
+
+
+@pytest.fixture
+def engine():
+    return StoryEngine(_content())
+
+
+def test_visible_choices_follow_conditions(engine):
+    progress = engine.new_progress()
+    assert engine.visible_choice_indices(progress) == (0, 1, 3)
+    assert engine.visible_choice_indices(progress) is engine.visible_choice_indices(progress)  # 变量未变时用缓存
+
+    engine.choose(progress, 1)
+    engine.choose(progress, 1)
+    assert progress.get_variable('view_count') == 2
+    assert engine.visible_choice_indices(progress) == (0, 1, 2, 3)
+    assert [choice.text for choice in engine.available_choices(progress)] == ['开门', '敲门', '离开', '存档']
+
+    with pytest.raises(IndexError):
+        engine.choose(progress, 4)
+
+
+def test_run_to_ending(engine):
+    result = engine.run(choices=[1, 1, 2])
+    assert (result.ending, result.stopped, result.steps) == ('ending1_accept', "ending", 3)
+    assert result.path == ['start', 'start', 'start', 'ending1_accept']
+    assert 'ending1_accept' in result.progress.endings_unlocked
+
+
+def test_choice_applies_variables_and_action():
+    actions = []
+    engine = StoryEngine(_content(), action_handler=lambda action, progress: actions.append(action))
+    progress = engine.new_progress()
+    engine.choose(progress, 2)  # 可见选项中的第 3 项：存档
+    assert actions == ['save'] and progress.current_state == 'start'
+    scene = engine.choose(progress, 0)
+    assert scene.id == 'hall' and progress.get_variable('man_appeared') is True
+
+
+@pytest.mark.parametrize('choices, policy, stopped', [
+    ([0, 0], None, "dead_end"),
+    ([0, 1], None, "missing_scene"),
+    ([1], None, "choices_exhausted"),
+    ([], lambda progress, scene, options: 3 if len(options) == 4 else 1, "max_steps"),
+])
+def test_stop_reasons(engine, choices, policy, stopped):
+    result = engine.run(choices=choices, policy=policy, max_steps=10)
+    assert result.stopped == stopped and result.ending is None
+
+
+def test_run_many_is_reproducible(engine):
+    first = engine.run_many(50, random_policy(7), max_steps=20)
+    assert sum(first.values()) == 50
+    assert engine.run_many(50, random_policy(7), max_steps=20) == first
+    assert set(first) <= {'ending1_accept', "dead_end", "missing_scene", "max_steps"}
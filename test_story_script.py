@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试剧本脚本编译器：导出 / 编译往返和故事包构建
+"""
+
+import pytest
+
+from story_system.story_base import StoryChoice, StoryScene
+from story_system.story_bundle import StoryBundle, _load_chapter_modules
+from story_system.story_script import ScriptCompiler, ScriptError, build_from_scripts, format_chapter
+
+SCRIPT = """# 第 1 章
+
+## start | 开场
+@character main_self
+@set man_appeared = true
+
+\\# 不是标题
+第二行
+
+* 看照片 -> chapter1_photo [if: view_count >= 2] [do: view_count += 1]
+* 离开 -> start [set: first_view_choice = "swap"] [action: save]
+"""
+
+
+def test_parse_script():
+    chapters = ScriptCompiler().compile_texts([('script.md', SCRIPT)])
+    scene = chapters[1]['start']
+    assert scene == StoryScene(
+        'start', '开场', ['# 不是标题', '第二行'],
+        [StoryChoice('看照片', 'chapter1_photo', condition='view_count >= 2', effect='view_count += 1'),
+         StoryChoice('离开', 'start', action='save', variable_changes={'first_view_choice': 'swap'})],
+        character_id='main_self', variable_changes={'man_appeared': True})
+
+
+def test_chapter_modules_round_trip():
+    """现有章节导出为脚本再编译，得到完全相同的场景"""
+    chapters = _load_chapter_modules()
+    texts = [(f"chapter{number}.md", format_chapter(number, scenes))
+             for number, scenes in sorted(chapters.items())]
+    assert ScriptCompiler().compile_texts(texts) == chapters
+
+
+def test_incremental_compile_reuses_unchanged_sections():
+    compiler = ScriptCompiler()
+    compiler.compile_texts([('script.md', SCRIPT)])
+    edited = SCRIPT.replace("第二行", "改过的第二行") + "\n## chapter1_photo\n\n照片\n"
+    chapters = compiler.compile_texts([('script.md', edited)])
+    assert compiler.last_stats.compiled == 2 and compiler.last_stats.reused == 0
+    chapters = compiler.compile_texts([('script.md', edited)])
+    assert compiler.last_stats.compiled == 0 and compiler.last_stats.reused == 2
+    assert list(chapters[1]) == ['start', 'chapter1_photo']
+
+
+@pytest.mark.parametrize('text', [
+    "## start\n",                                           # 缺少章节标题
+    "# 第 1 章\n## start\n* 去哪 -> \n",                    # 缺少目标场景
+    "# 第 1 章\n## start\n* 去 -> start [if: a ==]\n",       # 条件无法编译
+    "# 第 1 章\n## start\n\n## start\n",                    # 场景ID重复
+])
+def test_script_errors(text):
+    with pytest.raises(ScriptError):
+        ScriptCompiler().compile_texts([('bad.md', text)])
+
+
+def test_build_from_scripts(tmp_path):
+    script = tmp_path / "chapter1.md"
+    script.write_text(SCRIPT, encoding='utf-8')
+    output = str(tmp_path / "story.bundle")
+    index = str(tmp_path / "scene_index.py")
+
+    stats = build_from_scripts([str(script)], output, index_path=index)
+    assert stats.compiled == 1
+    assert build_from_scripts([str(script)], output) is None  # 没有变化时不重写
+
+    bundle = StoryBundle.open(output)
+    assert not bundle.is_stale()
+    assert bundle.load_all() == ScriptCompiler().compile_texts([('script.md', SCRIPT)])[1]
+    assert "SCENE_INDEX_SOURCE = 'scripts'" in (tmp_path / "scene_index.py").read_text(encoding='utf-8')
+
+    script.write_text(SCRIPT.replace("第二行", "第二行。"), encoding='utf-8')
+    assert bundle.is_stale()
+
+
+def test_build_leaves_the_tracked_index_alone_by_default(tmp_path, monkeypatch):
+    written = []
+    monkeypatch.setattr('story_system.story_script.write_scene_index',
+                        lambda *args, **kwargs: written.append(args))
+    script = tmp_path / "chapter1.md"
+    script.write_text(SCRIPT, encoding='utf-8')
+    build_from_scripts([str(script)], str(tmp_path / "story.bundle"))
+    assert written == []